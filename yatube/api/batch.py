@@ -0,0 +1,284 @@
+from collections import defaultdict
+
+from django.conf import settings
+
+from posts import timelines
+from posts.counters import stats_for
+from posts.models import Follow, Group, Post, User
+
+from .serializers import (
+    FieldError, feed_page, group_info, parse_fields, post_data, user_data,
+)
+
+
+class BatchError(Exception):
+    """Ошибка одного подзапроса: попадает в его ответ, а не во весь пакет."""
+
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def load_users(loader, usernames):
+    users = User.objects.select_related('stats').filter(
+        username__in=usernames
+    )
+    return {user.username: user for user in users}
+
+
+def load_groups(loader, slugs):
+    return {group.slug: group for group in Group.objects.filter(
+        slug__in=slugs
+    )}
+
+
+def load_posts(loader, ids):
+    return Post.objects.select_related('author', 'group').in_bulk(ids)
+
+
+def load_follows(loader, usernames):
+    followed = set(Follow.objects.filter(
+        user=loader.user, author__username__in=usernames
+    ).values_list('author__username', flat=True))
+    return {username: username in followed for username in usernames}
+
+
+LOADERS = {
+    'user': load_users,
+    'group': load_groups,
+    'post': load_posts,
+    'follow': load_follows,
+}
+
+
+class Loader:
+    """Собирает ключи всех подзапросов и читает каждый вид одним IN.
+
+    Подзапросы сначала объявляют, что им понадобится (want), и только
+    потом читают (get): первое чтение вида грузит сразу все объявленные
+    ключи, так что одинаковые и соседние выборки схлопываются.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.wanted = defaultdict(set)
+        self.fetched = defaultdict(set)
+        self.loaded = defaultdict(dict)
+
+    def want(self, kind, keys):
+        self.wanted[kind].update(keys)
+
+    def get(self, kind, key):
+        if key not in self.fetched[kind]:
+            pending = self.wanted[kind] - self.fetched[kind] | {key}
+            self.loaded[kind].update(LOADERS[kind](self, pending))
+            self.fetched[kind] |= pending
+        return self.loaded[kind].get(key)
+
+
+def is_a(value, kind):
+    """isinstance без bool: True и False — не числа для подзапросов."""
+    return isinstance(value, kind) and not isinstance(value, bool)
+
+
+def keys(request, name, kind=str):
+    values = request.get(name)
+    if not isinstance(values, list) or not all(
+        is_a(value, kind) for value in values
+    ):
+        raise BatchError(400, f'{name}: нужен список')
+    if len(values) > settings.API_MAX_PAGE_SIZE:
+        raise BatchError(400, f'{name}: не больше '
+                              f'{settings.API_MAX_PAGE_SIZE}')
+    return values
+
+
+def fields_of(request):
+    """Поля строкой "a,b", как в ?fields=, или списком строк."""
+    fields = request.get('fields')
+    if isinstance(fields, list) and all(
+        isinstance(name, str) for name in fields
+    ):
+        fields = ','.join(fields)
+    elif fields is not None and not isinstance(fields, str):
+        raise BatchError(400, 'fields: нужна строка или список строк')
+    try:
+        return parse_fields(fields)
+    except FieldError as unknown:
+        raise BatchError(400, f'Неизвестные поля: {unknown}')
+
+
+def limit_of(request):
+    limit = request.get('limit', settings.API_PAGE_SIZE)
+    if not is_a(limit, int):
+        raise BatchError(400, 'limit: нужно число')
+    return min(max(limit, 1), settings.API_MAX_PAGE_SIZE)
+
+
+def require_user(loader):
+    if not loader.user.is_authenticated:
+        raise BatchError(401, 'Нужно войти')
+
+
+def key(request, name):
+    value = request.get(name)
+    if not isinstance(value, str):
+        raise BatchError(400, f'{name}: нужна строка')
+    return value
+
+
+def plan_feed(request, loader):
+    if request.get('feed') == 'group':
+        loader.want('group', [key(request, 'slug')])
+    elif request.get('feed') == 'profile':
+        loader.want('user', [key(request, 'username')])
+
+
+def run_feed(request, loader):
+    feed = request.get('feed')
+    if feed == 'index':
+        posts = Post.objects.all()
+    elif feed == 'group':
+        group = loader.get('group', key(request, 'slug'))
+        if group is None:
+            raise BatchError(404, 'Группа не найдена')
+        posts = group.posts.all()
+    elif feed == 'profile':
+        author = loader.get('user', key(request, 'username'))
+        if author is None:
+            raise BatchError(404, 'Автор не найден')
+        posts = author.posts.all()
+    elif feed == 'follow':
+        require_user(loader)
+        posts = timelines.feed(loader.user)
+    else:
+        raise BatchError(400, 'feed: index, group, profile или follow')
+    return feed_page(
+        posts, fields_of(request), request.get('cursor'), limit_of(request)
+    )
+
+
+def plan_posts(request, loader):
+    loader.want('post', keys(request, 'ids', int))
+
+
+def run_posts(request, loader):
+    fields = fields_of(request)
+    posts = {}
+    for pk in keys(request, 'ids', int):
+        post = loader.get('post', pk)
+        posts[pk] = post and post_data(post, fields)
+    return posts
+
+
+def plan_users(request, loader):
+    loader.want('user', keys(request, 'usernames'))
+
+
+def run_users(request, loader):
+    users = {}
+    for username in keys(request, 'usernames'):
+        user = loader.get('user', username)
+        users[username] = user and user_data(user, stats_for(user))
+    return users
+
+
+def plan_me(request, loader):
+    if loader.user.is_authenticated:
+        loader.want('user', [loader.user.username])
+
+
+def run_me(request, loader):
+    require_user(loader)
+    user = loader.get('user', loader.user.username)
+    return user_data(user, stats_for(user))
+
+
+def plan_groups(request, loader):
+    loader.want('group', keys(request, 'slugs'))
+
+
+def run_groups(request, loader):
+    groups = {}
+    for slug in keys(request, 'slugs'):
+        group = loader.get('group', slug)
+        groups[slug] = group and group_info(group)
+    return groups
+
+
+def plan_follow(request, loader):
+    if loader.user.is_authenticated:
+        loader.want('follow', keys(request, 'usernames'))
+
+
+def run_follow(request, loader):
+    require_user(loader)
+    return {
+        username: loader.get('follow', username)
+        for username in keys(request, 'usernames')
+    }
+
+
+# Тип подзапроса: что объявить загрузчику и как построить ответ.
+TYPES = {
+    'feed': (plan_feed, run_feed),
+    'posts': (plan_posts, run_posts),
+    'users': (plan_users, run_users),
+    'me': (plan_me, run_me),
+    'groups': (plan_groups, run_groups),
+    'follow': (plan_follow, run_follow),
+}
+
+
+def validate(requests):
+    """Проверяет пакет целиком; ошибка — ValueError с текстом для 400."""
+    if not isinstance(requests, list) or not all(
+        isinstance(request, dict) for request in requests
+    ):
+        raise ValueError('requests: нужен список объектов')
+    if len(requests) > settings.API_BATCH_MAX_REQUESTS:
+        raise ValueError(
+            f'Не больше {settings.API_BATCH_MAX_REQUESTS} подзапросов'
+        )
+    feeds = sum(request.get('type') == 'feed' for request in requests)
+    if feeds > settings.API_BATCH_MAX_FEEDS:
+        raise ValueError(f'Не больше {settings.API_BATCH_MAX_FEEDS} лент')
+    ids = [request.get('id') for request in requests]
+    if not all(isinstance(pk, str) for pk in ids) or len(set(ids)) < len(ids):
+        raise ValueError('id подзапросов: разные строки')
+
+
+def handler(request):
+    try:
+        return TYPES[request.get('type')]
+    except (KeyError, TypeError):
+        raise BatchError(400, 'type: ' + ', '.join(TYPES))
+
+
+def run(requests, user):
+    """Выполняет подзапросы пакета, ответ каждого — под его id.
+
+    Сначала все подзапросы объявляют нужные объекты, затем строят
+    ответы: так загрузчик читает каждый вид объектов один раз.
+    """
+    loader = Loader(user)
+    failures = {}
+    for request in requests:
+        try:
+            handler(request)[0](request, loader)
+        except BatchError as failure:
+            failures[request['id']] = failure
+    responses = {}
+    for request in requests:
+        try:
+            if request['id'] in failures:
+                raise failures[request['id']]
+            body = handler(request)[1](request, loader)
+        except BatchError as failure:
+            responses[request['id']] = {
+                'status': failure.status, 'body': {'detail': failure.detail},
+            }
+        else:
+            responses[request['id']] = {'status': 200, 'body': body}
+    return responses
@@ -0,0 +1,184 @@
+import json
+
+from django.core.exceptions import SuspiciousOperation
+
+from posts.pagination import after_cursor, encode_cursor
+
+# Ответ отдаётся кусками не меньше этого размера, а не строкой на пост.
+CHUNK_SIZE = 8192
+
+
+class FieldError(ValueError):
+    pass
+
+
+def author_data(user):
+    return {
+        'username': user.username,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+    }
+
+
+def group_data(post):
+    if post.group_id is None:
+        return None
+    return {'slug': post.group.slug, 'title': post.group.title}
+
+
+def image_data(post):
+    if not post.image:
+        return None
+    try:
+        url = post.image.url
+    except (SuspiciousOperation, ValueError):
+        return None
+    try:
+        variants = json.loads(post.image_variants or '[]')
+    except ValueError:
+        variants = []
+    return {
+        'url': url,
+        'width': post.image_width,
+        'height': post.image_height,
+        'thumbnail': post.thumbnail or None,
+        'variants': variants,
+    }
+
+
+# Поле ответа: колонки для only(), связи для select_related() и функция,
+# достающая значение из поста.
+POST_FIELDS = {
+    'id': ((), (), lambda post: post.pk),
+    'text': (('text',), (), lambda post: post.text),
+    'pub_date': ((), (), lambda post: post.pub_date.isoformat()),
+    'author': (
+        ('author__username', 'author__first_name', 'author__last_name'),
+        ('author',),
+        lambda post: author_data(post.author),
+    ),
+    'group': (('group__slug', 'group__title'), ('group',), group_data),
+    'image': (
+        (
+            'image', 'thumbnail', 'image_variants', 'image_width',
+            'image_height',
+        ),
+        (),
+        image_data,
+    ),
+    'comments_count': (
+        ('comments_count',), (), lambda post: post.comments_count
+    ),
+}
+# Без них не построить курсор следующей страницы.
+KEY_COLUMNS = ('pub_date',)
+
+
+def parse_fields(value):
+    """Поля из ?fields=a,b; пустое значение — все поля."""
+    if not value:
+        return list(POST_FIELDS)
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in POST_FIELDS]
+    if unknown:
+        raise FieldError(', '.join(unknown))
+    return fields
+
+
+def select(posts, fields):
+    """Читает из базы только колонки и связи выбранных полей."""
+    columns = list(KEY_COLUMNS)
+    related = []
+    for name in fields:
+        field_columns, field_related, _ = POST_FIELDS[name]
+        columns += field_columns
+        related += field_related
+    columns += related
+    if related:
+        posts = posts.select_related(*related)
+    else:
+        posts = posts.select_related(None)
+    return posts.only(*columns)
+
+
+def post_data(post, fields):
+    return {name: POST_FIELDS[name][2](post) for name in fields}
+
+
+def comment_data(comment):
+    return {
+        'id': comment.pk,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+        'author': author_data(comment.author),
+    }
+
+
+def dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def feed_parts(posts, fields, token, limit, next_url):
+    """Страница ленты в JSON по кускам, пост за постом.
+
+    Посты читаются из курсора БД по мере записи, так что целиком
+    страница не собирается ни в список постов, ни в одну строку.
+    Курсор следующей страницы известен только в конце, поэтому он
+    идёт после results.
+    """
+    rows = select(after_cursor(posts, token), fields)[:limit + 1]
+    yield '{"results":['
+    last = None
+    for number, post in enumerate(rows.iterator()):
+        if number == limit:
+            break
+        if last is not None:
+            yield ','
+        yield dumps(post_data(post, fields))
+        last = post
+    else:
+        last = None
+    cursor = last and encode_cursor(last)
+    yield '],"next_cursor":{},"next":{}}}'.format(
+        dumps(cursor), dumps(cursor and next_url(cursor))
+    )
+
+
+def feed_page(posts, fields, token, limit):
+    """Страница ленты словарём — для пакетных запросов, где она мала."""
+    rows = list(select(after_cursor(posts, token), fields)[:limit + 1])
+    cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return {
+        'results': [post_data(post, fields) for post in rows[:limit]],
+        'next_cursor': cursor,
+    }
+
+
+def user_data(user, stats):
+    return {
+        **author_data(user),
+        'posts_count': stats.posts_count,
+        'followers_count': stats.followers_count,
+        'following_count': stats.following_count,
+    }
+
+
+def group_info(group):
+    return {
+        'slug': group.slug,
+        'title': group.title,
+        'description': group.description,
+        'posts_count': group.posts_count,
+    }
+
+
+def post_parts(post, fields, comments):
+    """Пост и его комментарии в JSON по кускам."""
+    yield '{"post":'
+    yield dumps(post_data(post, fields))
+    yield ',"comments":['
+    for number, comment in enumerate(comments.iterator()):
+        if number:
+            yield ','
+        yield dumps(comment_data(comment))
+    yield ']}'
@@ -0,0 +1,137 @@
+import json
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Follow
+from posts.tests.test_forms import Fixtures
+
+
+class BatchApiTests(Fixtures):
+
+    def batch(self, client, *requests):
+        return client.post(
+            reverse('api:batch'),
+            json.dumps({'requests': list(requests)}),
+            content_type='application/json',
+        )
+
+    def test_screen_in_one_round_trip(self):
+        """Лента, счётчики, подписки и посты одним запросом"""
+        Follow.objects.create(user=self.user, author=self.user2)
+        response = self.batch(
+            self.authorized_client,
+            {'id': 'feed', 'type': 'feed', 'feed': 'follow',
+             'fields': 'id,author'},
+            {'id': 'me', 'type': 'me'},
+            {'id': 'following', 'type': 'follow',
+             'usernames': ['auth2', 'auth']},
+            {'id': 'counts', 'type': 'posts',
+             'ids': [self.post.pk, 999], 'fields': 'comments_count'},
+        )
+        self.assertEqual(response.status_code, 200)
+        result = response.json()['responses']
+        self.assertEqual(
+            [post['id'] for post in result['feed']['body']['results']],
+            [self.post2.pk],
+        )
+        self.assertEqual(result['me']['body']['following_count'], 1)
+        self.assertEqual(
+            result['following']['body'], {'auth2': True, 'auth': False}
+        )
+        self.assertEqual(result['counts']['body'], {
+            str(self.post.pk): {'comments_count': 1}, '999': None,
+        })
+
+    def test_duplicate_lookups_collapse(self):
+        """Одинаковые выборки из разных подзапросов — один запрос IN"""
+        requests = (
+            {'id': 'profile', 'type': 'feed', 'feed': 'profile',
+             'username': 'auth2', 'limit': 1},
+            {'id': 'users', 'type': 'users', 'usernames': ['auth2', 'auth']},
+            {'id': 'me', 'type': 'me'},
+            {'id': 'group', 'type': 'feed', 'feed': 'group',
+             'slug': 'test-slug'},
+            {'id': 'groups', 'type': 'groups',
+             'slugs': ['test-slug', 'group2-slug']},
+        )
+        self.batch(self.authorized_client, *requests)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.batch(self.authorized_client, *requests)
+        result = response.json()['responses']
+        self.assertTrue(all(
+            answer['status'] == 200 for answer in result.values()
+        ))
+        self.assertEqual(result['users']['body']['auth2']['posts_count'], 1)
+        users = [
+            query for query in queries if '"username" IN' in query['sql']
+        ]
+        groups = [
+            query for query in queries if '"slug" IN' in query['sql']
+        ]
+        self.assertEqual(len(users), 1)
+        self.assertEqual(len(groups), 1)
+        # Сессия, пользователь, авторы, группы и две ленты.
+        self.assertEqual(len(queries), 6)
+
+    def test_errors_stay_in_their_sub_request(self):
+        """Ошибка подзапроса не ломает остальные"""
+        response = self.batch(
+            self.guest_client,
+            {'id': 'a', 'type': 'feed', 'feed': 'group', 'slug': 'nope'},
+            {'id': 'b', 'type': 'me'},
+            {'id': 'c', 'type': 'posts', 'ids': 'x'},
+            {'id': 'd', 'type': 'unknown'},
+            {'id': 'e', 'type': 'groups', 'slugs': ['test-slug']},
+        )
+        statuses = {
+            key: answer['status']
+            for key, answer in response.json()['responses'].items()
+        }
+        self.assertEqual(
+            statuses, {'a': 404, 'b': 401, 'c': 400, 'd': 400, 'e': 200}
+        )
+
+    def test_wrong_argument_types_rejected(self):
+        """Поля не строкой, числа-булевы — 400 у подзапроса, не 500"""
+        response = self.batch(
+            self.guest_client,
+            {'id': 'a', 'type': 'posts', 'ids': [self.post.pk],
+             'fields': ['id', 'text']},
+            {'id': 'b', 'type': 'posts', 'ids': [self.post.pk],
+             'fields': 5},
+            {'id': 'c', 'type': 'posts', 'ids': [True]},
+            {'id': 'd', 'type': 'feed', 'feed': 'index', 'limit': True},
+            {'id': 'e', 'type': 'posts', 'ids': [self.post.pk],
+             'fields': [1]},
+        )
+        self.assertEqual(response.status_code, 200)
+        answers = response.json()['responses']
+        self.assertEqual(answers['a']['status'], 200)
+        self.assertEqual(
+            answers['a']['body'][str(self.post.pk)],
+            {'id': self.post.pk, 'text': self.post.text},
+        )
+        for key in 'bcde':
+            with self.subTest(key=key):
+                self.assertEqual(answers[key]['status'], 400)
+
+    def test_malformed_batch(self):
+        """Битое тело, повторы id и лишние ленты — 400 на весь пакет"""
+        feed = {'type': 'feed', 'feed': 'index'}
+        bodies = (
+            'not json',
+            json.dumps({'requests': {}}),
+            json.dumps({'requests': [{'id': 'a'}, {'id': 'a'}]}),
+            json.dumps({'requests': [
+                {'id': str(i), **feed} for i in range(4)
+            ]}),
+        )
+        for body in bodies:
+            with self.subTest(body=body):
+                response = self.guest_client.post(
+                    reverse('api:batch'), body,
+                    content_type='application/json',
+                )
+                self.assertEqual(response.status_code, 400)
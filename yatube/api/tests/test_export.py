@@ -0,0 +1,52 @@
+import gzip
+import json
+
+from django.urls import reverse
+
+from posts.models import Post
+from posts.tests.test_forms import Fixtures
+
+
+class ExportApiTests(Fixtures):
+
+    def url(self, kind='posts'):
+        return reverse('api:export', kwargs={'kind': kind})
+
+    def test_own_posts_streamed(self):
+        """Пользователь выгружает свои посты потоком"""
+        response = self.authorized_client.get(self.url())
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('posts.ndjson', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)['id'] for line in lines], [self.post.pk]
+        )
+
+    def test_gzip_csv_resumed(self):
+        """Сжатый CSV, продолженный после id"""
+        later = Post.objects.create(author=self.user, text='Поздний')
+        response = self.authorized_client.get(self.url(), {
+            'format': 'csv', 'gzip': '1', 'after': self.post.pk,
+        })
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        rows = gzip.decompress(
+            b''.join(response.streaming_content)
+        ).decode().splitlines()
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(rows[1].startswith(f'{later.pk},auth,'))
+
+    def test_access(self):
+        """Гостю — 401, чужие данные — 403, битые параметры — 400"""
+        self.assertEqual(self.guest_client.get(self.url()).status_code, 401)
+        response = self.authorized_client.get(self.url(), {'author': 'auth2'})
+        self.assertEqual(response.status_code, 403)
+        for kind, params in (
+            ('users', {}),
+            ('posts', {'format': 'xml'}),
+            ('posts', {'since': 'вчера'}),
+            ('follows', {'group': 'test-slug'}),
+        ):
+            with self.subTest(kind=kind, params=params):
+                response = self.authorized_client.get(self.url(kind), params)
+                self.assertEqual(response.status_code, 400)
@@ -0,0 +1,128 @@
+import json
+import tempfile
+
+from django.test import override_settings
+from django.urls import reverse
+
+from core.query_budget import QueryBudgetMixin
+from posts.models import Comment, Follow, Post
+from posts.tests.test_forms import Fixtures
+
+
+def read(response):
+    return json.loads(b''.join(response.streaming_content))
+
+
+@override_settings(MEDIA_ROOT=tempfile.gettempdir(), THUMBNAIL_WORKERS=0)
+class FeedApiTests(QueryBudgetMixin, Fixtures):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        for i in range(5):
+            Post.objects.create(
+                author=cls.user2, text=f'Пост {i}', group=cls.group
+            )
+
+    def test_feed_embeds_related_data(self):
+        """Посты ленты идут с автором, группой и картинкой"""
+        response = self.guest_client.get(reverse('api:index'))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        results = read(response)['results']
+        self.assertEqual(len(results), Post.objects.count())
+        with_image = next(
+            post for post in results if post['id'] == self.post.pk
+        )
+        self.assertEqual(with_image['author']['username'], 'auth')
+        self.assertEqual(with_image['group'], {
+            'slug': 'test-slug', 'title': 'Тестовая группа',
+        })
+        self.assertEqual(with_image['image']['url'], self.post.image.url)
+
+    def test_queries_do_not_grow_with_page(self):
+        """Страница читается одним запросом, без запроса на пост"""
+        response = self.guest_client.get(reverse('api:index'))
+        with self.assertNumQueries(1):
+            read(response)
+
+    def test_cursor_walks_whole_feed(self):
+        """По next можно пройти всю ленту без повторов"""
+        url = reverse('api:index') + '?limit=2&fields=id'
+        seen = []
+        while url:
+            page = read(self.guest_client.get(url))
+            self.assertLessEqual(len(page['results']), 2)
+            seen += [post['id'] for post in page['results']]
+            url = page['next']
+        self.assertEqual(
+            seen, list(Post.objects.order_by('-pub_date', '-pk')
+                       .values_list('pk', flat=True)),
+        )
+
+    def test_sparse_fieldsets(self):
+        """?fields= оставляет только нужные поля, чужие дают 400"""
+        url = reverse('api:group', kwargs={'slug': 'test-slug'})
+        results = read(self.guest_client.get(url, {'fields': 'id,text'}))
+        self.assertTrue(results['results'])
+        for post in results['results']:
+            self.assertEqual(set(post), {'id', 'text'})
+        response = self.guest_client.get(url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_profile_and_follow_feeds(self):
+        """Лента автора и лента подписок; подписки только после входа"""
+        profile = read(self.guest_client.get(
+            reverse('api:profile', kwargs={'username': 'auth'})
+        ))
+        self.assertEqual(
+            [post['id'] for post in profile['results']], [self.post.pk]
+        )
+        url = reverse('api:follow')
+        self.assertEqual(self.guest_client.get(url).status_code, 401)
+        Follow.objects.create(user=self.user, author=self.user2)
+        follow = read(self.authorized_client.get(url))
+        self.assertEqual(
+            {post['author']['username'] for post in follow['results']},
+            {'auth2'},
+        )
+
+    def test_post_detail_with_comments(self):
+        """Пост отдаётся вместе с комментариями"""
+        Comment.objects.create(post=self.post, author=self.user2, text='Да')
+        data = read(self.guest_client.get(
+            reverse('api:post_detail', kwargs={'post_id': self.post.pk})
+        ))
+        self.assertEqual(data['post']['id'], self.post.pk)
+        self.assertEqual(
+            [comment['text'] for comment in data['comments']],
+            ['Какой-то комментарий', 'Да'],
+        )
+
+    def test_not_found_and_budgets(self):
+        """Несуществующие объекты — 404 в JSON, view в бюджете"""
+        for url in (
+            reverse('api:group', kwargs={'slug': 'nope'}),
+            reverse('api:profile', kwargs={'username': 'nope'}),
+            reverse('api:post_detail', kwargs={'post_id': 999}),
+        ):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertIn('detail', response.json())
+        for url in (
+            reverse('api:index'),
+            reverse('api:group', kwargs={'slug': 'test-slug'}),
+            reverse('api:profile', kwargs={'username': 'auth'}),
+            reverse('api:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('api:follow'),
+        ):
+            with self.subTest(url=url):
+                self.assertWithinQueryBudget(self.authorized_client, url)
+
+    def test_not_modified(self):
+        """Повторный запрос с ETag получает 304"""
+        url = reverse('api:index')
+        etag = self.guest_client.get(url)['ETag']
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,176 @@
+import json
+
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from core.query_budget import query_budget
+from posts import export, timelines
+from posts.conditional import (
+    conditional_page, group_scopes, index_scopes, post_scopes, profile_scopes,
+)
+from posts.models import Group, Post, User
+
+from . import batch
+from .serializers import (
+    CHUNK_SIZE, FieldError, feed_parts, parse_fields, post_parts,
+)
+
+
+def error(status, detail):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def page_size(request):
+    try:
+        limit = int(request.GET.get('limit', settings.API_PAGE_SIZE))
+    except ValueError:
+        return settings.API_PAGE_SIZE
+    return min(max(limit, 1), settings.API_MAX_PAGE_SIZE)
+
+
+def streamed(parts):
+    response = StreamingHttpResponse(
+        export.chunked(parts, CHUNK_SIZE), content_type='application/json'
+    )
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def feed(request, posts):
+    """Страница ленты по курсору с полями из ?fields=.
+
+    Посты читаются уже при отдаче ответа, после выхода из view, поэтому
+    бюджет запросов view не включает запрос самой страницы.
+    """
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+    except FieldError as unknown:
+        return error(400, f'Неизвестные поля: {unknown}')
+    params = request.GET.copy()
+
+    def next_url(cursor):
+        params['cursor'] = cursor
+        return f'{request.path}?{params.urlencode()}'
+
+    return streamed(feed_parts(
+        posts, fields, request.GET.get('cursor'), page_size(request),
+        next_url,
+    ))
+
+
+@require_GET
+@conditional_page(index_scopes)
+@query_budget(2)
+def index(request):
+    return feed(request, Post.objects.all())
+
+
+@require_GET
+@conditional_page(group_scopes)
+@query_budget(4)
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return error(404, 'Группа не найдена')
+    return feed(request, group.posts.all())
+
+
+@require_GET
+@conditional_page(profile_scopes)
+@query_budget(4)
+def profile_posts(request, username):
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return error(404, 'Автор не найден')
+    return feed(request, author.posts.all())
+
+
+@require_GET
+@query_budget(3)
+def follow_posts(request):
+    if not request.user.is_authenticated:
+        return error(401, 'Нужно войти')
+    return feed(request, timelines.feed(request.user))
+
+
+@require_GET
+@conditional_page(post_scopes)
+@query_budget(4)
+def post_detail(request, post_id):
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+    except FieldError as unknown:
+        return error(400, f'Неизвестные поля: {unknown}')
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=post_id
+    ).first()
+    if post is None:
+        return error(404, 'Пост не найден')
+    comments = post.comments.select_related('author')
+    return streamed(post_parts(post, fields, comments))
+
+
+@csrf_exempt
+@require_POST
+@query_budget(12)
+def batch_view(request):
+    """Несколько подзапросов за один HTTP-запрос.
+
+    Тело — {"requests": [{"id": ..., "type": ..., ...}]}, ответ —
+    {"responses": {id: {"status": ..., "body": ...}}}. Все подзапросы
+    только читают данные, поэтому CSRF-токен не нужен.
+    """
+    try:
+        requests = json.loads(request.body)['requests']
+        batch.validate(requests)
+    except (ValueError, KeyError, TypeError) as problem:
+        return error(400, f'Неверный пакет: {problem}')
+    return JsonResponse({'responses': batch.run(requests, request.user)})
+
+
+@require_GET
+@query_budget(2)
+def export_view(request, kind):
+    """Выгрузка постов, комментариев или подписок в NDJSON или CSV.
+
+    Пользователь выгружает только свои данные, сотрудник — любые.
+    Оборванную выгрузку продолжают с ?after=<последний id>.
+    """
+    if not request.user.is_authenticated:
+        return error(401, 'Нужно войти')
+    params = request.GET
+    author = params.get('author', '')
+    if not request.user.is_staff:
+        if author not in ('', request.user.username):
+            return error(403, 'Можно выгружать только свои данные')
+        author = request.user.username
+    export_format = params.get('format', 'ndjson')
+    gzip = params.get('gzip') == '1'
+    try:
+        if export_format not in export.FORMATS:
+            raise ValueError(f'Неизвестный формат: {export_format}')
+        records = export.queryset(
+            kind,
+            author=author,
+            group=params.get('group'),
+            since=export.parse_moment(params.get('since')),
+            until=export.parse_moment(params.get('until'), end=True),
+        )
+        after = int(params.get('after', 0))
+    except ValueError as problem:
+        return error(400, str(problem))
+    content = export.encoded(
+        export.lines(kind, export_format, export.rows(kind, records, after)),
+        gzip=gzip,
+    )
+    content_type = export.FORMATS[export_format][0]
+    response = StreamingHttpResponse(
+        content, content_type='application/gzip' if gzip else content_type
+    )
+    response['Content-Disposition'] = 'attachment; filename="{}"'.format(
+        export.filename(kind, export_format, gzip)
+    )
+    response['Cache-Control'] = 'private, no-store'
+    return response
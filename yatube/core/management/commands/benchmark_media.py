@@ -0,0 +1,85 @@
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.views import static
+
+from core import media
+
+
+def consume(response):
+    """Сколько байт ушло бы клиенту через Python."""
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает отдачу медиа через django.views.static.serve '
+        'и через core.media.serve, с Range и с X-Accel-Redirect.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size',
+            type=int,
+            default=8,
+            help='Размер тестового файла в МБ.',
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=50,
+            help='Сколько запросов на каждый способ.',
+        )
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        size = options['size'] * 2 ** 20
+        with tempfile.NamedTemporaryFile(
+            dir=settings.MEDIA_ROOT, suffix='.bin'
+        ) as file:
+            file.write(os.urandom(size))
+            file.flush()
+            name = os.path.basename(file.name)
+            url = settings.MEDIA_URL + name
+            cases = (
+                ('static.serve', {}, lambda request: static.serve(
+                    request, name, document_root=settings.MEDIA_ROOT
+                )),
+                ('media.serve', {}, lambda request: media.serve(
+                    request, name
+                )),
+                ('media.serve Range 1 МБ', {
+                    'HTTP_RANGE': f'bytes=0-{2 ** 20 - 1}',
+                }, lambda request: media.serve(request, name)),
+                ('media.serve X-Accel', {}, self.offloaded(name)),
+            )
+            for title, headers, view in cases:
+                self.measure(
+                    title, lambda: view(factory.get(url, **headers)),
+                    options['requests'],
+                )
+
+    def offloaded(self, name):
+        def view(request):
+            with override_settings(MEDIA_SENDFILE='x-accel-redirect'):
+                return media.serve(request, name)
+        return view
+
+    def measure(self, title, call, requests):
+        sent = 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            response = call()
+            sent += consume(response)
+            response.close()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{title:<24} {requests / elapsed:8.1f} запр/с '
+            f'{sent / 2 ** 20 / elapsed:8.1f} МБ/с через Python'
+        )
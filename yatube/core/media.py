@@ -0,0 +1,143 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+SENDFILE_HEADERS = {
+    'x-sendfile': 'X-Sendfile',
+    'x-accel-redirect': 'X-Accel-Redirect',
+}
+
+
+class FileRange:
+    """Кусок открытого файла для FileResponse.
+
+    read() не выходит за конец куска, а fileno() оставляет серверу
+    возможность отправить его через sendfile: файл уже стоит на начале
+    куска, длину задаёт Content-Length.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """(начало, длина) одного диапазона; None — отдать файл целиком.
+
+    Несколько диапазонов сразу не поддерживаются, для них тоже None.
+    ValueError — диапазон за пределами файла.
+    """
+    match = RANGE.match(header.replace(' ', ''))
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if not first:
+        start = max(0, size - int(last))
+        end = size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end - start + 1
+
+
+def file_etag(stat):
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def _offloaded(name, content_type):
+    """Пустой ответ: файл отправит фронтовый сервер по заголовку."""
+    response = HttpResponse(content_type=content_type)
+    header = SENDFILE_HEADERS[settings.MEDIA_SENDFILE]
+    if header == 'X-Accel-Redirect':
+        response[header] = quote(settings.MEDIA_ACCEL_PREFIX + name)
+    else:
+        response[header] = safe_join(settings.MEDIA_ROOT, name)
+    return response
+
+
+def _streamed(request, path, stat, etag, content_type):
+    response_range = None
+    header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if header and (not if_range or if_range == etag):
+        try:
+            response_range = parse_range(header, stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+    file = open(path, 'rb')
+    if response_range is None:
+        response = FileResponse(file, content_type=content_type)
+        response['Content-Length'] = stat.st_size
+        return response
+    start, length = response_range
+    response = FileResponse(
+        FileRange(file, start, length), content_type=content_type, status=206
+    )
+    response['Content-Length'] = length
+    response['Content-Range'] = (
+        f'bytes {start}-{start + length - 1}/{stat.st_size}'
+    )
+    return response
+
+
+def serve(request, path):
+    """Отдаёт файл из MEDIA_ROOT для продакшена.
+
+    Поддерживает If-None-Match/If-Modified-Since и один диапазон Range.
+    При MEDIA_SENDFILE сам файл отправляет фронтовый сервер, иначе
+    FileResponse, который WSGI-сервер может отдать через sendfile.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    etag = file_etag(stat)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if response is None:
+        content_type = (
+            mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+        )
+        if settings.MEDIA_SENDFILE:
+            response = _offloaded(path, content_type)
+        else:
+            response = _streamed(request, full_path, stat, etag, content_type)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Accept-Ranges'] = 'bytes'
+    patch_cache_control(response, public=True, max_age=settings.MEDIA_MAX_AGE)
+    return response
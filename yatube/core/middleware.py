@@ -0,0 +1,25 @@
+import logging
+
+from .query_budget import QueryCounter, get_query_budget
+
+logger = logging.getLogger('yatube.query_budget')
+
+
+class QueryBudgetMiddleware:
+    """Пишет в лог запросы, превысившие объявленный бюджет SQL-запросов."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryCounter() as counter:
+            response = self.get_response(request)
+        match = request.resolver_match
+        budget = get_query_budget(match.func) if match else None
+        if budget is not None and len(counter) > budget:
+            logger.warning(
+                '%s: %d SQL-запросов при бюджете %d',
+                request.path, len(counter), budget,
+                extra={'queries': counter.queries},
+            )
+        return response
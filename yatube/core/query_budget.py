@@ -0,0 +1,68 @@
+from contextlib import ExitStack
+
+from django.db import connections
+from django.urls import resolve
+
+TRANSACTION_STATEMENTS = (
+    'BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE SAVEPOINT'
+)
+
+
+def query_budget(limit):
+    """Объявляет, сколько запросов к БД может сделать view за один запрос."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+def get_query_budget(view):
+    return getattr(view, 'query_budget', None)
+
+
+class QueryCounter:
+    """Считает SQL-запросы ко всем базам внутри блока with.
+
+    Работает через execute_wrapper, поэтому не зависит от DEBUG.
+    Управление транзакциями и точками сохранения не считается.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.upper().startswith(TRANSACTION_STATEMENTS):
+            self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in connections:
+            self._stack.enter_context(
+                connections[alias].execute_wrapper(self)
+            )
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __len__(self):
+        return len(self.queries)
+
+
+class QueryBudgetMixin:
+    """Проверки бюджета запросов для TestCase."""
+
+    def assertWithinQueryBudget(self, client, url, data=None, method='get'):
+        budget = get_query_budget(resolve(url.split('?')[0]).func)
+        self.assertIsNotNone(budget, f'Для {url} не объявлен бюджет запросов')
+        with QueryCounter() as counter:
+            response = getattr(client, method)(url, data)
+        self.assertLessEqual(
+            len(counter),
+            budget,
+            f'{url}: {len(counter)} запросов при бюджете {budget}:\n'
+            + '\n'.join(counter.queries),
+        )
+        return response
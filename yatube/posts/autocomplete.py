@@ -0,0 +1,336 @@
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.urls import reverse
+
+from .models import Group, User
+
+logger = logging.getLogger('yatube.autocomplete')
+
+GENERATION_KEY = 'autocomplete:gen'
+# Сколько изменений процесс догоняет по журналу, а не перечитывает всё.
+MAX_PENDING = 1000
+CHANGE_TIMEOUT = 60 * 60
+# Префиксы, под которые попадает столько строк, запоминаются до изменения
+# подходящих под них объектов: иначе каждый ответ перебирал бы их заново.
+MEMO_MIN_MATCHES = 256
+# Больше любого символа в строках индекса.
+PREFIX_END = '\U0010ffff'
+USER, GROUP = 'user', 'group'
+
+
+def normalize(text):
+    return ' '.join(text.casefold().replace('ё', 'е').split())
+
+
+def terms(*phrases):
+    """Строки, по префиксу которых ищется объект: фраза с каждого слова."""
+    result = set()
+    for phrase in phrases:
+        words = normalize(phrase).split()
+        for i in range(len(words)):
+            result.add(' '.join(words[i:]))
+    return result
+
+
+def user_item(pk, username, first_name, last_name):
+    full_name = f'{first_name} {last_name}'.strip()
+    label = f'{full_name} (@{username})' if full_name else username
+    return USER, pk, label, username, terms(username, full_name)
+
+
+def group_item(pk, title, slug):
+    return GROUP, pk, title, slug, terms(title, slug)
+
+
+class PrefixIndex:
+    """Отсортированный список (строка, вид, pk) для поиска по префиксу.
+
+    Каждый процесс держит свою копию. Изменения из сигналов пишутся
+    в журнал в кэше, и процесс догоняет его перед ответом, не обращаясь
+    к базе; целиком индекс перечитывается раз в AUTOCOMPLETE_REFRESH
+    секунд в фоновом потоке, выравнивая накопившийся дрейф рангов.
+
+    Изменения применяются под lock, а lookup читает без него: поэтому
+    ни список строк, ни запомненные ответы не правятся на месте, а
+    заменяются новыми списками, и lookup запоминает ответ, только если
+    за время поиска не было изменений (version).
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        self.entries = []
+        self.draft = None
+        self.reloader = None
+        self.items = {}
+        self.memo = {}
+        self.version = 0
+        self.generation = None
+        self.loaded_at = None
+        self.checked_at = None
+
+    def load(self):
+        """Перечитывает всё из базы; ответы идут по старому до подмены."""
+        generation = current_generation()
+        fresh = PrefixIndex()
+        fresh.draft = []
+        users = User.objects.values_list(
+            'pk', 'username', 'first_name', 'last_name',
+            'stats__followers_count',
+        )
+        for pk, username, first_name, last_name, followers in users:
+            fresh.put(*user_item(pk, username, first_name, last_name),
+                      rank=followers or 0, ordered=False)
+        groups = Group.objects.values_list(
+            'pk', 'title', 'slug', 'posts_count'
+        )
+        for pk, title, slug, posts_count in groups:
+            fresh.put(*group_item(pk, title, slug), rank=posts_count,
+                      ordered=False)
+        fresh.draft.sort()
+        with self.lock:
+            self.entries, self.items = fresh.draft, fresh.items
+            self.memo = {}
+            self.version += 1
+            self.generation = generation
+            self.loaded_at = self.checked_at = time.monotonic()
+
+    def reload(self):
+        """Перечитывает индекс в фоновом потоке, если он ещё не идёт."""
+        if self.reloader is None:
+            self.reloader = threading.Thread(target=self.load_quietly)
+            self.reloader.daemon = True
+            self.reloader.start()
+
+    def load_quietly(self):
+        try:
+            self.load()
+        except Exception:
+            logger.exception('Не удалось перечитать индекс подсказок')
+        finally:
+            self.reloader = None
+            connection.close()
+
+    def put(self, kind, pk, label, value, item_terms, rank=None,
+            ordered=True):
+        """Добавляет или заменяет объект; rank=None сохраняет прежний."""
+        previous = self.drop(kind, pk)
+        if rank is None:
+            rank = previous[0] if previous else 0
+        self.items[kind, pk] = [rank, label, value, item_terms]
+        self.promote((kind, pk))
+        for term in item_terms:
+            if ordered:
+                insort(self.draft, (term, kind, pk))
+            else:
+                self.draft.append((term, kind, pk))
+
+    def drop(self, kind, pk):
+        item = self.items.pop((kind, pk), None)
+        if item is not None:
+            self.forget((kind, pk), item[3])
+            for term in item[3]:
+                i = bisect_left(self.draft, (term, kind, pk))
+                if i < len(self.draft) and self.draft[i] == (term, kind, pk):
+                    del self.draft[i]
+        return item
+
+    def rank(self, kind, pk, delta):
+        item = self.items.get((kind, pk))
+        if item is not None:
+            if delta < 0:
+                self.forget((kind, pk), item[3])
+            item[0] = max(0, item[0] + delta)
+            if delta > 0:
+                self.promote((kind, pk))
+
+    def order(self, ref):
+        item = self.items.get(ref)
+        return (item[0] if item else -1), -ref[1]
+
+    def memo_keys(self, item_terms):
+        return [
+            key for key in list(self.memo)
+            if any(term.startswith(key[0]) for term in item_terms)
+        ]
+
+    def forget(self, ref, item_terms):
+        """Сбрасывает запомненные ответы, где объект был среди лучших."""
+        for key in self.memo_keys(item_terms):
+            if ref in self.memo.get(key, ()):
+                self.memo.pop(key, None)
+
+    def promote(self, ref):
+        """Ставит новый или поднявшийся объект в запомненные ответы."""
+        for key in self.memo_keys(self.items[ref][3]):
+            best = list(self.memo.get(key, ()))
+            if ref not in best:
+                if len(best) < key[1]:
+                    best.append(ref)
+                elif self.order(ref) > self.order(best[-1]):
+                    best[-1] = ref
+            self.memo[key] = sorted(best, key=self.order, reverse=True)
+
+    def apply(self, *changes):
+        """Применяет изменения к копии списка строк и подменяет его."""
+        self.draft = list(self.entries)
+        for action, *args in changes:
+            self.version += 1
+            getattr(self, action)(*args)
+        self.entries, self.draft = self.draft, None
+
+    def sync(self):
+        """Подтягивает изменения других процессов из журнала в кэше.
+
+        Впервые индекс читается из базы в самом запросе, а дальше —
+        в фоновом потоке, и до подмены ответы идут по старому.
+        """
+        now = time.monotonic()
+        if self.checked_at is not None and (
+            now - self.checked_at < settings.AUTOCOMPLETE_SYNC_INTERVAL
+        ):
+            return
+        with self.lock:
+            if self.loaded_at is None:
+                self.load()
+                return
+            self.checked_at = now
+            generation = cache.get(GENERATION_KEY)
+            stale = (
+                now - self.loaded_at > settings.AUTOCOMPLETE_REFRESH
+                or generation is None
+                or not 0 <= generation - self.generation <= MAX_PENDING
+            )
+            if not stale and generation != self.generation:
+                keys = [
+                    change_key(number)
+                    for number in range(self.generation + 1, generation + 1)
+                ]
+                changes = cache.get_many(keys)
+                stale = len(changes) < len(keys)
+                if not stale:
+                    self.apply(*(changes[key] for key in keys))
+                    self.generation = generation
+            if stale:
+                self.reload()
+
+    def lookup(self, prefix, limit):
+        """Лучшие по рангу объекты, у которых слово начинается с prefix."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        memo_key = (prefix, limit)
+        best = self.memo.get(memo_key)
+        if best is not None:
+            return self.payloads(best)
+        version = self.version
+        entries = self.entries
+        start = bisect_left(entries, (prefix,))
+        end = bisect_left(entries, (prefix + PREFIX_END,), start)
+        found = {(kind, pk) for _, kind, pk in entries[start:end]}
+        best = heapq.nlargest(limit, found, key=self.order)
+        if end - start >= MEMO_MIN_MATCHES:
+            self.remember(memo_key, best, version)
+        return self.payloads(best)
+
+    def remember(self, memo_key, best, version):
+        """Запоминает ответ, если индекс не менялся с начала поиска.
+
+        Пока другой поток держит lock (догоняет журнал или перечитывает
+        базу), ответ просто не запоминается, а не ждёт.
+        """
+        if not self.lock.acquire(blocking=False):
+            return
+        try:
+            if self.version == version:
+                self.memo[memo_key] = best
+        finally:
+            self.lock.release()
+
+    def payloads(self, best):
+        items = self.items
+        return [
+            payload(kind, items[kind, pk])
+            for kind, pk in best if (kind, pk) in items
+        ]
+
+    def expire(self):
+        """Заставляет проверить журнал при следующем обращении."""
+        self.checked_at = None
+
+
+def payload(kind, item):
+    _, label, value, _ = item
+    if kind == USER:
+        url = reverse('posts:profile', kwargs={'username': value})
+    else:
+        url = reverse('posts:group_list', kwargs={'slug': value})
+    return {'type': kind, 'label': label, 'value': value, 'url': url}
+
+
+def change_key(generation):
+    return f'autocomplete:change:{generation}'
+
+
+def current_generation():
+    cache.add(GENERATION_KEY, 0, None)
+    return cache.get(GENERATION_KEY, 0)
+
+
+def record(*change):
+    """Пишет изменение в журнал после коммита: откаченное не попадёт."""
+    transaction.on_commit(partial(publish, change))
+
+
+def publish(change):
+    """Пишет изменение в журнал; процессы применят его сами."""
+    try:
+        generation = cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, 0, None)
+        generation = cache.incr(GENERATION_KEY)
+    cache.set(change_key(generation), change, CHANGE_TIMEOUT)
+    index.expire()
+
+
+def user_changed(user):
+    record('put', *user_item(
+        user.pk, user.username, user.first_name, user.last_name
+    ))
+
+
+def group_changed(group):
+    record('put', *group_item(group.pk, group.title, group.slug),
+           group.posts_count)
+
+
+def removed(kind, pk):
+    record('drop', kind, pk)
+
+
+def ranked(kind, pk, delta):
+    record('rank', kind, pk, delta)
+
+
+def reload_everywhere():
+    """После массовых изменений мимо сигналов: все процессы перечитают."""
+    cache.delete(GENERATION_KEY)
+    index.expire()
+
+
+def lookup(prefix, limit=None):
+    index.sync()
+    return index.lookup(prefix, limit or settings.AUTOCOMPLETE_LIMIT)
+
+
+index = PrefixIndex()
@@ -0,0 +1,77 @@
+import hashlib
+from datetime import datetime, timezone
+
+from django.views.decorators.http import condition
+
+from . import feed_cache
+from .models import Group, Post, User
+
+
+def _scope_of(name, queryset):
+    pk = queryset.first()
+    return None if pk is None else [feed_cache.scope(name, pk)]
+
+
+def index_scopes(request):
+    return ['index']
+
+
+def group_scopes(request, slug):
+    return _scope_of(
+        'group', Group.objects.filter(slug=slug).values_list('pk', flat=True)
+    )
+
+
+def profile_scopes(request, username):
+    return _scope_of(
+        'profile',
+        User.objects.filter(username=username).values_list('pk', flat=True),
+    )
+
+
+def post_scopes(request, post_id):
+    return _scope_of(
+        'profile',
+        Post.objects.filter(pk=post_id).values_list('author_id', flat=True),
+    )
+
+
+def _scopes(request, get_scopes, args, kwargs):
+    """Области страницы: один запрос по уникальному индексу на запрос."""
+    if not hasattr(request, '_validator_scopes'):
+        scopes = get_scopes(request, *args, **kwargs)
+        if scopes is not None:
+            scopes = [feed_cache.GLOBAL, *scopes]
+        request._validator_scopes = scopes
+    return request._validator_scopes
+
+
+def conditional_page(get_scopes):
+    """Отдаёт 304 по ETag/Last-Modified до отрисовки страницы.
+
+    ETag складывается из адреса, пользователя и поколений областей
+    кэша лент, от которых зависит страница. Last-Modified отдаётся
+    только гостям: у вошедших на странице есть личные фрагменты.
+    """
+    def etag(request, *args, **kwargs):
+        scopes = _scopes(request, get_scopes, args, kwargs)
+        if scopes is None:
+            return None
+        current = feed_cache.generations(*scopes)
+        raw = '|'.join((
+            request.get_full_path(),
+            str(request.user.pk),
+            *(f'{scope}={current[scope]}' for scope in sorted(current)),
+        ))
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return None
+        scopes = _scopes(request, get_scopes, args, kwargs)
+        changed = scopes and feed_cache.changed_at(*scopes)
+        if not changed:
+            return None
+        return datetime.fromtimestamp(changed, timezone.utc)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
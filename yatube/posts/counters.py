@@ -0,0 +1,164 @@
+from django.db import connection
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def change(model, pk, field, delta, **values):
+    """Сдвигает счётчик на delta одним UPDATE, не уходя ниже нуля.
+
+    Поля из values записываются тем же запросом.
+    """
+    rows = model.objects.filter(pk=pk)
+    if delta < 0:
+        rows = rows.filter(**{f'{field}__gte': -delta})
+    return rows.update(**{field: F(field) + delta}, **values)
+
+
+def change_user(user_id, field, delta):
+    if not change(UserStats, user_id, field, delta) and delta > 0:
+        recount_user(user_id)
+
+
+def count_of(model, field):
+    """Подзапрос с числом строк model, ссылающихся на внешний pk."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')}).order_by()
+            .values(field).annotate(num=Count('pk')).values('num'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+USER_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+RECOUNTS = (
+    (
+        UserStats,
+        User.objects.all(),
+        'user_id',
+        {
+            field: count_of(model, related)
+            for field, (model, related) in USER_COUNTERS.items()
+        },
+    ),
+    (Post, Post.objects.all(), 'pk', {
+        'comments_count': count_of(Comment, 'post'),
+    }),
+    (Group, Group.objects.all(), 'pk', {
+        'posts_count': count_of(Post, 'group'),
+    }),
+)
+
+
+def insert_select(model, names, rows):
+    """Вставляет строки запроса rows в поля names одним INSERT ... SELECT.
+
+    Строки не проходят через Python; уже существующие пропускаются.
+    """
+    sql, params = rows.query.sql_with_params()
+    quote = connection.ops.quote_name
+    columns = ', '.join(
+        quote(model._meta.get_field(name).column) for name in names
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{connection.ops.insert_statement(ignore_conflicts=True)} '
+            f'{quote(model._meta.db_table)} ({columns}) {sql}'
+            f'{connection.ops.ignore_conflicts_suffix_sql(True)}',
+            params,
+        )
+        return cursor.rowcount
+
+
+def recount(users, posts, groups):
+    """Пересчитывает счётчики строк с pk из запросов users, posts, groups.
+
+    Считает база: UPDATE с подзапросами и INSERT ... SELECT для
+    недостающих записей UserStats, строки в Python не читаются.
+    """
+    user_counts = {
+        field: count_of(model, related)
+        for field, (model, related) in USER_COUNTERS.items()
+    }
+    UserStats.objects.filter(pk__in=users).update(**user_counts)
+    insert_select(
+        UserStats,
+        ['user', *USER_COUNTERS],
+        User.objects.filter(pk__in=users, stats__isnull=True).order_by()
+        .annotate(**user_counts).values_list('pk', *USER_COUNTERS),
+    )
+    Post.objects.filter(pk__in=posts).update(
+        comments_count=count_of(Comment, 'post')
+    )
+    Group.objects.filter(pk__in=groups).update(
+        posts_count=count_of(Post, 'group')
+    )
+
+
+def recount_user(user_id):
+    """Пересчитывает счётчики пользователя, при нужде создаёт запись."""
+    counts = User.objects.filter(pk=user_id).annotate(**{
+        field: count_of(model, related)
+        for field, (model, related) in USER_COUNTERS.items()
+    }).values(*USER_COUNTERS).first()
+    if counts is not None:
+        UserStats.objects.update_or_create(user_id=user_id, defaults=counts)
+
+
+def stats_for(user):
+    """Счётчики пользователя без запросов, если они уже подгружены."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        recount_user(user.pk)
+        return UserStats.objects.get(pk=user.pk)
+
+
+def drift(batch_size=1000):
+    """Выдаёт расхождения (модель, pk, поле, хранимое, реальное).
+
+    Записи обходятся по возрастанию pk пачками, память не растёт
+    с размером таблиц.
+    """
+    for model, source, key, counts in RECOUNTS:
+        last_pk = 0
+        fields = list(counts)
+        while True:
+            rows = list(
+                source.filter(pk__gt=last_pk).order_by('pk')
+                .annotate(**{f'real_{f}': e for f, e in counts.items()})
+                .values('pk', *(f'real_{f}' for f in fields))[:batch_size]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1]['pk']
+            stored = {
+                row[key]: row
+                for row in model.objects.filter(
+                    **{f'{key}__in': [row['pk'] for row in rows]}
+                ).values(key, *fields)
+            }
+            for row in rows:
+                current = stored.get(row['pk'])
+                for field in fields:
+                    real = row[f'real_{field}']
+                    value = None if current is None else current[field]
+                    if value != real:
+                        yield model, row['pk'], field, value, real
+
+
+def fix(model, pk, field, value):
+    if model is UserStats:
+        UserStats.objects.update_or_create(
+            user_id=pk, defaults={field: value}
+        )
+    else:
+        model.objects.filter(pk=pk).update(**{field: value})
@@ -0,0 +1,178 @@
+import csv
+import json
+from datetime import date, datetime, time
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.text import compress_sequence
+
+from .models import Comment, Follow, Post
+
+# Выгрузка отдаётся блоками не меньше этого размера, а не строкой на запись.
+CHUNK_SIZE = 64 * 1024
+FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+}
+
+# Вид выгрузки: модель, колонки (имя -> поле для values_list),
+# фильтры по автору и группе и поле даты. None — фильтра нет.
+KINDS = {
+    'posts': (
+        Post,
+        {
+            'id': 'pk',
+            'author': 'author__username',
+            'group': 'group__slug',
+            'text': 'text',
+            'pub_date': 'pub_date',
+            'image': 'image',
+        },
+        lambda username: Q(author__username=username),
+        lambda slug: Q(group__slug=slug),
+        'pub_date',
+    ),
+    'comments': (
+        Comment,
+        {
+            'id': 'pk',
+            'post': 'post_id',
+            'author': 'author__username',
+            'text': 'text',
+            'created': 'created',
+        },
+        lambda username: Q(author__username=username),
+        lambda slug: Q(post__group__slug=slug),
+        'created',
+    ),
+    'follows': (
+        Follow,
+        {
+            'id': 'pk',
+            'user': 'user__username',
+            'author': 'author__username',
+        },
+        lambda username: (
+            Q(user__username=username) | Q(author__username=username)
+        ),
+        None,
+        None,
+    ),
+}
+
+
+def parse_moment(value, end=False):
+    """Дата или дата со временем из строки; дата — начало или конец дня."""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Неверная дата: {value}')
+        moment = datetime.combine(day, time.max if end else time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def queryset(kind, author=None, group=None, since=None, until=None):
+    """Записи вида по фильтрам; ValueError — фильтр к виду не подходит."""
+    if kind not in KINDS:
+        raise ValueError(f'Неизвестный вид: {kind}')
+    model, _, by_author, by_group, date_field = KINDS[kind]
+    rows = model.objects.order_by('pk')
+    if author:
+        rows = rows.filter(by_author(author))
+    if group:
+        if by_group is None:
+            raise ValueError(f'У {kind} нет группы')
+        rows = rows.filter(by_group(group))
+    if since or until:
+        if date_field is None:
+            raise ValueError(f'У {kind} нет даты')
+        if since:
+            rows = rows.filter(**{f'{date_field}__gte': since})
+        if until:
+            rows = rows.filter(**{f'{date_field}__lte': until})
+    return rows
+
+
+def rows(kind, records, after=0, batch_size=1000):
+    """Кортежи колонок вида по возрастанию id, пачками по ключу.
+
+    Каждая пачка — отдельный запрос id > последнего, так что память
+    не растёт с размером выгрузки, а оборванную выгрузку можно
+    продолжить с последнего полученного id.
+    """
+    fields = list(KINDS[kind][1].values())
+    last_pk = after
+    while True:
+        batch = list(
+            records.filter(pk__gt=last_pk).values_list(*fields)[:batch_size]
+        )
+        if not batch:
+            return
+        yield from batch
+        last_pk = batch[-1][0]
+
+
+def plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def ndjson_lines(columns, records):
+    for record in records:
+        yield json.dumps(
+            dict(zip(columns, map(plain, record))), ensure_ascii=False
+        ) + '\n'
+
+
+class Echo:
+    """Файл для csv.writer, который просто возвращает записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(columns, records):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for record in records:
+        yield writer.writerow([plain(value) for value in record])
+
+
+def lines(kind, export_format, records):
+    columns = list(KINDS[kind][1])
+    if export_format == 'csv':
+        return csv_lines(columns, records)
+    return ndjson_lines(columns, records)
+
+
+def chunked(parts, size=CHUNK_SIZE):
+    """Склеивает мелкие куски ответа в блоки примерно по size байт."""
+    buffer = []
+    length = 0
+    for part in parts:
+        buffer.append(part)
+        length += len(part)
+        if length >= size:
+            yield ''.join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def encoded(parts, gzip=False):
+    """Блоки выгрузки в байтах, при gzip — сжатые на лету."""
+    blocks = (block.encode() for block in chunked(parts))
+    return compress_sequence(blocks) if gzip else blocks
+
+
+def filename(kind, export_format, gzip=False):
+    name = f'{kind}.{FORMATS[export_format][1]}'
+    return f'{name}.gz' if gzip else name
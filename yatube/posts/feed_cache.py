@@ -0,0 +1,127 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+GLOBAL = 'all'
+STATS_KEYS = {
+    'hits': 'feedcache:stats:hits',
+    'misses': 'feedcache:stats:misses',
+}
+
+
+def scope(name, pk=None):
+    return name if pk is None else f'{name}:{pk}'
+
+
+def _generation_key(scope):
+    return f'feedcache:gen:{scope}'
+
+
+def _changed_key(scope):
+    return f'feedcache:changed:{scope}'
+
+
+def _initial_generation():
+    """Стартовое поколение не совпадёт с поколениями до вытеснения."""
+    return int(time.time() * 1000)
+
+
+def generations(*scopes):
+    """Текущие поколения областей; отсутствующие заводятся заново."""
+    keys = {_generation_key(scope): scope for scope in scopes}
+    found = cache.get_many(list(keys))
+    result = {}
+    for key, scope in keys.items():
+        if key not in found:
+            cache.add(_changed_key(scope), time.time(), None)
+            cache.add(key, _initial_generation(), None)
+            found[key] = cache.get(key)
+        result[scope] = found[key]
+    return result
+
+
+def bump(*scopes):
+    """Сбрасывает все фрагменты областей, увеличивая их поколение."""
+    scopes = set(scopes)
+    for scope in scopes:
+        key = _generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_generation(), None)
+    now = time.time()
+    cache.set_many({_changed_key(scope): now for scope in scopes}, None)
+
+
+def changed_at(*scopes):
+    """Время последнего сброса областей или None, если оно неизвестно."""
+    found = cache.get_many([_changed_key(scope) for scope in scopes])
+    if len(found) < len(scopes):
+        return None
+    return max(found.values())
+
+
+def fragment_key(scope, vary=''):
+    current = generations(GLOBAL, scope)
+    digest = hashlib.md5(vary.encode()).hexdigest()
+    return (
+        f'feedcache:{scope}:{current[GLOBAL]}.{current[scope]}:{digest}'
+    )
+
+
+def record(name):
+    key = STATS_KEYS[name]
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def get_or_render(key, render):
+    content = cache.get(key)
+    if content is not None:
+        record('hits')
+        return content
+    record('misses')
+    content = render()
+    cache.set(key, content, settings.FEED_CACHE_TIMEOUT)
+    return content
+
+
+def stats():
+    found = cache.get_many(list(STATS_KEYS.values()))
+    result = {name: found.get(key, 0) for name, key in STATS_KEYS.items()}
+    total = result['hits'] + result['misses']
+    result['hit_ratio'] = result['hits'] / total if total else None
+    return result
+
+
+def post_scopes(author_id, group_id):
+    scopes = ['index', scope('profile', author_id)]
+    if group_id:
+        scopes.append(scope('group', group_id))
+    return scopes
+
+
+def card_key(variant, post):
+    """Ключ карточки поста: меняется вместе с post.modified."""
+    return (
+        f'feedcache:card:{variant}:{post.pk}:'
+        f'{post.modified.timestamp()}'
+    )
+
+
+def cached_cards(variant, posts):
+    """Готовые карточки страницы одним запросом к кэшу."""
+    found = cache.get_many([card_key(variant, post) for post in posts])
+    return {
+        post.pk: found[card_key(variant, post)]
+        for post in posts if card_key(variant, post) in found
+    }
+
+
+def store_card(variant, post, content):
+    cache.set(card_key(variant, post), content, settings.FEED_CACHE_TIMEOUT)
@@ -0,0 +1,234 @@
+import random
+from datetime import datetime, timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageDraw
+
+from . import media
+from .imaging import metadata
+
+# Даты отсчитываются от фиксированного момента, а не от текущего:
+# иначе одно и то же зерно давало бы разные наборы.
+START = datetime(2021, 1, 1, tzinfo=timezone.utc)
+# Показатели закона Ципфа: подписчики, активность авторов, популярность
+# групп, постов под комментарии и картинок.
+FOLLOWERS_SKEW = 1.1
+POSTING_SKEW = 0.8
+GROUPS_SKEW = 1.0
+COMMENTS_SKEW = 1.0
+IMAGES_SKEW = 1.0
+# Доля постов без группы и доля постов с картинкой.
+UNGROUPED = 0.3
+WITH_IMAGE = 0.2
+# С такой вероятностью следующий пост автора продолжает серию, а средний
+# промежуток между постами серии — BURST_GAP секунд.
+BURST = 0.7
+BURST_GAP = 20 * 60
+# Средняя задержка комментария после поста, с.
+COMMENT_DELAY = 6 * 60 * 60
+IMAGE_SIZES = ((640, 480), (800, 600), (1024, 768), (1200, 800), (600, 600))
+
+WORDS = (
+    'день', 'город', 'море', 'книга', 'письмо', 'утро', 'вечер', 'дорога',
+    'друг', 'дом', 'окно', 'сад', 'поле', 'река', 'лес', 'снег', 'дождь',
+    'солнце', 'ветер', 'время', 'жизнь', 'мысль', 'слово', 'вопрос',
+    'работа', 'история', 'музыка', 'картина', 'встреча', 'путь', 'сегодня',
+    'вчера', 'снова', 'долго', 'тихо', 'быстро', 'хорошо', 'странно',
+    'новый', 'старый', 'первый', 'последний', 'большой', 'светлый',
+    'читал', 'видел', 'писал', 'думал', 'шёл', 'ждал', 'помнил', 'знал',
+    'и', 'в', 'на', 'с', 'но', 'что', 'как', 'не', 'уже', 'ещё', 'очень',
+)
+FIRST_NAMES = (
+    'Анна', 'Борис', 'Вера', 'Глеб', 'Дарья', 'Егор', 'Жанна', 'Илья',
+    'Ксения', 'Лев', 'Мария', 'Никита', 'Ольга', 'Пётр', 'Софья', 'Фёдор',
+)
+LAST_NAMES = (
+    'Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Лебедев',
+    'Козлов', 'Новиков', 'Морозов', 'Волков', 'Зайцев', 'Павлов',
+)
+
+
+class Skewed:
+    """Выбор по закону Ципфа: первые значения выпадают чаще всех."""
+
+    def __init__(self, rng, values, skew, shuffle=True):
+        self.random = rng
+        self.order = list(values)
+        if shuffle:
+            rng.shuffle(self.order)
+        self.weights = list(accumulate(
+            1 / rank ** skew for rank in range(1, len(self.order) + 1)
+        ))
+
+    def pick(self):
+        return self.random.choices(self.order, cum_weights=self.weights)[0]
+
+
+class Generator:
+    """Записи в формате dumpdata для синтетического набора данных.
+
+    Число подписчиков и активность авторов распределены по Ципфу
+    (популярные авторы к тому же пишут чаще), посты идут сериями,
+    комментарии собираются под немногими постами с длинным хвостом.
+    Всё выводится из одного зерна, так что набор повторяется от
+    запуска к запуску; записываются только файлы картинок, а записи
+    грузит importer.Importer.
+    """
+
+    def __init__(self, seed=0, users=1000, groups=20, posts=10000,
+                 comments=20000, follows=5000, images=0, days=365,
+                 start=START, prefix='gen'):
+        if users < 1 and (posts or comments or follows):
+            raise ValueError('Без пользователей нет постов и подписок')
+        if users < 2 and follows:
+            raise ValueError('Для подписок нужны два пользователя')
+        if posts < 1 and comments:
+            raise ValueError('Без постов нет комментариев')
+        self.random = random.Random(seed)
+        self.counts = {
+            'users': users, 'groups': groups, 'posts': posts,
+            'comments': comments, 'follows': follows, 'images': images,
+        }
+        self.start = start
+        self.span = days * 24 * 60 * 60
+        self.prefix = prefix
+        self.post_times = []
+
+    def records(self):
+        popular = list(range(1, self.counts['users'] + 1))
+        self.random.shuffle(popular)
+        yield from self.users()
+        yield from self.groups()
+        yield from self.follows(popular)
+        yield from self.posts(popular, self.images())
+        yield from self.comments()
+
+    def moment(self, seconds):
+        return (self.start + timedelta(seconds=seconds)).isoformat()
+
+    def text(self, mu, sigma, limit):
+        length = int(self.random.lognormvariate(mu, sigma))
+        length = min(limit, max(1, length))
+        words = self.random.choices(WORDS, k=length)
+        return ' '.join(words).capitalize() + '.'
+
+    def users(self):
+        for pk in range(1, self.counts['users'] + 1):
+            yield {'model': 'auth.user', 'pk': pk, 'fields': {
+                'username': f'{self.prefix}{pk}',
+                'password': '!',
+                'first_name': self.random.choice(FIRST_NAMES),
+                'last_name': self.random.choice(LAST_NAMES),
+                'date_joined': self.moment(0),
+            }}
+
+    def groups(self):
+        for pk in range(1, self.counts['groups'] + 1):
+            yield {'model': 'posts.group', 'pk': pk, 'fields': {
+                'title': self.text(0.7, 0.3, 4).rstrip('.'),
+                'slug': f'{self.prefix}-group-{pk}',
+                'description': self.text(2.5, 0.5, 60),
+            }}
+
+    def follows(self, popular):
+        """Подписки на популярных авторов: подписчик — любой."""
+        users = self.counts['users']
+        if not self.counts['follows']:
+            return
+        authors = Skewed(self.random, popular, FOLLOWERS_SKEW, False)
+        pairs = set()
+        limit = min(self.counts['follows'], users * (users - 1))
+        attempts = 0
+        while len(pairs) < limit and attempts < limit * 20:
+            attempts += 1
+            pair = (self.random.randint(1, users), authors.pick())
+            if pair[0] == pair[1] or pair in pairs:
+                continue
+            pairs.add(pair)
+            yield {'model': 'posts.follow', 'pk': len(pairs), 'fields': {
+                'user': pair[0], 'author': pair[1],
+            }}
+
+    def images(self):
+        """Имена сгенерированных картинок с колонками image_*."""
+        storage = media.storage
+        result = []
+        for _ in range(self.counts['images']):
+            data = self.image_data()
+            name = storage.save(
+                media.field.generate_filename(None, f'{self.prefix}.jpg'),
+                ContentFile(data),
+            )
+            result.append({'image': name, **metadata(BytesIO(data))})
+        return result
+
+    def image_data(self):
+        size = self.random.choice(IMAGE_SIZES)
+        image = Image.new('RGB', size, self.color())
+        draw = ImageDraw.Draw(image)
+        for _ in range(self.random.randint(3, 12)):
+            box = sorted(self.random.sample(range(size[0]), 2)), sorted(
+                self.random.sample(range(size[1]), 2)
+            )
+            shape = self.random.choice((draw.rectangle, draw.ellipse))
+            shape(
+                (box[0][0], box[1][0], box[0][1], box[1][1]),
+                fill=self.color(),
+            )
+        output = BytesIO()
+        image.save(output, 'JPEG', quality=85)
+        return output.getvalue()
+
+    def color(self):
+        return tuple(self.random.randrange(256) for _ in range(3))
+
+    def publish_time(self, last):
+        """Секунды от начала: продолжение серии автора или новая серия."""
+        if last is not None and self.random.random() < BURST:
+            moment = last + self.random.expovariate(1 / BURST_GAP)
+            if moment < self.span:
+                return moment
+        return self.random.uniform(0, self.span)
+
+    def posts(self, popular, images):
+        authors = Skewed(self.random, popular, POSTING_SKEW, False)
+        groups = self.counts['groups'] and Skewed(
+            self.random, range(1, self.counts['groups'] + 1), GROUPS_SKEW
+        )
+        pictures = images and Skewed(self.random, images, IMAGES_SKEW)
+        last = {}
+        for pk in range(1, self.counts['posts'] + 1):
+            author = authors.pick()
+            last[author] = moment = self.publish_time(last.get(author))
+            self.post_times.append(moment)
+            fields = {
+                'text': self.text(3.0, 0.9, 300),
+                'author': author,
+                'group': None,
+                'pub_date': self.moment(moment),
+                'modified': self.moment(moment),
+            }
+            if groups and self.random.random() >= UNGROUPED:
+                fields['group'] = groups.pick()
+            if pictures and self.random.random() < WITH_IMAGE:
+                fields.update(pictures.pick())
+            yield {'model': 'posts.post', 'pk': pk, 'fields': fields}
+
+    def comments(self):
+        if not self.counts['comments']:
+            return
+        posts = Skewed(
+            self.random, range(1, len(self.post_times) + 1), COMMENTS_SKEW
+        )
+        for pk in range(1, self.counts['comments'] + 1):
+            post = posts.pick()
+            delay = self.random.expovariate(1 / COMMENT_DELAY)
+            yield {'model': 'posts.comment', 'pk': pk, 'fields': {
+                'post': post,
+                'author': self.random.randint(1, self.counts['users']),
+                'text': self.text(1.5, 0.8, 80),
+                'created': self.moment(self.post_times[post - 1] + delay),
+            }}
@@ -0,0 +1,130 @@
+# Модуль грузится в процессах пула миниатюр, поэтому без Django.
+import hashlib
+import os
+from io import BytesIO
+
+from PIL import Image, ImageOps, features
+
+# Размер, в котором шаблоны показывают картинку поста.
+SIZE = (400, 400)
+# Ширины вариантов: для узких экранов, обычный показ и двойная плотность.
+WIDTHS = (200, 400, 800)
+QUALITY = {'avif': 50, 'webp': 75, 'jpeg': 85}
+MIME_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+}
+EXTENSIONS = {'avif': 'avif', 'webp': 'webp', 'jpeg': 'jpg'}
+CHUNK_SIZE = 64 * 1024
+# Тег EXIF с поворотом снимка.
+ORIENTATION = 0x0112
+
+
+def available_formats():
+    """Форматы в порядке предпочтения; JPEG есть всегда."""
+    formats = []
+    for name in ('avif', 'webp'):
+        try:
+            if features.check_module(name):
+                formats.append(name)
+        except ValueError:
+            pass
+    return formats + ['jpeg']
+
+
+def to_rgb(image):
+    """RGB-копия с учётом поворота из EXIF и прозрачной палитры."""
+    image = ImageOps.exif_transpose(image)
+    if image.mode == 'P':
+        image = image.convert('RGBA')
+    return image.convert('RGB')
+
+
+def _encode(image, image_format):
+    output = BytesIO()
+    options = {'quality': QUALITY[image_format]}
+    if image_format == 'jpeg':
+        options.update(optimize=True, progressive=True)
+    image.save(output, image_format.upper(), **options)
+    return output.getvalue()
+
+
+def variants(data, widths=WIDTHS, formats=None):
+    """Квадратные варианты картинки: [(формат, ширина, байты)].
+
+    Ширины больше исходника пропускаются, кроме основной из SIZE.
+    """
+    formats = formats or available_formats()
+    with Image.open(BytesIO(data)) as image:
+        image = to_rgb(image)
+    largest = min(image.size)
+    result = []
+    for width in widths:
+        if width > largest and width != SIZE[0]:
+            continue
+        square = ImageOps.fit(image, (width, width), Image.LANCZOS)
+        for image_format in formats:
+            result.append(
+                (image_format, width, _encode(square, image_format))
+            )
+    return result
+
+
+def metadata(source):
+    """Размеры, формат, вес и sha256 картинки из открытого файла.
+
+    Файл читается кусками; для размеров Pillow разбирает только
+    заголовок. Поворот из EXIF учитывается.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    source.seek(0)
+    for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    source.seek(0)
+    with Image.open(source) as image:
+        width, height = image.size
+        if image.getexif().get(ORIENTATION) in (5, 6, 7, 8):
+            width, height = height, width
+        image_format = image.format
+    return {
+        'image_width': width,
+        'image_height': height,
+        'image_format': image_format.lower(),
+        'image_size': size,
+        'image_hash': digest.hexdigest(),
+    }
+
+
+def fit_size(size, width, height):
+    """Размер результата: 0 — сторона по пропорции, без увеличения."""
+    source_width, source_height = size
+    if not width:
+        width = round(source_width * height / source_height)
+    if not height:
+        height = round(source_height * width / source_width)
+    scale = min(1, source_width / width, source_height / height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def resize(source_path, target_path, width, height, image_format):
+    """Пишет картинку width×height с обрезкой по центру в target_path.
+
+    Файл пишется во временный и переименовывается, так что читатели
+    не видят его недописанным.
+    """
+    with Image.open(source_path) as image:
+        rotated = image.getexif().get(ORIENTATION) in (5, 6, 7, 8)
+        size = image.size[::-1] if rotated else image.size
+        target = fit_size(size, width, height)
+        image.draft('RGB', target[::-1] if rotated else target)
+        image = to_rgb(image)
+    image = ImageOps.fit(image, target, Image.LANCZOS)
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    temporary = f'{target_path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as output:
+        output.write(_encode(image, image_format))
+    os.replace(temporary, target_path)
+    return target_path
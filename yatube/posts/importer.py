@@ -0,0 +1,401 @@
+import gzip
+import json
+import re
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.core import serializers
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import DateField, Q
+from django.utils import timezone
+
+from . import autocomplete, counters, feed_cache, media, search, timelines
+from .models import Comment, Follow, Group, Post, User
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'\s*')
+
+# Модель дампа: класс, ссылки (attname -> модель дампа) и поле, по
+# которому строка совпадает с уже существующей и не вставляется.
+# Порядок — порядок вставки: ссылаться можно только на модели выше.
+MODELS = {
+    'auth.user': (User, {}, 'username'),
+    'posts.group': (Group, {}, 'slug'),
+    'posts.post': (
+        Post, {'author_id': 'auth.user', 'group_id': 'posts.group'}, None
+    ),
+    'posts.comment': (
+        Comment, {'post_id': 'posts.post', 'author_id': 'auth.user'}, None
+    ),
+    'posts.follow': (
+        Follow, {'user_id': 'auth.user', 'author_id': 'auth.user'}, None
+    ),
+}
+# На эти модели ссылаются другие, поэтому id им выдаются заранее.
+REFERENCED = ('auth.user', 'posts.group', 'posts.post')
+
+
+def open_dump(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    return opener(path, 'rt', encoding='utf-8')
+
+
+def is_ndjson(path):
+    return path.rsplit('.gz', 1)[0].endswith(('.ndjson', '.jsonl'))
+
+
+def iter_ndjson(file):
+    for line in file:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def _read_more(file, buffer, pos, chunk_size):
+    more = file.read(chunk_size)
+    return buffer[pos:] + more, 0, not more
+
+
+def _open_array(file, chunk_size):
+    """Буфер сразу за открывающей скобкой массива."""
+    buffer, pos, eof = _read_more(file, '', 0, chunk_size)
+    while not buffer.strip() and not eof:
+        buffer, pos, eof = _read_more(file, buffer, pos, chunk_size)
+    pos = WHITESPACE.match(buffer).end()
+    if buffer[pos:pos + 1] != '[':
+        raise ValueError('Дамп должен быть JSON-массивом')
+    return buffer, pos + 1, eof
+
+
+def iter_json_array(file, chunk_size=CHUNK_SIZE):
+    """Объекты JSON-массива по одному, файл читается кусками.
+
+    В памяти только текущий кусок и недочитанный объект, а не весь
+    массив, как у json.load и loaddata.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = _open_array(file, chunk_size)
+    while True:
+        pos = WHITESPACE.match(buffer, pos).end()
+        if pos == len(buffer):
+            if eof:
+                raise ValueError('Дамп оборвался посреди массива')
+            buffer, pos, eof = _read_more(file, buffer, pos, chunk_size)
+        elif buffer[pos] == ']':
+            return
+        elif buffer[pos] == ',':
+            pos += 1
+        else:
+            try:
+                value, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                buffer, pos, eof = _read_more(file, buffer, pos, chunk_size)
+                continue
+            yield value
+
+
+def read_dump(path, ndjson=None):
+    """Записи дампа в формате dumpdata из JSON, NDJSON или их .gz."""
+    if ndjson is None:
+        ndjson = is_ndjson(path)
+    with open_dump(path) as file:
+        yield from (iter_ndjson if ndjson else iter_json_array)(file)
+
+
+def summary(loader, elapsed):
+    """Строки отчёта о загрузке: по моделям и последняя — итог."""
+    lines = []
+    total = 0
+    for label, (imported, skipped, seconds) in loader.stats.items():
+        total += imported
+        rate = imported / seconds if seconds else 0
+        lines.append(
+            f'{label}: {imported} строк, пропущено {skipped}, '
+            f'{rate:.0f} строк/с'
+        )
+    if loader.ignored:
+        lines.append(f'Записей других моделей: {loader.ignored}')
+    lines.append(
+        f'Загружено строк: {total} за {elapsed:.1f} с '
+        f'({total / elapsed:.0f} строк/с)'
+    )
+    return lines
+
+
+def failure(loader, problem):
+    """Текст ошибки прерванной загрузки: что из неё осталось в базе."""
+    imported = sum(stats[0] for stats in loader.stats.values())
+    if not imported:
+        return f'Загрузка прервана, ничего не вставлено: {problem}'
+    return (
+        f'Загрузка прервана: {problem}. Уже вставлено строк: {imported}, '
+        f'они остались в базе; счётчики, ленты и поиск для них сверены'
+    )
+
+
+@contextmanager
+def raw_dates(models):
+    """Даты из дампа не заменяются на текущие полями auto_now(_add)."""
+    fields = [
+        field
+        for model in models for field in model._meta.concrete_fields
+        if isinstance(field, DateField)
+        and (field.auto_now or field.auto_now_add)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield fields
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+@contextmanager
+def deferred_indexes(models):
+    """Снимает индексы Meta.indexes на время вставки и строит их после.
+
+    Схему можно менять только вне транзакции, иначе индексы остаются.
+    """
+    if connection.in_atomic_block:
+        yield False
+        return
+    indexes = [
+        (model, index) for model in models for index in model._meta.indexes
+    ]
+    with connection.schema_editor() as editor:
+        for model, index in indexes:
+            editor.remove_index(model, index)
+    try:
+        yield True
+    finally:
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.add_index(model, index)
+
+
+class Importer:
+    """Загружает дамп пачками bulk_create в отдельных транзакциях.
+
+    Записи сначала раскладываются по временным файлам моделей, чтобы
+    вставлять их в порядке ссылок при любом порядке в дампе. Старые id
+    заменяются новыми, выданными после текущего максимума. Сигналы при
+    bulk_create не срабатывают, поэтому счётчики, ленты, поиск, ссылки
+    на файлы и кэши сверяются после вставки.
+
+    Временные файлы лежат в tempdir, по умолчанию — в системной папке.
+    """
+
+    def __init__(self, batch_size=1000, defer_indexes=True, tempdir=None):
+        self.batch_size = batch_size
+        self.defer_indexes = defer_indexes
+        self.tempdir = tempdir
+        self.pks = {label: {} for label in REFERENCED}
+        self.next_pk = {}
+        self.stats = {label: [0, 0, 0.0] for label in MODELS}
+        self.ignored = 0
+        self.first_pk = {}
+
+    def run(self, records):
+        """Загружает записи и сверяет вставленное.
+
+        Пачки фиксируются по одной, поэтому при ошибке в середине уже
+        вставленные строки остаются в базе; они всё равно сверяются,
+        а ошибка идёт дальше.
+        """
+        try:
+            self.load_all(records)
+        finally:
+            if any(stats[0] for stats in self.stats.values()):
+                self.reconcile()
+
+    def load_all(self, records):
+        with ExitStack() as stack:
+            spools = {
+                label: stack.enter_context(
+                    tempfile.TemporaryFile(
+                        'w+', encoding='utf-8', dir=self.tempdir
+                    )
+                )
+                for label in MODELS
+            }
+            for record in records:
+                spool = spools.get(record.get('model'))
+                if spool is None:
+                    self.ignored += 1
+                    continue
+                spool.write(json.dumps(record, ensure_ascii=False) + '\n')
+            models = [model for model, _, _ in MODELS.values()]
+            if self.defer_indexes:
+                stack.enter_context(deferred_indexes(models))
+            stack.enter_context(connection.constraint_checks_disabled())
+            stack.enter_context(raw_dates(models))
+            self.allocate()
+            for label, spool in spools.items():
+                spool.seek(0)
+                self.load(label, iter_ndjson(spool))
+            connection.check_constraints(
+                table_names=[model._meta.db_table for model in models]
+            )
+
+    def allocate(self):
+        """Запоминает первый новый pk каждой модели.
+
+        Вставленное загрузкой — строки с pk не меньше него: по ним
+        и сверяется всё после вставки.
+        """
+        for label, (model, _, _) in MODELS.items():
+            last = model.objects.order_by('-pk').values_list(
+                'pk', flat=True
+            ).first()
+            self.first_pk[label] = (last or 0) + 1
+        for label in REFERENCED:
+            self.next_pk[label] = self.first_pk[label]
+
+    def imported(self, label):
+        model = MODELS[label][0]
+        return model.objects.filter(pk__gte=self.first_pk[label])
+
+    def load(self, label, records):
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                self.load_batch(label, batch)
+                batch = []
+        if batch:
+            self.load_batch(label, batch)
+
+    def load_batch(self, label, records):
+        started = time.perf_counter()
+        built = [self.build(label, record) for record in records]
+        objects = [item for item in built if item is not None]
+        with transaction.atomic():
+            inserted = self.insert(label, objects)
+        stats = self.stats[label]
+        stats[0] += inserted
+        stats[1] += len(records) - inserted
+        stats[2] += time.perf_counter() - started
+
+    def build(self, label, record):
+        """(старый id, объект) с новыми ссылками или None для сироты."""
+        model, refs, _ = MODELS[label]
+        obj = next(serializers.deserialize(
+            'python', [record], ignorenonexistent=True
+        )).object
+        for attname, target in refs.items():
+            old = getattr(obj, attname)
+            if old is None:
+                continue
+            new = self.pks[target].get(old)
+            if new is None and not model._meta.get_field(
+                attname[:-len('_id')]
+            ).null:
+                return None
+            setattr(obj, attname, new)
+        now = timezone.now()
+        for field in model._meta.concrete_fields:
+            if isinstance(field, DateField) and getattr(
+                obj, field.attname
+            ) is None and not field.null:
+                setattr(obj, field.attname, now)
+        return obj.pk, obj
+
+    def merge_existing(self, label, objects):
+        """Строки, совпавшие с уже существующими, не вставляются."""
+        unique = MODELS[label][2]
+        values = [getattr(obj, unique) for _, obj in objects]
+        existing = dict(MODELS[label][0].objects.filter(
+            **{f'{unique}__in': values}
+        ).values_list(unique, 'pk'))
+        fresh = []
+        for old, obj in objects:
+            value = getattr(obj, unique)
+            if value in existing:
+                self.pks[label][old] = existing[value]
+            else:
+                existing[value] = self.pks[label][old] = self.take_pk(label)
+                obj.pk = existing[value]
+                fresh.append((old, obj))
+        return fresh
+
+    def take_pk(self, label):
+        pk = self.next_pk[label]
+        self.next_pk[label] += 1
+        return pk
+
+    def insert(self, label, objects):
+        model = MODELS[label][0]
+        if MODELS[label][2]:
+            objects = self.merge_existing(label, objects)
+        elif label in REFERENCED:
+            for old, obj in objects:
+                obj.pk = self.pks[label][old] = self.take_pk(label)
+        else:
+            for _, obj in objects:
+                obj.pk = None
+        rows = [obj for _, obj in objects]
+        if model is Follow:
+            rows = [obj for obj in rows if obj.user_id != obj.author_id]
+        model.objects.bulk_create(rows, ignore_conflicts=model is Follow)
+        return len(rows)
+
+    def reconcile(self):
+        """Делает за сигналы то, что они сделали бы при обычных save()."""
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), [MODELS[label][0] for label in REFERENCED]
+            ):
+                cursor.execute(sql)
+        with transaction.atomic():
+            self.recount()
+            self.fill_timelines()
+        if self.stats['posts.post'][0]:
+            if search.available():
+                search.rebuild(
+                    self.batch_size, after=self.first_pk['posts.post'] - 1
+                )
+            images = self.imported('posts.post').exclude(
+                image=''
+            ).values_list('image', flat=True).distinct()
+            for name in images.iterator():
+                media.recount(name)
+        autocomplete.reload_everywhere()
+        feed_cache.bump(feed_cache.GLOBAL)
+
+    def recount(self):
+        """Счётчики новых строк и тех, на кого они ссылаются."""
+        posts = self.imported('posts.post')
+        follows = self.imported('posts.follow')
+        counters.recount(
+            User.objects.filter(
+                Q(pk__gte=self.first_pk['auth.user'])
+                | Q(pk__in=posts.values('author'))
+                | Q(pk__in=follows.values('user'))
+                | Q(pk__in=follows.values('author'))
+            ).values('pk'),
+            Post.objects.filter(
+                Q(pk__gte=self.first_pk['posts.post'])
+                | Q(pk__in=self.imported('posts.comment').values('post'))
+            ).values('pk'),
+            Group.objects.filter(
+                Q(pk__gte=self.first_pk['posts.group'])
+                | Q(pk__in=posts.values('group'))
+            ).values('pk'),
+        )
+
+    def fill_timelines(self):
+        """Кладёт в ленты посты новых подписок и новые посты подписок.
+
+        Загрузка только добавляет строки, поэтому ленты не собираются
+        заново, а дополняются двумя INSERT ... SELECT.
+        """
+        timelines.materialize(self.imported('posts.follow'))
+        timelines.materialize(
+            Follow.objects.all(), pk__gte=self.first_pk['posts.post']
+        )
@@ -0,0 +1,109 @@
+import os
+import shutil
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image, ImageOps
+
+from .imaging import ORIENTATION
+
+FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+    'GIF': {},
+}
+
+
+def spool(upload):
+    """Путь к загрузке на диске; из памяти она переписывается кусками."""
+    if hasattr(upload, 'temporary_file_path'):
+        return upload, upload.temporary_file_path()
+    spooled = TemporaryUploadedFile(
+        upload.name, upload.content_type, upload.size, upload.charset
+    )
+    upload.seek(0)
+    shutil.copyfileobj(upload, spooled.file)
+    spooled.file.flush()
+    return spooled, spooled.temporary_file_path()
+
+
+def _validate(image):
+    if image.format not in FORMATS:
+        raise ValidationError(
+            'Поддерживаются только JPEG, PNG, GIF и WebP.',
+            code='image_format',
+        )
+    width, height = image.size
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Слишком большая картинка: %(width)d×%(height)d пикселей.',
+            code='image_pixels',
+            params={'width': width, 'height': height},
+        )
+
+
+def _needs_rewrite(image):
+    too_big = max(image.size) > settings.IMAGE_MAX_SIDE
+    return too_big or bool(image.getexif())
+
+
+def _rewrite(image, upload):
+    """Уменьшает картинку и пересохраняет её без EXIF.
+
+    Для JPEG draft() декодирует сразу в уменьшенном масштабе, поэтому
+    память не растёт с размером исходника.
+    """
+    image_format = image.format
+    limit = (settings.IMAGE_MAX_SIDE, settings.IMAGE_MAX_SIDE)
+    ratio = min(1, settings.IMAGE_MAX_SIDE / max(image.size))
+    image.draft(None, tuple(max(1, int(side * ratio)) for side in image.size))
+    icc_profile = image.info.get('icc_profile')
+    rotated = image.getexif().get(ORIENTATION, 1) != 1
+    image.thumbnail(limit)
+    if rotated:
+        image = ImageOps.exif_transpose(image)
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L', 'CMYK'):
+        image = image.convert('RGB')
+    result = TemporaryUploadedFile(
+        upload.name, upload.content_type, 0, upload.charset
+    )
+    options = dict(SAVE_OPTIONS[image_format])
+    if icc_profile:
+        options['icc_profile'] = icc_profile
+    image.save(result.file, image_format, **options)
+    result.file.flush()
+    result.size = os.path.getsize(result.temporary_file_path())
+    result.seek(0)
+    return result
+
+
+def ingest(upload):
+    """Проверяет загруженную картинку и готовит её к сохранению.
+
+    Загрузка лежит на диске, проверка идёт по заголовку: формат и число
+    пикселей до декодирования. Картинки больше IMAGE_MAX_SIDE
+    уменьшаются, EXIF вырезается. Анимации сохраняются как есть.
+    """
+    if upload.size > settings.IMAGE_UPLOAD_MAX_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)d МБ.',
+            code='image_size',
+            params={'limit': settings.IMAGE_UPLOAD_MAX_SIZE // 2 ** 20},
+        )
+    upload, path = spool(upload)
+    try:
+        with Image.open(path) as image:
+            _validate(image)
+            if getattr(image, 'is_animated', False):
+                return upload
+            if not _needs_rewrite(image):
+                upload.seek(0)
+                return upload
+            return _rewrite(image, upload)
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise ValidationError(
+            'Не удалось прочитать картинку.', code='invalid_image'
+        )
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Заполняет размеры, формат, вес и хэш картинок постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Перечитать и уже заполненные картинки.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько постов выбирать за один запрос.',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').order_by('pk')
+        if not options['all']:
+            posts = posts.filter(image_hash='')
+        filled = missing = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                posts.filter(pk__gt=last_pk).only('pk', 'image')[
+                    :options['batch_size']
+                ]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            for post in batch:
+                values = thumbnails.read_metadata(post.image)
+                if not values['image_hash']:
+                    missing += 1
+                    self.stdout.write(f'Post pk={post.pk}: нет {post.image}')
+                    continue
+                Post.objects.filter(pk=post.pk, image=post.image.name).update(
+                    **values
+                )
+                filled += 1
+        self.stdout.write(self.style.SUCCESS(f'Заполнено: {filled}'))
+        if missing:
+            self.stdout.write(self.style.WARNING(f'Не прочитано: {missing}'))
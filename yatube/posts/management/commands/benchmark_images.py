@@ -0,0 +1,73 @@
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image, ImageOps
+
+from posts import imaging, media
+
+
+def sorl_thumbnail(data):
+    """Прежняя миниатюра: 400x400 JPEG с качеством sorl по умолчанию."""
+    with Image.open(BytesIO(data)) as image:
+        image = ImageOps.fit(imaging.to_rgb(image), imaging.SIZE)
+    output = BytesIO()
+    image.save(output, 'JPEG', quality=95)
+    return len(output.getvalue())
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает вес картинок на странице ленты до и после вариантов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='*',
+            help='Картинки для замера; по умолчанию MEDIA_ROOT/posts.',
+        )
+        parser.add_argument(
+            '--per-page',
+            type=int,
+            default=10,
+            help='Сколько постов с картинками на странице.',
+        )
+
+    def handle(self, *args, **options):
+        paths = options['paths']
+        if not paths:
+            # Оригиналы разложены по подпапкам posts/ab/cd/<хэш>.
+            paths = sorted(
+                media.storage.path(name)
+                for name, _, _ in media.walk(media.storage, 'posts')
+            )
+        if not paths:
+            raise CommandError('Нет картинок для замера')
+        formats = imaging.available_formats()
+        baseline = 0
+        # (формат, ширина) -> суммарный вес по всем картинкам
+        totals = {}
+        for path in paths:
+            with open(path, 'rb') as source:
+                data = source.read()
+            baseline += sorl_thumbnail(data)
+            by_width = {}
+            for image_format, width, content in imaging.variants(data):
+                by_width.setdefault(image_format, {})[width] = len(content)
+            for image_format in formats:
+                sizes = by_width[image_format]
+                for width in imaging.WIDTHS:
+                    # Браузер берёт ближайший вариант не уже нужного.
+                    fits = [w for w in sizes if w >= width] or [max(sizes)]
+                    key = (image_format, width)
+                    totals[key] = totals.get(key, 0) + sizes[min(fits)]
+        scale = options['per_page'] / len(paths)
+        before = baseline * scale
+        self.stdout.write(
+            f'Картинок: {len(paths)}, на странице: {options["per_page"]}'
+        )
+        self.stdout.write(f'До: {before / 1024:.1f} КБ на страницу')
+        for (image_format, width), total in sorted(totals.items()):
+            after = total * scale
+            self.stdout.write(
+                f'{image_format:>4} {width:>4}w: {after / 1024:.1f} КБ '
+                f'({after / before - 1:+.0%})'
+            )
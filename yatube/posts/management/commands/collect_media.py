@@ -0,0 +1,240 @@
+import json
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default as sorl
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from posts import media, thumbnails
+from posts.models import MediaFile, Post
+from posts.storage import SHARDED_NAME
+
+
+def live_originals(names):
+    live = set(
+        Post.objects.filter(image__in=names).values_list('image', flat=True)
+    )
+    # Старые имена после переноса удаляет migrate_media --cleanup.
+    moved = [name for name in names if not SHARDED_NAME.search(name)]
+    return live | set(
+        MediaFile.objects.filter(name__in=moved).values_list('name', flat=True)
+    )
+
+
+def variant_key(name):
+    return name.rsplit('/', 1)[-1].rsplit('_', 1)[0]
+
+
+def variant_keys(value):
+    try:
+        variants = json.loads(value)
+    except ValueError:
+        return set()
+    return {
+        variant_key(variant['url']) for variant in variants
+        if isinstance(variant, dict) and variant.get('url')
+    }
+
+
+def key_in_use(key):
+    """Есть ли пост с хэшем картинки, чьи варианты названы этим ключом.
+
+    Ключ — начало хэша, поэтому ищется диапазоном по индексу image_hash.
+    """
+    return Post.objects.filter(
+        image_hash__gte=key, image_hash__lt=key + 'g'
+    ).exists()
+
+
+def unhashed_in_use(keys, batch_size):
+    """Ключи из keys, которыми названы варианты постов без хэша картинки.
+
+    По image_variants нет индекса, поэтому посты без хэша читаются
+    пачками по pk, пока не найдутся все ключи: в памяти только пачка.
+    """
+    posts = Post.objects.filter(image_hash='').exclude(
+        image_variants=''
+    ).order_by('pk').values_list('pk', 'image_variants')
+    found = set()
+    last_pk = 0
+    while keys - found:
+        batch = list(posts.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+        for _, value in batch:
+            found |= variant_keys(value) & keys
+    return found
+
+
+def live_variants(batch_size, names):
+    # Варианты в старой раскладке удаляет migrate_media --cleanup.
+    keys = {variant_key(name) for name in names if SHARDED_NAME.search(name)}
+    live = {key for key in keys if key_in_use(key)}
+    live |= unhashed_in_use(keys - live, batch_size)
+    return {
+        name for name in names
+        if not SHARDED_NAME.search(name) or variant_key(name) in live
+    }
+
+
+def live_sorl_files(names):
+    keys = {
+        add_prefix(ImageFile(name, sorl.storage).key): name for name in names
+    }
+    return {
+        keys[key] for key in KVStore.objects.filter(
+            key__in=keys
+        ).values_list('key', flat=True)
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Находит и удаляет файлы медиа, на которые не ссылается ни один '
+        'пост: оригиналы, варианты и старые миниатюры sorl.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать мусор, ничего не удалять.',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=0,
+            help='Сколько файлов проверять в секунду; 0 — без ограничения.',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=settings.MEDIA_MIN_AGE,
+            help='Не трогать файлы моложе стольких секунд.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько файлов проверять одним запросом.',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.started = time.monotonic()
+        self.ticks = self.checked = self.garbage = self.freed = 0
+        stale = self.forget_stale_sorl()
+        sweeps = (
+            (media.storage, media.field.upload_to, live_originals),
+            (
+                default_storage,
+                thumbnails.FOLDER,
+                partial(live_variants, options['batch_size']),
+            ),
+            (sorl.storage, sorl_settings.THUMBNAIL_PREFIX, live_sorl_files),
+        )
+        for storage, folder, find_live in sweeps:
+            self.sweep(storage, folder.strip('/'), find_live)
+        verb = 'Найдено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'Проверено файлов: {self.checked}. {verb} мусора: '
+            f'{self.garbage} ({self.freed / 2 ** 20:.1f} МБ), '
+            f'записей sorl без картинки: {stale}'
+        ))
+
+    def throttle(self):
+        if not self.options['rate']:
+            return
+        self.ticks += 1
+        ahead = self.ticks / self.options['rate'] - (
+            time.monotonic() - self.started
+        )
+        if ahead > 0:
+            time.sleep(ahead)
+
+    def sweep(self, storage, folder, find_live):
+        """Обходит папку и пачками сверяет файлы со ссылками в базе.
+
+        Свежие файлы пропускаются: их пост может быть ещё не сохранён.
+        """
+        cutoff = time.time() - self.options['min_age']
+        batch = []
+        for name, size, modified in media.walk(storage, folder):
+            self.throttle()
+            if modified > cutoff:
+                continue
+            batch.append((name, size))
+            if len(batch) >= self.options['batch_size']:
+                self.purge(storage, folder, batch, find_live)
+                batch = []
+        if batch:
+            self.purge(storage, folder, batch, find_live)
+
+    def purge(self, storage, folder, batch, find_live):
+        live = find_live([name for name, _ in batch])
+        # Пока пачка набиралась, файл могла заново получить загрузка.
+        garbage = [
+            (name, size) for name, size in batch
+            if name not in live and not media.claimed_recently(
+                storage, name, self.options['min_age']
+            )
+        ]
+        self.checked += len(batch)
+        self.garbage += len(garbage)
+        self.freed += sum(size for _, size in garbage)
+        for name, _ in garbage:
+            if self.options['verbosity'] > 1:
+                self.stdout.write(name)
+            if not self.options['dry_run']:
+                storage.delete(name)
+        if garbage and not self.options['dry_run']:
+            MediaFile.objects.filter(
+                name__in=[name for name, _ in garbage]
+            ).delete()
+        self.stdout.write(
+            f'{folder}: проверено {self.checked}, мусор {self.garbage} '
+            f'({self.freed / 2 ** 20:.1f} МБ)'
+        )
+
+    def forget_stale_sorl(self):
+        """Удаляет записи sorl о миниатюрах картинок, которых нет у постов.
+
+        Сами файлы миниатюр после этого находит обход папки sorl.
+        """
+        prefix = add_prefix('', 'thumbnails')
+        sources = KVStore.objects.filter(key__startswith=prefix).order_by(
+            'key'
+        ).values_list('key', flat=True)
+        stale = 0
+        last_key = ''
+        while True:
+            batch = list(
+                sources.filter(key__gt=last_key)[:self.options['batch_size']]
+            )
+            if not batch:
+                break
+            last_key = batch[-1]
+            for key in batch:
+                source = sorl.kvstore._get(key[len(prefix):])
+                if source and Post.objects.filter(image=source.name).exists():
+                    continue
+                stale += 1
+                if not self.options['dry_run']:
+                    self.forget(key[len(prefix):])
+        return stale
+
+    def forget(self, source_key):
+        thumbnail_keys = sorl.kvstore._get(
+            source_key, identity='thumbnails'
+        ) or []
+        for key in thumbnail_keys:
+            sorl.kvstore._delete(key)
+        sorl.kvstore._delete(source_key, identity='thumbnails')
+        sorl.kvstore._delete(source_key)
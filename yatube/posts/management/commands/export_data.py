@@ -0,0 +1,85 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии или подписки в NDJSON или CSV '
+        'пачками по id, не собирая выгрузку в памяти.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=list(export.KINDS))
+        parser.add_argument(
+            '--format',
+            choices=list(export.FORMATS),
+            default='ndjson',
+        )
+        parser.add_argument('--author', help='Логин автора.')
+        parser.add_argument('--group', help='Слаг группы.')
+        parser.add_argument('--since', help='Не раньше даты (ГГГГ-ММ-ДД).')
+        parser.add_argument('--until', help='Не позже даты (ГГГГ-ММ-ДД).')
+        parser.add_argument(
+            '--after-id',
+            type=int,
+            default=0,
+            help='Продолжить выгрузку после записи с этим id.',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Сжимать выгрузку на лету.',
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл для выгрузки; без него — стандартный вывод.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько записей читать за один запрос.',
+        )
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        try:
+            records = export.queryset(
+                kind,
+                author=options['author'],
+                group=options['group'],
+                since=export.parse_moment(options['since']),
+                until=export.parse_moment(options['until'], end=True),
+            )
+        except ValueError as problem:
+            raise CommandError(problem)
+        self.exported = 0
+        lines = export.lines(kind, options['format'], self.counted(
+            export.rows(
+                kind, records, options['after_id'], options['batch_size']
+            )
+        ))
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                self.write(output, lines, options['gzip'])
+        elif options['gzip']:
+            self.write(sys.stdout.buffer, lines, True)
+        else:
+            for block in export.chunked(lines):
+                self.stdout.write(block, ending='')
+        # Итог — в stderr, чтобы не попасть в выгрузку на stdout.
+        self.stderr.write(
+            self.style.SUCCESS(f'Выгружено записей: {self.exported}')
+        )
+
+    def write(self, output, lines, gzip):
+        for block in export.encoded(lines, gzip=gzip):
+            output.write(block)
+
+    def counted(self, records):
+        for record in records:
+            self.exported += 1
+            yield record
@@ -0,0 +1,93 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from posts import generator, importer
+from posts.export import parse_moment
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт синтетических пользователей, группы, посты, комментарии '
+        'и подписки с перекосами как в жизни. Одно зерно — один и тот же '
+        'набор. Миниатюры картинок делает generate_thumbnails.'
+    )
+
+    def add_arguments(self, parser):
+        for name, default, text in (
+            ('users', 1000, 'Сколько пользователей.'),
+            ('groups', 20, 'Сколько групп.'),
+            ('posts', 10000, 'Сколько постов.'),
+            ('comments', 20000, 'Сколько комментариев.'),
+            ('follows', 5000, 'Сколько подписок.'),
+            ('images', 0, 'Сколько разных картинок раздать постам.'),
+        ):
+            parser.add_argument(
+                f'--{name}', type=int, default=default, help=text
+            )
+        parser.add_argument(
+            '--seed', type=int, default=0, help='Зерно генератора.'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='За сколько дней распределить посты.',
+        )
+        parser.add_argument(
+            '--start',
+            help='Дата первого дня, ГГГГ-ММ-ДД; по умолчанию 2021-01-01.',
+        )
+        parser.add_argument(
+            '--prefix',
+            default='gen',
+            help='Начало логинов и адресов групп.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк вставлять за одну транзакцию.',
+        )
+        parser.add_argument(
+            '--keep-indexes',
+            action='store_true',
+            help='Не снимать индексы на время загрузки.',
+        )
+        parser.add_argument(
+            '--temp-dir',
+            help='Папка временных файлов загрузки; по умолчанию системная.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            start = parse_moment(options['start']) or generator.START
+            source = generator.Generator(
+                seed=options['seed'],
+                users=options['users'],
+                groups=options['groups'],
+                posts=options['posts'],
+                comments=options['comments'],
+                follows=options['follows'],
+                images=options['images'],
+                days=options['days'],
+                start=start,
+                prefix=options['prefix'],
+            )
+        except ValueError as problem:
+            raise CommandError(problem)
+        loader = importer.Importer(
+            options['batch_size'],
+            not options['keep_indexes'],
+            options['temp_dir'],
+        )
+        started = time.perf_counter()
+        try:
+            loader.run(source.records())
+        except (OSError, DatabaseError) as problem:
+            raise CommandError(importer.failure(loader, problem))
+        lines = importer.summary(loader, time.perf_counter() - started)
+        for line in lines[:-1]:
+            self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS(lines[-1]))
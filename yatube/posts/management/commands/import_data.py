@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.base import DeserializationError
+from django.db import DatabaseError
+
+from posts import importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Быстро загружает дамп в формате dumpdata (JSON, NDJSON, .gz): '
+        'пользователей, группы, посты, комментарии и подписки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл дампа.')
+        parser.add_argument(
+            '--format',
+            choices=('json', 'ndjson'),
+            help='Формат дампа; по умолчанию по расширению файла.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько строк вставлять за одну транзакцию.',
+        )
+        parser.add_argument(
+            '--keep-indexes',
+            action='store_true',
+            help='Не снимать индексы на время загрузки.',
+        )
+        parser.add_argument(
+            '--temp-dir',
+            help='Папка временных файлов загрузки; по умолчанию системная.',
+        )
+
+    def handle(self, *args, **options):
+        ndjson = options['format'] and options['format'] == 'ndjson'
+        loader = importer.Importer(
+            options['batch_size'],
+            not options['keep_indexes'],
+            options['temp_dir'],
+        )
+        started = time.perf_counter()
+        try:
+            loader.run(importer.read_dump(options['path'], ndjson))
+        except (
+            OSError, ValueError, DeserializationError, DatabaseError
+        ) as problem:
+            raise CommandError(importer.failure(loader, problem))
+        lines = importer.summary(loader, time.perf_counter() - started)
+        for line in lines[:-1]:
+            self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS(lines[-1]))
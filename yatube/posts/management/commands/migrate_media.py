@@ -0,0 +1,157 @@
+import json
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts import feed_cache, media, thumbnails
+from posts.models import MediaFile, Post
+from posts.storage import SHARDED_NAME
+
+
+def url_to_name(url):
+    if url.startswith(settings.MEDIA_URL):
+        return unquote(url[len(settings.MEDIA_URL):])
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки и варианты в папки по хэшу (posts/ab/cd/...) '
+        'без остановки сайта: старые файлы удаляются только с --cleanup.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cleanup',
+            action='store_true',
+            help='Удалить старые файлы, на которые больше нет ссылок.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать, ничего не менять.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Сколько постов выбирать за один запрос.',
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        if options['cleanup']:
+            self.cleanup(options['batch_size'])
+            return
+        self.moved = self.variants = self.missing = 0
+        self.renamed = {}
+        last_pk = 0
+        posts = Post.objects.exclude(image='').order_by('pk').values_list(
+            'pk', 'image', 'image_hash', 'image_variants', 'thumbnail'
+        )
+        while True:
+            batch = list(
+                posts.filter(pk__gt=last_pk)[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            for pk, name, image_hash, image_variants, thumbnail in batch:
+                name = self.move_image(pk, name)
+                if name is not None:
+                    self.move_variants(
+                        pk, name, image_hash, image_variants, thumbnail
+                    )
+        if (self.moved or self.variants) and not self.dry_run:
+            feed_cache.bump(feed_cache.GLOBAL)
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок перенесено: {self.moved}, '
+            f'постов с вариантами: {self.variants}'
+        ))
+        if self.missing:
+            self.stdout.write(self.style.WARNING(
+                f'Нет файлов: {self.missing}'
+            ))
+
+    def move_image(self, pk, name):
+        """Новое имя оригинала; None, если переносить нечего."""
+        if SHARDED_NAME.search(name):
+            return name
+        if name in self.renamed:
+            return self.renamed[name]
+        if not media.storage.exists(name):
+            self.missing += 1
+            self.stdout.write(f'Post pk={pk}: нет {name}')
+            return None
+        self.moved += 1
+        if self.dry_run:
+            return None
+        # Все посты с этим файлом переводятся одним запросом.
+        self.renamed[name] = media.move(name)
+        return self.renamed[name]
+
+    def move_variants(self, pk, name, image_hash, image_variants, thumbnail):
+        try:
+            found = json.loads(image_variants) if image_variants else []
+        except ValueError:
+            return
+        key = thumbnails._file_key(name, image_hash)
+        changed = False
+        for variant in found:
+            old = url_to_name(variant['url'])
+            new = thumbnails.variant_name(
+                key, variant['format'], variant['width']
+            )
+            if old is None or old == new:
+                continue
+            changed = True
+            if self.dry_run:
+                continue
+            if not default_storage.exists(new):
+                with default_storage.open(old) as source:
+                    new = default_storage.save(new, source)
+            variant['url'] = default_storage.url(new)
+            if thumbnail == default_storage.url(old):
+                thumbnail = variant['url']
+        if not changed:
+            return
+        self.variants += 1
+        if not self.dry_run:
+            Post.objects.filter(
+                pk=pk, image_variants=image_variants
+            ).update(
+                image_variants=json.dumps(found),
+                thumbnail=thumbnail,
+                modified=timezone.now(),
+            )
+
+    def cleanup(self, batch_size):
+        """Удаляет старые оригиналы без ссылок и варианты вне папок."""
+        originals = thumbs = 0
+        unused = MediaFile.objects.filter(refs=0).order_by('name').values_list(
+            'name', flat=True
+        )
+        last_name = ''
+        while True:
+            batch = list(unused.filter(name__gt=last_name)[:batch_size])
+            if not batch:
+                break
+            last_name = batch[-1]
+            for name in batch:
+                if SHARDED_NAME.search(name):
+                    continue
+                originals += 1
+                if not self.dry_run:
+                    media.drop(name)
+        for name, _, _ in media.walk(default_storage, thumbnails.FOLDER):
+            if SHARDED_NAME.search(name):
+                continue
+            thumbs += 1
+            if not self.dry_run:
+                default_storage.delete(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено оригиналов: {originals}, вариантов: {thumbs}'
+        ))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from posts import timelines
+from posts.models import Timeline, User
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            action='append',
+            dest='usernames',
+            metavar='USERNAME',
+            help='Пересобрать ленту только этого пользователя.',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+        else:
+            Timeline.objects.exclude(
+                user__in=users.filter(follower__isnull=False)
+            ).delete()
+            users = users.filter(follower__isnull=False).distinct()
+        rebuilt = 0
+        for user in users.iterator():
+            timelines.rebuild(user)
+            rebuilt += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересобрано лент: {rebuilt}')
+        )
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Сверяет денормализованные счётчики с реальными данными.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Исправить найденные расхождения.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько записей сверять за один запрос.',
+        )
+
+    def handle(self, *args, **options):
+        found = 0
+        for model, pk, field, stored, real in counters.drift(
+            options['batch_size']
+        ):
+            found += 1
+            self.stdout.write(
+                f'{model._meta.label} pk={pk} {field}: {stored} -> {real}'
+            )
+            if options['fix']:
+                counters.fix(model, pk, field, real)
+        if not found:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+        elif options['fix']:
+            self.stdout.write(
+                self.style.SUCCESS(f'Исправлено расхождений: {found}')
+            )
+        else:
+            self.stdout.write(
+                self.style.WARNING(f'Найдено расхождений: {found}')
+            )
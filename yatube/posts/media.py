@@ -0,0 +1,128 @@
+import logging
+import os
+import posixpath
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousOperation
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from . import counters, thumbnails
+from .models import MediaFile, Post
+
+logger = logging.getLogger('yatube.media')
+
+field = Post._meta.get_field('image')
+storage = field.storage
+
+
+def recount(name):
+    """Пересчитывает ссылки на файл по постам, при нужде создаёт запись."""
+    refs = Post.objects.filter(image=name).count()
+    MediaFile.objects.update_or_create(name=name, defaults={'refs': refs})
+
+
+def acquire(name):
+    if name and not counters.change(MediaFile, name, 'refs', 1):
+        recount(name)
+
+
+def release(name, image_hash=''):
+    """Снимает ссылку на файл; без ссылок он удаляется после коммита."""
+    if not name:
+        return
+    if not counters.change(MediaFile, name, 'refs', -1):
+        recount(name)
+    transaction.on_commit(partial(collect, name, image_hash))
+
+
+def claimed_recently(storage, name, min_age):
+    """Менялся ли файл за последние min_age секунд.
+
+    Повторной загрузке хранилище отдаёт готовое имя и трогает время
+    изменения файла, а ссылку её пост берёт только при сохранении.
+    """
+    try:
+        modified = os.path.getmtime(storage.path(name))
+    except (OSError, SuspiciousOperation):
+        return False
+    return time.time() - modified < min_age
+
+
+def drop(name):
+    """Удаляет файл, если на него больше никто не ссылается.
+
+    Недавно загруженный заново файл остаётся с нулём ссылок: его
+    удалит collect_media, если пост так и не сохранится.
+    """
+    if claimed_recently(storage, name, settings.MEDIA_MIN_AGE):
+        return False
+    deleted, _ = MediaFile.objects.filter(name=name, refs=0).delete()
+    if not deleted:
+        return False
+    try:
+        storage.delete(name)
+        logger.info('Удалён файл %s', name)
+    except (OSError, SuspiciousOperation):
+        logger.warning('Не удалось удалить файл %s', name)
+    return True
+
+
+def collect(name, image_hash=''):
+    """Удаляет файл и его варианты, если на них больше никто не ссылается.
+
+    Варианты общие у всех постов с тем же хэшем, даже если оригиналы
+    у них лежат под разными именами.
+    """
+    if not drop(name):
+        return False
+    if image_hash and Post.objects.filter(image_hash=image_hash).exists():
+        return True
+    key = thumbnails._file_key(name, image_hash)
+    for variant in thumbnails.variant_names(key):
+        default_storage.delete(variant)
+    return True
+
+
+def move(name):
+    """Переводит посты на копию файла под именем по хэшу.
+
+    Старый файл остаётся на месте с нулём ссылок, чтобы старые адреса
+    работали, пока его не удалит drop().
+    """
+    upload_name = field.generate_filename(None, posixpath.basename(name))
+    with storage.open(name) as source:
+        target = storage.save(upload_name, source)
+    if target == name:
+        return name
+    with transaction.atomic():
+        Post.objects.filter(image=name).update(
+            image=target, modified=timezone.now()
+        )
+        recount(name)
+        recount(target)
+    return target
+
+
+def walk(storage, folder):
+    """Файлы папки хранилища с подпапками: (имя, вес, время изменения).
+
+    os.scandir не читает каталог в память целиком, а в стеке только
+    непройденные подпапки.
+    """
+    if not os.path.isdir(storage.path(folder)):
+        return
+    stack = [folder]
+    while stack:
+        current = stack.pop()
+        with os.scandir(storage.path(current)) as entries:
+            for entry in entries:
+                name = posixpath.join(current, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(name)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat()
+                    yield name, stat.st_size, stat.st_mtime
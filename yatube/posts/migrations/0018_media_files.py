@@ -0,0 +1,41 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:11
+
+from django.db import migrations, models
+from django.db.models import Count
+
+import posts.storage
+
+
+def fill_refs(apps, schema_editor):
+    MediaFile = apps.get_model('posts', 'MediaFile')
+    Post = apps.get_model('posts', 'Post')
+    files = Post.objects.exclude(image='').order_by().values(
+        'image'
+    ).annotate(refs=Count('pk')).values_list('image', 'refs')
+    MediaFile.objects.bulk_create(
+        (MediaFile(name=name, refs=refs) for name, refs in files.iterator()),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_image_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('refs', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(fill_refs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,119 @@
+import hashlib
+import re
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+from . import feed_cache
+from .forms import CommentForm
+from .models import Follow
+
+HOLE = re.compile(r'<!--hole:(\w+)((?::[\w.@+-]*)*)-->')
+
+
+def follow_context(request, author_id, username):
+    user = request.user
+    return {
+        'username': username,
+        'is_author': str(user.pk) == author_id,
+        'following': user.is_authenticated and Follow.objects.filter(
+            user=user, author_id=author_id
+        ).exists(),
+    }
+
+
+def post_actions_context(request, post_id, author_id):
+    return {
+        'post_id': int(post_id),
+        'can_edit': str(request.user.pk) == author_id,
+    }
+
+
+def comment_form_context(request, post_id):
+    return {'post_id': int(post_id), 'form': CommentForm()}
+
+
+HOLES = {
+    'header': ('includes/header.html', None),
+    'switcher': ('posts/includes/switcher.html', None),
+    'follow': ('posts/includes/follow_button.html', follow_context),
+    'post_actions': ('posts/includes/post_actions.html', post_actions_context),
+    'comment_form': ('posts/includes/comment_form.html', comment_form_context),
+}
+
+
+def render_hole(request, name, *args):
+    """Отрисовывает зависящий от пользователя фрагмент страницы."""
+    template, get_context = HOLES[name]
+    context = get_context(request, *args) if get_context else {}
+    return render_to_string(template, context, request)
+
+
+def hole_marker(name, *args):
+    return '<!--hole:%s-->' % ':'.join((name, *map(str, args)))
+
+
+def capturing(request):
+    """Идёт ли отрисовка страницы для кэша: тогда вместо дыр метки."""
+    return getattr(request, '_page_scopes', None) is not None
+
+
+def depends_on(request, *scopes):
+    """Отмечает области кэша лент, от которых зависит страница.
+
+    Поколения запоминаются до отрисовки: запись, сделанная во время
+    неё, сразу сделает страницу устаревшей.
+    """
+    if capturing(request):
+        request._page_scopes.update(feed_cache.generations(*scopes))
+
+
+def fill_holes(request, content):
+    return HOLE.sub(
+        lambda match: render_hole(
+            request, match.group(1), *match.group(2).split(':')[1:]
+        ),
+        content,
+    )
+
+
+def _page_key(request):
+    digest = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'pagecache:{digest}'
+
+
+def cached_page(view):
+    """Кэширует страницу целиком, общую для всех посетителей.
+
+    В кэш попадает HTML с метками на месте дыр ({% hole %}), которые
+    дорисовываются для каждого запроса. Запись годна, пока не сменились
+    поколения областей, отмеченных view через depends_on.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return view(request, *args, **kwargs)
+        key = _page_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            scopes, content = entry
+            if feed_cache.generations(*scopes) == scopes:
+                feed_cache.record('hits')
+                return HttpResponse(fill_holes(request, content))
+        feed_cache.record('misses')
+        request._page_scopes = feed_cache.generations(feed_cache.GLOBAL)
+        try:
+            response = view(request, *args, **kwargs)
+        finally:
+            scopes = request._page_scopes
+            request._page_scopes = None
+        if response.status_code != 200 or response.streaming:
+            return response
+        content = response.content.decode(response.charset)
+        cache.set(key, (scopes, content), settings.FEED_CACHE_TIMEOUT)
+        response.content = fill_holes(request, content)
+        return response
+    return wrapper
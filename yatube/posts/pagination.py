@@ -0,0 +1,136 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+def encode_cursor(post, direction=FORWARD):
+    """Упаковывает позицию поста в ленте в непрозрачный токен."""
+    raw = json.dumps([direction, post.pub_date.isoformat(), post.pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (направление, pub_date, pk) или None для битого токена."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, pub_date, pk = json.loads(
+            base64.urlsafe_b64decode(padded.encode()).decode()
+        )
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeError, ValueError, TypeError):
+        return None
+    if pub_date is None or direction not in (FORWARD, BACKWARD):
+        return None
+    return direction, pub_date, pk
+
+
+class CursorPage(Sequence):
+    """Страница ленты, построенная по ключу (pub_date, id).
+
+    В отличие от Page не требует COUNT(*) и OFFSET: соседние страницы
+    адресуются токенами next_cursor и previous_cursor.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        if not self.object_list:
+            return '<Cursor page (empty)>'
+        return '<Cursor page %s..%s>' % (
+            self.object_list[0].pk, self.object_list[-1].pk
+        )
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor(self.object_list[-1], FORWARD)
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self._has_previous and self.object_list:
+            return encode_cursor(self.object_list[0], BACKWARD)
+        return None
+
+
+def _keyset(posts):
+    """Queryset в порядке ленты и имена полей её ключа (дата, id).
+
+    Ключом служит явная сортировка queryset из двух убывающих полей,
+    по умолчанию ('-pub_date', '-pk').
+    """
+    ordering = posts.query.order_by or ('-pub_date', '-pk')
+    date_field, pk_field = (field.lstrip('-') for field in ordering)
+    return posts.order_by(*ordering), date_field, pk_field
+
+
+def _older(posts, date_field, pk_field, pub_date, pk):
+    return posts.filter(
+        Q(**{f'{date_field}__lt': pub_date})
+        | Q(**{date_field: pub_date, f'{pk_field}__lt': pk})
+    )
+
+
+def after_cursor(posts, token):
+    """Посты ленты после позиции из токена, без ограничения числа.
+
+    Для пустого, битого или обратного токена — лента с начала.
+    """
+    posts, date_field, pk_field = _keyset(posts)
+    cursor = decode_cursor(token)
+    if cursor is None or cursor[0] != FORWARD:
+        return posts
+    return _older(posts, date_field, pk_field, *cursor[1:])
+
+
+def cursor_page(posts, token, per_page):
+    """Выбирает одну страницу ленты после (или перед) позицией из токена."""
+    posts, date_field, pk_field = _keyset(posts)
+    cursor = decode_cursor(token)
+    if cursor is None:
+        object_list = list(posts[:per_page + 1])
+        has_next = len(object_list) > per_page
+        return CursorPage(object_list[:per_page], has_next, False)
+    direction, pub_date, pk = cursor
+    if direction == FORWARD:
+        object_list = list(_older(
+            posts, date_field, pk_field, pub_date, pk
+        )[:per_page + 1])
+        has_next = len(object_list) > per_page
+        return CursorPage(object_list[:per_page], has_next, True)
+    object_list = list(posts.filter(
+        Q(**{f'{date_field}__gt': pub_date})
+        | Q(**{date_field: pub_date, f'{pk_field}__gt': pk})
+    ).reverse()[:per_page + 1])
+    if len(object_list) <= per_page:
+        return cursor_page(posts, None, per_page)
+    return CursorPage(object_list[:per_page][::-1], True, True)
@@ -0,0 +1,174 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import Future
+from functools import partial
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from . import imaging, thumbnails
+from .storage import shard
+
+logger = logging.getLogger('yatube.resize')
+
+SALT = 'posts.resize'
+
+_lock = threading.Lock()
+# Незаконченные отрисовки: путь в кэше -> Future.
+_pending = {}
+# Оценка веса кэша в этом процессе; None — ещё не считали.
+_usage = None
+
+
+def signature(name, width, height):
+    value = f'{width}x{height}/{name}'
+    return salted_hmac(SALT, value).hexdigest()[:16]
+
+
+def check(signed, name, width, height):
+    return constant_time_compare(signed, signature(name, width, height))
+
+
+def url(name, width, height):
+    """Подписанный адрес картинки width×height; 0 — сторона по пропорции."""
+    return reverse('posts:resized_image', kwargs={
+        'signature': signature(name, width, height),
+        'width': width,
+        'height': height,
+        'name': name,
+    })
+
+
+def negotiate(accept):
+    """Лучший формат из тех, что принимает браузер; JPEG — всегда."""
+    for image_format in imaging.available_formats():
+        mime_type = imaging.MIME_TYPES[image_format]
+        if image_format == 'jpeg' or mime_type in accept:
+            return image_format
+
+
+def cache_path(name, width, height, image_format):
+    key = hashlib.sha1(
+        f'{name}|{width}x{height}|{image_format}'.encode()
+    ).hexdigest()
+    return os.path.join(
+        settings.RESIZE_CACHE_DIR,
+        shard('', key, f'.{imaging.EXTENSIONS[image_format]}'),
+    )
+
+
+def _entries():
+    for folder, _, files in os.walk(settings.RESIZE_CACHE_DIR):
+        for file_name in files:
+            path = os.path.join(folder, file_name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            yield stat.st_mtime, stat.st_size, path
+
+
+def evict():
+    """Удаляет давно не читанные файлы, пока кэш не станет меньше лимита.
+
+    Время изменения файла сдвигается при каждом чтении, поэтому
+    первыми уходят самые старые по нему.
+    """
+    global _usage
+    entries = sorted(_entries())
+    total = sum(size for _, size, _ in entries)
+    limit = settings.RESIZE_CACHE_MAX_SIZE * 0.9
+    for _, size, path in entries:
+        if total <= limit:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+    _usage = total
+
+
+def _account(path):
+    global _usage
+    if _usage is None:
+        _usage = sum(size for _, size, _ in _entries())
+    else:
+        try:
+            _usage += os.path.getsize(path)
+        except FileNotFoundError:
+            return
+    if _usage > settings.RESIZE_CACHE_MAX_SIZE:
+        evict()
+
+
+def _render(source, target, width, height, image_format):
+    """Отрисовка в пуле миниатюр или сразу при THUMBNAIL_WORKERS = 0."""
+    if settings.THUMBNAIL_WORKERS:
+        return thumbnails.executor().submit(
+            imaging.resize, source, target, width, height, image_format
+        )
+    future = Future()
+    future.set_result(
+        imaging.resize(source, target, width, height, image_format)
+    )
+    return future
+
+
+def _finish(target, future, done):
+    with _lock:
+        _pending.pop(target, None)
+    error = done.exception()
+    if error is not None:
+        logger.warning('Не удалось уменьшить картинку %s: %s', target, error)
+        future.set_exception(error)
+    else:
+        future.set_result(done.result())
+
+
+def _open(target):
+    """Открывает готовую картинку; время изменения отмечает чтение."""
+    image = open(target, 'rb')
+    try:
+        os.utime(target)
+    except FileNotFoundError:
+        # Открытый файл читается и после удаления.
+        pass
+    return image
+
+
+def _rendered(source, target, width, height, image_format):
+    """Отрисовывает картинку; одновременные запросы ждут одну отрисовку."""
+    with _lock:
+        future = _pending.get(target)
+        leader = future is None
+        if leader:
+            future = _pending[target] = Future()
+    if leader:
+        try:
+            rendered = _render(source, target, width, height, image_format)
+        except Exception as error:
+            rendered = Future()
+            rendered.set_exception(error)
+        rendered.add_done_callback(partial(_finish, target, future))
+    future.result()
+    if leader:
+        _account(target)
+
+
+def resized(source, target, width, height, image_format):
+    """Открытый файл готовой картинки из кэша, отрисованной при нужде.
+
+    Соседний процесс может вытеснить файл в любой момент, поэтому
+    отсутствующий файл отрисовывается, а вытесненный сразу после
+    отрисовки — ещё раз.
+    """
+    for _ in range(2):
+        try:
+            return _open(target)
+        except FileNotFoundError:
+            _rendered(source, target, width, height, image_format)
+    return _open(target)
@@ -0,0 +1,183 @@
+import base64
+import binascii
+import json
+
+from django.db import connection, transaction
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .pagination import CursorPage, cursor_page
+
+TABLE = 'posts_post_search'
+# Метки совпадений в сниппете: в тексте поста их не бывает, и они
+# переживают экранирование.
+MARK_START, MARK_END = '\x02', '\x03'
+SNIPPET_TOKENS = 16
+
+PAGE_SQL = f'''
+    SELECT rowid, score, snippet FROM (
+        SELECT {TABLE}.rowid AS rowid,
+               bm25({TABLE}) AS score,
+               snippet({TABLE}, 0, %s, %s, '…', {SNIPPET_TOKENS}) AS snippet
+        FROM {TABLE}
+        JOIN posts_post ON posts_post.id = {TABLE}.rowid
+        WHERE {TABLE} MATCH %s {{filters}}
+    )
+    {{after}}
+    ORDER BY score, rowid
+    LIMIT %s
+'''
+
+
+def available():
+    """FTS5 есть только в SQLite; на других базах поиск идёт через LIKE."""
+    return connection.vendor == 'sqlite'
+
+
+def fts_query(query):
+    """Слова запроса в синтаксисе FTS5: каждое в кавычках, все нужны."""
+    return ' '.join(
+        '"{}"'.format(word.replace('"', '""')) for word in query.split()
+    )
+
+
+def index(post_id, text):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {TABLE}(rowid, text) VALUES (%s, %s)',
+            [post_id, text],
+        )
+
+
+def unindex(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild(batch_size=1000, after=0):
+    """Заново строит индекс по постам с id больше after, пачками по pk.
+
+    Всё в одной транзакции: пока индекс строится, ищется по старому.
+    """
+    indexed = 0
+    last_pk = after
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid > %s', [after])
+        while True:
+            batch = list(
+                Post.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', 'text')[:batch_size]
+            )
+            if not batch:
+                return indexed
+            last_pk = batch[-1][0]
+            cursor.executemany(
+                f'INSERT INTO {TABLE}(rowid, text) VALUES (%s, %s)', batch
+            )
+            indexed += len(batch)
+
+
+def matching_ids_sql(query):
+    """Подзапрос id постов по запросу — для pk__in и админки."""
+    return (
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s',
+        [fts_query(query)],
+    )
+
+
+def highlight(snippet):
+    """Сниппет в HTML: текст экранирован, совпадения в <mark>."""
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def encode_cursor(score, pk):
+    raw = json.dumps([score, pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """(оценка, pk) или None для пустого или битого токена."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        score, pk = json.loads(
+            base64.urlsafe_b64decode(padded.encode()).decode()
+        )
+        return float(score), int(pk)
+    except (binascii.Error, UnicodeError, ValueError, TypeError):
+        return None
+
+
+class SearchPage(CursorPage):
+    """Страница результатов по ключу (оценка BM25, id).
+
+    Назад листать нельзя, только в начало: previous_cursor пустой.
+    """
+
+    def __init__(self, object_list, has_next, has_previous, scores):
+        super().__init__(object_list, has_next, has_previous)
+        self.scores = scores
+
+    @property
+    def next_cursor(self):
+        if self._has_next and self.object_list:
+            return encode_cursor(self.scores[-1], self.object_list[-1].pk)
+        return None
+
+    @property
+    def previous_cursor(self):
+        return ''
+
+
+def search_page(query, token=None, per_page=10, group_id=None,
+                author_id=None):
+    """Страница постов по запросу, лучшие по BM25 первыми.
+
+    У каждого поста появляется атрибут snippet с подсветкой. Без FTS5
+    посты ищутся через icontains по дате, без сниппетов.
+    """
+    if not available():
+        posts = Post.objects.select_related('author', 'group').filter(
+            text__icontains=query
+        )
+        if group_id is not None:
+            posts = posts.filter(group_id=group_id)
+        if author_id is not None:
+            posts = posts.filter(author_id=author_id)
+        return cursor_page(posts, token, per_page)
+    filters, params = [], [MARK_START, MARK_END, fts_query(query)]
+    for column, value in (('group_id', group_id), ('author_id', author_id)):
+        if value is not None:
+            filters.append(f'AND posts_post.{column} = %s')
+            params.append(value)
+    after = ''
+    cursor = decode_cursor(token)
+    if cursor is not None:
+        after = 'WHERE score > %s OR (score = %s AND rowid > %s)'
+        params += [cursor[0], cursor[0], cursor[1]]
+    params.append(per_page + 1)
+    sql = PAGE_SQL.format(filters=' '.join(filters), after=after)
+    with connection.cursor() as db:
+        db.execute(sql, params)
+        rows = db.fetchall()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [pk for pk, _, _ in rows]
+    )
+    object_list = []
+    scores = []
+    for pk, score, snippet in rows:
+        post = posts.get(pk)
+        if post is None:
+            continue
+        post.snippet = highlight(snippet)
+        object_list.append(post)
+        scores.append(score)
+    return SearchPage(object_list, has_next, cursor is not None, scores)
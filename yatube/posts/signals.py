@@ -0,0 +1,248 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import (
+    autocomplete, counters, feed_cache, media, search, thumbnails, timelines,
+)
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+CARD_USER_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def bump(*scopes):
+    """Сбрасывает области сразу и ещё раз после фиксации транзакции.
+
+    До фиксации соседний запрос может закэшировать старые данные уже
+    под новым поколением; второй сброс их отбрасывает.
+    """
+    feed_cache.bump(*scopes)
+    transaction.on_commit(partial(feed_cache.bump, *scopes))
+
+
+def bump_post_feeds(author_id, group_id):
+    bump(*feed_cache.post_scopes(author_id, group_id))
+
+
+def bump_profiles(*user_ids):
+    bump(*(feed_cache.scope('profile', pk) for pk in user_ids))
+
+
+def touch_posts(**filters):
+    """Сбрасывает кэш карточек постов, сдвигая их modified."""
+    Post.objects.filter(**filters).update(modified=timezone.now())
+
+
+@receiver(pre_save, sender=User)
+def user_renaming(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._renamed = False
+    if raw or not instance.pk:
+        return
+    if update_fields and not set(update_fields) & set(CARD_USER_FIELDS):
+        return
+    previous = User.objects.filter(pk=instance.pk).values(
+        *CARD_USER_FIELDS
+    ).first()
+    instance._renamed = previous is not None and any(
+        previous[field] != getattr(instance, field)
+        for field in CARD_USER_FIELDS
+    )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+        bump_profiles(instance.pk)
+    if getattr(instance, '_renamed', False):
+        touch_posts(author=instance)
+        bump(feed_cache.GLOBAL)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    bump_profiles(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def user_completed(sender, instance, created, raw=False, **kwargs):
+    if not raw and (created or getattr(instance, '_renamed', False)):
+        autocomplete.user_changed(instance)
+
+
+@receiver(post_delete, sender=User)
+def user_uncompleted(sender, instance, **kwargs):
+    autocomplete.removed(autocomplete.USER, instance.pk)
+
+
+@receiver(pre_save, sender=Post)
+def post_moving(sender, instance, raw=False, **kwargs):
+    instance._previous = None
+    if instance.pk and not raw:
+        instance._previous = Post.objects.filter(pk=instance.pk).values(
+            'author_id', 'group_id', 'image', 'image_hash'
+        ).first()
+
+
+@receiver(pre_save, sender=Post)
+def post_image_changing(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous', None)
+    if previous is not None and previous['image'] == instance.image.name:
+        return
+    thumbnails.fill_metadata(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    bump_post_feeds(instance.author_id, instance.group_id)
+    if created:
+        counters.change_user(instance.author_id, 'posts_count', 1)
+        if instance.group_id:
+            counters.change(Group, instance.group_id, 'posts_count', 1)
+        timelines.fan_out(instance)
+        media.acquire(instance.image.name)
+        return
+    previous = getattr(instance, '_previous', None)
+    if previous is None:
+        return
+    if previous['image'] != instance.image.name:
+        media.release(previous['image'], previous['image_hash'])
+        media.acquire(instance.image.name)
+    bump_post_feeds(previous['author_id'], previous['group_id'])
+    if previous['author_id'] != instance.author_id:
+        counters.change_user(previous['author_id'], 'posts_count', -1)
+        counters.change_user(instance.author_id, 'posts_count', 1)
+    if previous['group_id'] != instance.group_id:
+        if previous['group_id']:
+            counters.change(Group, previous['group_id'], 'posts_count', -1)
+        if instance.group_id:
+            counters.change(Group, instance.group_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    bump_post_feeds(instance.author_id, instance.group_id)
+    media.release(instance.image.name, instance.image_hash)
+    counters.change_user(instance.author_id, 'posts_count', -1)
+    if instance.group_id:
+        counters.change(Group, instance.group_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def post_indexed(sender, instance, raw=False, **kwargs):
+    if not raw and search.available():
+        search.index(instance.pk, instance.text)
+
+
+@receiver(post_delete, sender=Post)
+def post_unindexed(sender, instance, **kwargs):
+    if search.available():
+        search.unindex(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def post_group_ranked(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous', None)
+    if not created and previous is not None:
+        if previous['group_id'] == instance.group_id:
+            return
+        if previous['group_id']:
+            autocomplete.ranked(autocomplete.GROUP, previous['group_id'], -1)
+    if instance.group_id:
+        autocomplete.ranked(autocomplete.GROUP, instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_group_unranked(sender, instance, **kwargs):
+    if instance.group_id:
+        autocomplete.ranked(autocomplete.GROUP, instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change(
+            Post, instance.post_id, 'comments_count', 1,
+            modified=timezone.now(),
+        )
+        bump_comment_feeds(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change(
+        Post, instance.post_id, 'comments_count', -1,
+        modified=timezone.now(),
+    )
+    bump_comment_feeds(instance)
+
+
+def bump_comment_feeds(comment):
+    if Comment.post.is_cached(comment):
+        post = {
+            'author_id': comment.post.author_id,
+            'group_id': comment.post.group_id,
+        }
+    else:
+        post = Post.objects.filter(pk=comment.post_id).values(
+            'author_id', 'group_id'
+        ).first()
+    if post is not None:
+        bump_post_feeds(post['author_id'], post['group_id'])
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump(feed_cache.GLOBAL)
+
+
+@receiver(post_save, sender=Group)
+def group_completed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        autocomplete.group_changed(instance)
+
+
+@receiver(post_delete, sender=Group)
+def group_uncompleted(sender, instance, **kwargs):
+    autocomplete.removed(autocomplete.GROUP, instance.pk)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_touched(sender, instance, created=False, raw=False, **kwargs):
+    if not (created or raw):
+        touch_posts(group=instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user(instance.user_id, 'following_count', 1)
+        counters.change_user(instance.author_id, 'followers_count', 1)
+        timelines.backfill(instance.user, instance.author)
+        bump_profiles(instance.user_id, instance.author_id)
+        autocomplete.ranked(autocomplete.USER, instance.author_id, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_user(instance.user_id, 'following_count', -1)
+    counters.change_user(instance.author_id, 'followers_count', -1)
+    timelines.prune(instance.user_id, instance.author_id)
+    timelines.demote(instance.author_id)
+    bump_profiles(instance.user_id, instance.author_id)
+    autocomplete.ranked(autocomplete.USER, instance.author_id, -1)
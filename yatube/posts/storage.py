@@ -0,0 +1,44 @@
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files.storage import FileSystemStorage
+
+from .imaging import CHUNK_SIZE
+
+# Вложенные папки по началу хэша: в каждой не больше 256 подпапок.
+SHARDED_NAME = re.compile(r'(^|/)([0-9a-f]{2})/([0-9a-f]{2})/\2\3[^/]*$')
+
+
+def shard(folder, key, suffix=''):
+    """Путь вида folder/ab/cd/key: каталоги не разрастаются."""
+    return posixpath.join(folder, key[:2], key[2:4], key + suffix)
+
+
+def hashed_name(name, content):
+    """Имя файла по sha256 содержимого в папке исходного имени."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    key = digest.hexdigest()
+    extension = os.path.splitext(name)[1].lower()
+    return shard(posixpath.dirname(name), key, extension)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, где одинаковые файлы лежат один раз.
+
+    Имя файла — sha256 содержимого, поэтому повторная загрузка той же
+    картинки не пишет на диск ничего и получает уже готовое имя.
+    Удалять такие файлы можно только через счётчик ссылок в media.
+    """
+
+    def _save(self, name, content):
+        name = hashed_name(name, content)
+        if self.exists(name):
+            # Свежее время изменения не даёт сборщику мусора удалить
+            # файл, пока пост с ним ещё не сохранён.
+            os.utime(self.path(name))
+            return name
+        return super()._save(name, content)
@@ -0,0 +1,115 @@
+from django import template
+
+from posts import feed_cache, page_cache
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    def __init__(self, nodelist, name, pk):
+        self.nodelist = nodelist
+        self.name = name
+        self.pk = pk
+
+    def render(self, context):
+        scope = feed_cache.scope(
+            self.name.resolve(context),
+            self.pk.resolve(context) if self.pk else None,
+        )
+        request = context.get('request')
+        vary = request.GET.urlencode() if request else ''
+        return feed_cache.get_or_render(
+            feed_cache.fragment_key(scope, vary),
+            lambda: self.nodelist.render(context),
+        )
+
+
+@register.tag
+def feedcache(parser, token):
+    """Кэширует фрагмент ленты до смены поколения её области.
+
+    {% feedcache 'group' group.pk %} ... {% endfeedcache %}
+    """
+    bits = token.split_contents()
+    if len(bits) not in (2, 3):
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' принимает имя области и необязательный id"
+        )
+    nodelist = parser.parse(('endfeedcache',))
+    parser.delete_first_token()
+    return FeedCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        parser.compile_filter(bits[2]) if len(bits) == 3 else None,
+    )
+
+
+class PostCardNode(template.Node):
+    def __init__(self, nodelist, post, page, variant):
+        self.nodelist = nodelist
+        self.post = post
+        self.page = page
+        self.variant = variant
+
+    def render(self, context):
+        post = self.post.resolve(context)
+        variant = self.variant.resolve(context)
+        cards = context.render_context.get(self)
+        if cards is None:
+            cards = feed_cache.cached_cards(
+                variant, list(self.page.resolve(context))
+            )
+            context.render_context[self] = cards
+        content = cards.get(post.pk)
+        if content is None:
+            content = self.nodelist.render(context)
+            feed_cache.store_card(variant, post, content)
+        return content
+
+
+@register.tag
+def postcard(parser, token):
+    """Кэширует карточку поста; карточки страницы читаются разом.
+
+    {% postcard post page_obj 'feed' %} ... {% endpostcard %}
+    """
+    bits = token.split_contents()
+    if len(bits) != 4:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' принимает пост, страницу и вид карточки"
+        )
+    nodelist = parser.parse(('endpostcard',))
+    parser.delete_first_token()
+    return PostCardNode(
+        nodelist, *(parser.compile_filter(bit) for bit in bits[1:])
+    )
+
+
+class HoleNode(template.Node):
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+    def render(self, context):
+        request = context['request']
+        args = [str(arg.resolve(context)) for arg in self.args]
+        if page_cache.capturing(request):
+            return page_cache.hole_marker(self.name, *args)
+        return page_cache.render_hole(request, self.name, *args)
+
+
+@register.tag
+def hole(parser, token):
+    """Фрагмент, зависящий от пользователя, внутри кэшируемой страницы.
+
+    {% hole 'follow' client.pk client.username %}
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' принимает имя дыры и её аргументы"
+        )
+    name = bits[1].strip('\'"')
+    if name not in page_cache.HOLES:
+        raise template.TemplateSyntaxError(f"Неизвестная дыра '{name}'")
+    return HoleNode(name, [parser.compile_filter(bit) for bit in bits[2:]])
@@ -0,0 +1,49 @@
+import json
+
+from django import template
+
+from posts import resize
+from posts.imaging import MIME_TYPES, SIZE
+
+register = template.Library()
+
+# Картинка занимает всю ширину узкого экрана, иначе SIZE.
+SIZES = f'(max-width: {SIZE[0]}px) 100vw, {SIZE[0]}px'
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(post):
+    """<picture> с готовыми вариантами картинки поста.
+
+    Всё берётся из полей поста, файлы при отрисовке не читаются.
+    """
+    try:
+        variants = json.loads(post.image_variants or '[]')
+    except ValueError:
+        variants = []
+    srcsets = {}
+    for variant in variants:
+        srcsets.setdefault(variant['format'], []).append(
+            f"{variant['url']} {variant['width']}w"
+        )
+    fallback = srcsets.pop('jpeg', [])
+    return {
+        'pending': bool(post.image) and not post.thumbnail,
+        'src': post.thumbnail,
+        'srcset': ', '.join(fallback),
+        'sources': [
+            (MIME_TYPES[image_format], ', '.join(srcset))
+            for image_format, srcset in srcsets.items()
+        ],
+        'sizes': SIZES,
+        'width': SIZE[0],
+        'height': SIZE[1],
+    }
+
+
+@register.simple_tag
+def resized_url(image, width, height):
+    """Подписанный адрес картинки нужного размера; 0 — по пропорции."""
+    if not image:
+        return ''
+    return resize.url(image.name, width, height)
@@ -0,0 +1,170 @@
+import threading
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from posts import autocomplete
+from posts.models import Follow, Group, Post, User
+
+from .test_forms import Fixtures
+
+
+@override_settings(AUTOCOMPLETE_SYNC_INTERVAL=0)
+class AutocompleteTests(Fixtures):
+
+    def setUp(self):
+        super().setUp()
+        # Транзакция теста не фиксируется, поэтому журнал пишется сразу.
+        patcher = mock.patch.object(
+            autocomplete, 'record',
+            lambda *change: autocomplete.publish(change),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        autocomplete.index.reset()
+        autocomplete.lookup('прогрев')
+
+    def labels(self, prefix):
+        with self.assertNumQueries(0):
+            return [item['label'] for item in autocomplete.lookup(prefix)]
+
+    def test_prefix_of_any_word(self):
+        """Подсказки по началу логина, имени, фамилии, названия и слага"""
+        User.objects.create_user(
+            username='leo', first_name='Лев', last_name='Толстой'
+        )
+        expected = 'Лев Толстой (@leo)'
+        for prefix in ('LE', 'лев т', 'толст', 'Толстой'):
+            with self.subTest(prefix=prefix):
+                self.assertIn(expected, self.labels(prefix))
+        self.assertIn('Тестовая группа', self.labels('груп'))
+        self.assertIn('Тестовая группа', self.labels('test-sl'))
+        self.assertEqual(self.labels('олстой'), [])
+
+    def test_ranked_by_followers_and_posts(self):
+        """Авторы с бо́льшим числом подписчиков и группы с постами выше"""
+        self.check_ranking()
+
+    def test_memoized_answers_follow_ranks(self):
+        """Запомненные ответы поправляются при смене рангов"""
+        with mock.patch.object(autocomplete, 'MEMO_MIN_MATCHES', 1):
+            self.check_ranking()
+            self.assertTrue(autocomplete.index.memo)
+
+    def check_ranking(self):
+        self.assertEqual(self.labels('auth'), ['auth', 'auth2'])
+        Follow.objects.create(user=self.user, author=self.user2)
+        self.assertEqual(self.labels('auth'), ['auth2', 'auth'])
+        self.assertEqual(self.labels('групп'), ['Тестовая группа', 'Группа'])
+        group = Group.objects.get(slug='group2-slug')
+        for _ in range(3):
+            Post.objects.create(author=self.user, text='Х', group=group)
+        self.assertEqual(self.labels('групп'), ['Группа', 'Тестовая группа'])
+
+    def test_answer_not_memoized_after_concurrent_change(self):
+        """Ответ, посчитанный до изменения индекса, не запоминается"""
+        index = autocomplete.index
+        version = index.version
+        index.apply(('rank', autocomplete.USER, self.user.pk, 1))
+        index.remember(('auth', 10), [], version)
+        self.assertNotIn(('auth', 10), index.memo)
+        index.remember(('auth', 10), [], index.version)
+        self.assertIn(('auth', 10), index.memo)
+
+    def test_changes_replace_entries(self):
+        """Изменение подменяет список строк, а не правит его на месте"""
+        index = autocomplete.index
+        entries = list(index.entries)
+        before = index.entries
+        index.apply(('put', *autocomplete.user_item(999, 'ghost', '', '')))
+        self.assertIsNot(index.entries, before)
+        self.assertEqual(before, entries)
+        self.assertIn(('ghost', autocomplete.USER, 999), index.entries)
+
+    def test_stale_index_reloaded_in_background(self):
+        """Устаревший индекс перечитывается в фоне, ответы идут по старому"""
+        index = autocomplete.index
+        started, finish = threading.Event(), threading.Event()
+
+        def load():
+            started.set()
+            finish.wait(5)
+
+        with mock.patch.object(index, 'load', side_effect=load):
+            cache.delete(autocomplete.GENERATION_KEY)
+            self.assertEqual(self.labels('auth2'), ['auth2'])
+            self.assertTrue(started.wait(5))
+            reloader = index.reloader
+            self.assertEqual(self.labels('auth2'), ['auth2'])
+            finish.set()
+            reloader.join(5)
+        self.assertIsNone(index.reloader)
+
+    def test_index_follows_changes_without_queries(self):
+        """Переименование и удаление видны сразу, без чтения из базы"""
+        self.user.username = 'renamed'
+        self.user.save()
+        self.assertEqual(self.labels('auth'), ['auth2'])
+        self.assertEqual(self.labels('ren'), ['renamed'])
+        Group.objects.get(slug='group2-slug').delete()
+        self.assertEqual(self.labels('групп'), ['Тестовая группа'])
+        Group.objects.create(title='Новые книги', slug='books')
+        self.assertEqual(self.labels('кни'), ['Новые книги'])
+
+    def test_other_process_catches_up_from_journal(self):
+        """Другой процесс догоняет изменения по журналу в кэше"""
+        other = autocomplete.PrefixIndex()
+        other.sync()
+        User.objects.create_user(username='newbie')
+        with self.assertNumQueries(0):
+            other.sync()
+        self.assertEqual(
+            [item['value'] for item in other.lookup('new', 5)], ['newbie']
+        )
+
+    def test_view_returns_json(self):
+        """Эндпоинт отдаёт JSON со ссылками и не ходит в базу"""
+        url = reverse('posts:autocomplete')
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(url, {'q': 'auth2'})
+        self.assertEqual(response.json()['results'], [{
+            'type': 'user',
+            'label': 'auth2',
+            'value': 'auth2',
+            'url': reverse('posts:profile', kwargs={'username': 'auth2'}),
+        }])
+        response = self.guest_client.get(url, {'q': 'a', 'limit': 'x'})
+        self.assertEqual(response.status_code, 200)
+
+
+class Rollback(Exception):
+    pass
+
+
+@override_settings(AUTOCOMPLETE_SYNC_INTERVAL=0)
+class AutocompleteCommitTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        autocomplete.index.reset()
+        autocomplete.lookup('прогрев')
+
+    def values(self, prefix):
+        return [item['value'] for item in autocomplete.lookup(prefix)]
+
+    def test_rolled_back_changes_not_journaled(self):
+        """Откаченные изменения не попадают в индекс, зафиксированные — да"""
+        try:
+            with transaction.atomic():
+                User.objects.create_user(username='phantom')
+                self.assertEqual(self.values('phan'), [])
+                raise Rollback
+        except Rollback:
+            pass
+        self.assertEqual(self.values('phan'), [])
+        with transaction.atomic():
+            User.objects.create_user(username='phantom')
+        self.assertEqual(self.values('phan'), ['phantom'])
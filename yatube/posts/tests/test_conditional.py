@@ -0,0 +1,56 @@
+from http import HTTPStatus
+
+from django.urls import reverse
+
+from core.query_budget import QueryCounter
+from posts.models import Comment, Post
+
+from .test_forms import Fixtures
+
+
+class ConditionalGetTests(Fixtures):
+
+    def test_not_modified_without_rendering(self):
+        """Совпавший ETag даёт 304 без шаблонов и выборки постов"""
+        url = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        etag = self.guest_client.get(url)['ETag']
+        with QueryCounter() as counter:
+            response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        self.assertFalse(response.templates)
+        self.assertLessEqual(len(counter.queries), 1)
+
+    def test_etag_changes_on_writes(self):
+        """Новый пост и комментарий меняют ETag ленты и поста"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        etags = [self.guest_client.get(url)['ETag'] for url in urls]
+        Comment.objects.create(post=self.post, author=self.user2, text='!')
+        Post.objects.create(author=self.user, text='Ещё один пост')
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_validators_depend_on_user(self):
+        """У гостя и пользователя разные ETag, Last-Modified только у гостя"""
+        url = reverse('posts:index')
+        guest = self.guest_client.get(url)
+        user = self.authorized_client.get(url)
+        self.assertNotEqual(guest['ETag'], user['ETag'])
+        self.assertFalse(user.has_header('Last-Modified'))
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=guest['Last-Modified']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_missing_page_has_no_etag(self):
+        """Несуществующая страница отдаётся без валидаторов"""
+        response = self.guest_client.get(
+            reverse('posts:group_list', kwargs={'slug': 'missing'})
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertFalse(response.has_header('ETag'))
@@ -0,0 +1,86 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, UserStats
+
+from .test_forms import Fixtures
+
+
+class CountersTests(Fixtures):
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counters(self):
+        """Счётчики постов автора и группы следуют за постами"""
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+        self.assertEqual(Group.objects.get(pk=self.group.pk).posts_count, 2)
+        post = Post.objects.create(
+            author=self.user, text='Ещё пост', group=self.group2
+        )
+        self.assertEqual(self.stats(self.user).posts_count, 2)
+        self.assertEqual(Group.objects.get(pk=self.group2.pk).posts_count, 1)
+        post.group = self.group
+        post.save()
+        self.assertEqual(Group.objects.get(pk=self.group.pk).posts_count, 3)
+        self.assertEqual(Group.objects.get(pk=self.group2.pk).posts_count, 0)
+        post.delete()
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+        self.assertEqual(Group.objects.get(pk=self.group.pk).posts_count, 2)
+
+    def test_follow_and_comment_counters(self):
+        """Счётчики подписок и комментариев следуют за данными"""
+        self.authorized_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'auth2'})
+        )
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        self.assertEqual(self.stats(self.user2).followers_count, 1)
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post2.pk}),
+            data={'text': 'Комментарий'},
+        )
+        self.assertEqual(
+            Post.objects.get(pk=self.post2.pk).comments_count, 1
+        )
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'auth2'})
+        )
+        self.assertEqual(self.stats(self.user).following_count, 0)
+        self.assertEqual(self.stats(self.user2).followers_count, 0)
+
+    def test_pages_render_without_counting(self):
+        """Профиль и пост выводятся без запросов COUNT"""
+        for url in (
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    self.guest_client.get(url)
+                self.assertFalse(
+                    [q for q in queries if 'COUNT(' in q['sql'].upper()]
+                )
+
+    def test_reconcile_counters_command(self):
+        """Команда reconcile_counters находит и чинит расхождения"""
+        UserStats.objects.filter(user=self.user).update(posts_count=7)
+        Post.objects.filter(pk=self.post.pk).update(comments_count=0)
+        Follow.objects.bulk_create(
+            [Follow(user=self.user2, author=self.user)]
+        )
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.assertIn('posts_count: 7 -> 1', out.getvalue())
+        self.assertEqual(self.stats(self.user).posts_count, 7)
+        call_command('reconcile_counters', '--fix', stdout=StringIO())
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+        self.assertEqual(self.stats(self.user).followers_count, 1)
+        self.assertEqual(self.stats(self.user2).following_count, 1)
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).comments_count,
+            Comment.objects.filter(post=self.post).count(),
+        )
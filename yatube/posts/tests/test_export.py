@@ -0,0 +1,93 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from posts import export
+from posts.models import Follow, Post
+
+from .test_forms import Fixtures
+
+
+class ExportTests(Fixtures):
+
+    def run_command(self, *args):
+        stdout = io.StringIO()
+        call_command('export_data', *args, stdout=stdout, stderr=io.StringIO())
+        return stdout.getvalue()
+
+    def test_ndjson_by_author(self):
+        """NDJSON: по строке JSON на пост автора, по возрастанию id"""
+        Post.objects.create(author=self.user, text='Ещё пост')
+        lines = self.run_command('posts', '--author', 'auth').splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual(
+            [record['id'] for record in records],
+            list(Post.objects.filter(author=self.user).order_by('pk')
+                 .values_list('pk', flat=True)),
+        )
+        self.assertEqual(records[0]['group'], 'test-slug')
+        self.assertEqual(records[0]['author'], 'auth')
+
+    def test_csv_comments_by_group(self):
+        """CSV с заголовком; комментарии фильтруются по группе поста"""
+        output = self.run_command(
+            'comments', '--format', 'csv', '--group', 'test-slug'
+        )
+        rows = list(csv.reader(io.StringIO(output)))
+        self.assertEqual(rows[0], ['id', 'post', 'author', 'text', 'created'])
+        self.assertEqual(rows[1][3], 'Какой-то комментарий')
+        self.assertEqual(len(rows), 2)
+
+    def test_resume_after_id_in_small_batches(self):
+        """Выгрузку можно продолжить после последнего полученного id"""
+        for i in range(5):
+            Post.objects.create(author=self.user2, text=f'Пост {i}')
+        ids = list(Post.objects.order_by('pk').values_list('pk', flat=True))
+        output = self.run_command(
+            'posts', '--after-id', str(ids[2]), '--batch-size', '2'
+        )
+        self.assertEqual(
+            [json.loads(line)['id'] for line in output.splitlines()],
+            ids[3:],
+        )
+
+    def test_gzip_file_and_date_range(self):
+        """Сжатый файл и фильтр по датам"""
+        path = os.path.join(tempfile.gettempdir(), 'follows.ndjson.gz')
+        Follow.objects.create(user=self.user, author=self.user2)
+        self.run_command('follows', '--author', 'auth2', '--gzip',
+                         '--output', path)
+        with gzip.open(path, 'rt') as archive:
+            records = [json.loads(line) for line in archive]
+        self.assertEqual(records, [{
+            'id': Follow.objects.get().pk, 'user': 'auth', 'author': 'auth2',
+        }])
+        self.assertEqual(
+            self.run_command('posts', '--until', '2000-01-01'), ''
+        )
+
+    def test_unsupported_filters(self):
+        """У подписок нет группы и даты"""
+        with self.assertRaises(CommandError):
+            self.run_command('follows', '--group', 'test-slug')
+        with self.assertRaises(ValueError):
+            export.parse_moment('вчера')
+
+    def test_memory_does_not_grow_with_export(self):
+        """Записи читаются пачками, а не одним списком"""
+        for i in range(10):
+            Post.objects.create(author=self.user2, text=f'Пост {i}')
+        total = Post.objects.count()
+        records = export.rows(
+            'posts', export.queryset('posts'), batch_size=3
+        )
+        with self.assertNumQueries(1):
+            next(records)
+        with self.assertNumQueries(4):
+            self.assertEqual(len(list(records)), total - 1)
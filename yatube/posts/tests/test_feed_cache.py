@@ -0,0 +1,113 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from core.query_budget import QueryCounter
+from posts import feed_cache
+from posts.models import Comment, Group, Post, User
+
+from .test_forms import Fixtures
+
+
+class FeedCacheTests(Fixtures):
+
+    def test_fragment_served_from_cache(self):
+        """Повторный показ страницы не выбирает посты из базы"""
+        url = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        self.guest_client.get(url)
+        with QueryCounter() as counter:
+            response = self.guest_client.get(url)
+        self.assertContains(response, self.post.text)
+        self.assertFalse(
+            [sql for sql in counter.queries if 'posts_post' in sql]
+        )
+        self.assertEqual(feed_cache.stats()['hits'], 1)
+        self.assertEqual(feed_cache.stats()['misses'], 2)
+
+    def test_new_post_visible_immediately(self):
+        """Новый пост сразу сбрасывает кэш главной, группы и профиля"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+        )
+        for url in urls:
+            self.guest_client.get(url)
+        Post.objects.create(
+            author=self.user, text='Свежайший пост', group=self.group
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.guest_client.get(url), 'Свежайший пост'
+                )
+
+    def test_pages_cached_separately(self):
+        """Разные страницы ленты не делят один фрагмент"""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост №{i}') for i in range(12)
+        )
+        url = reverse('posts:index')
+        first = self.guest_client.get(url).content
+        second = self.guest_client.get(url, {'page': 2}).content
+        self.assertNotEqual(first, second)
+
+    def test_comment_and_group_invalidate(self):
+        """Комментарий и правка группы сбрасывают фрагменты лент"""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        Comment.objects.create(post=self.post, author=self.user, text='!')
+        self.assertContains(self.guest_client.get(url), 'Комментариев: 2')
+        Group.objects.filter(pk=self.group.pk).update(slug='other')
+        self.assertNotContains(self.guest_client.get(url), '/group/other/')
+        group = Group.objects.get(pk=self.group.pk)
+        group.save()
+        self.assertContains(self.guest_client.get(url), '/group/other/')
+
+    def test_cards_reused_between_fragments(self):
+        """Карточка берётся из кэша, пока пост не изменился"""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        post = Post.objects.get(pk=self.post.pk)
+        cache.set(feed_cache.card_key('feed', post), 'Карточка из кэша')
+        feed_cache.bump('index')
+        self.assertContains(self.guest_client.get(url), 'Карточка из кэша')
+        post.text = 'Исправленный текст'
+        post.save()
+        response = self.guest_client.get(url)
+        self.assertNotContains(response, 'Карточка из кэша')
+        self.assertContains(response, 'Исправленный текст')
+
+    def test_author_rename_refreshes_cards(self):
+        """Новое имя автора сразу видно в карточках"""
+        url = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        self.guest_client.get(url)
+        self.user.first_name = 'Переименованный'
+        self.user.save()
+        self.assertContains(self.guest_client.get(url), 'Переименованный')
+
+    def test_stats_view_for_staff_only(self):
+        """Статистику кэша видит только персонал"""
+        url = reverse('posts:feed_cache_stats')
+        response = self.authorized_client.get(url)
+        self.assertEqual(response.status_code, 302)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.authorized_client.force_login(staff)
+        response = self.authorized_client.get(url)
+        self.assertEqual(set(response.json()), {'hits', 'misses', 'hit_ratio'})
+
+
+class FeedCacheCommitTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+
+    def test_bumped_again_after_commit(self):
+        """Закэшированное до фиксации сбрасывается после неё"""
+        scope = feed_cache.scope('profile', self.user.pk)
+        with transaction.atomic():
+            Post.objects.create(author=self.user, text='Пост')
+            during = feed_cache.generations(scope)[scope]
+        self.assertGreater(feed_cache.generations(scope)[scope], during)
@@ -2,6 +2,7 @@ import shutil
 import tempfile
 from http import HTTPStatus
 
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
@@ -9,7 +10,7 @@ from django.urls import reverse
 from posts.models import Comment, Group, Post, User
 
 
-@override_settings(MEDIA_ROOT=tempfile.gettempdir())
+@override_settings(MEDIA_ROOT=tempfile.gettempdir(), THUMBNAIL_WORKERS=0)
 class Fixtures(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -63,6 +64,7 @@ class Fixtures(TestCase):
         shutil.rmtree(tempfile.gettempdir(), ignore_errors=True)
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
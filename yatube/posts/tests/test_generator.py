@@ -0,0 +1,110 @@
+import io
+import os
+import shutil
+import tempfile
+from collections import Counter
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils.dateparse import parse_datetime
+
+from posts.generator import Generator
+from posts.models import Comment, Follow, MediaFile, Post, User, UserStats
+
+# Картинки и временные файлы загрузки — в своей папке: общую
+# tempfile.gettempdir() тесты с картинками удаляют целиком.
+TEMP_DIR = tempfile.mkdtemp()
+
+
+def generate(seed=0, **counts):
+    records = list(Generator(seed=seed, **counts).records())
+    by_model = {}
+    for record in records:
+        by_model.setdefault(record['model'], []).append(record)
+    return records, by_model
+
+
+@override_settings(MEDIA_ROOT=TEMP_DIR, THUMBNAIL_WORKERS=0)
+class GeneratorTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        os.makedirs(TEMP_DIR, exist_ok=True)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+    def test_same_seed_same_records(self):
+        """Одно зерно даёт тот же набор, другое — другой"""
+        counts = {'users': 30, 'posts': 100, 'comments': 100, 'follows': 60}
+        first, _ = generate(seed=1, **counts)
+        self.assertEqual(first, generate(seed=1, **counts)[0])
+        self.assertNotEqual(first, generate(seed=2, **counts)[0])
+
+    def test_skewed_followers_and_comments(self):
+        """Подписчики и комментарии собираются у немногих"""
+        _, records = generate(
+            users=200, posts=1000, comments=3000, follows=2000
+        )
+        pairs = [
+            (record['fields']['user'], record['fields']['author'])
+            for record in records['posts.follow']
+        ]
+        self.assertEqual(len(pairs), len(set(pairs)))
+        self.assertTrue(all(user != author for user, author in pairs))
+        followers = Counter(author for _, author in pairs).most_common()
+        self.assertGreater(followers[0][1], 20 * followers[-1][1])
+        comments = Counter(
+            record['fields']['post'] for record in records['posts.comment']
+        ).most_common()
+        self.assertGreater(comments[0][1], 20 * comments[-1][1])
+        posted = {
+            record['pk']: parse_datetime(record['fields']['pub_date'])
+            for record in records['posts.post']
+        }
+        for record in records['posts.comment']:
+            created = parse_datetime(record['fields']['created'])
+            self.assertGreaterEqual(created, posted[record['fields']['post']])
+
+    def test_wrong_counts_rejected(self):
+        with self.assertRaises(CommandError):
+            call_command('generate_data', '--users', '1', '--posts', '0',
+                         '--comments', '0', stdout=io.StringIO())
+
+    def test_command_loads_dataset_with_images(self):
+        """Набор грузится пачками, картинки общие у многих постов"""
+        stdout = io.StringIO()
+        call_command(
+            'generate_data', '--users', '20', '--groups', '3',
+            '--posts', '60', '--comments', '80', '--follows', '40',
+            '--images', '2', '--prefix', 'bench', '--temp-dir', TEMP_DIR,
+            stdout=stdout,
+        )
+        self.assertIn('posts.post: 60 строк', stdout.getvalue())
+        users = User.objects.filter(username__startswith='bench')
+        self.assertEqual(users.count(), 20)
+        posts = Post.objects.filter(author__in=users)
+        self.assertEqual(posts.count(), 60)
+        self.assertEqual(
+            Comment.objects.filter(post__in=posts).count(), 80
+        )
+        self.assertEqual(Follow.objects.filter(user__in=users).count(), 40)
+        author = UserStats.objects.filter(user__in=users).order_by(
+            '-followers_count'
+        ).first()
+        self.assertEqual(
+            author.followers_count,
+            Follow.objects.filter(author=author.user_id).count(),
+        )
+        pictured = posts.exclude(image='')
+        self.assertTrue(pictured.exists())
+        self.assertFalse(pictured.filter(image_hash='').exists())
+        for media_file in MediaFile.objects.filter(
+            name__in=pictured.values('image')
+        ):
+            self.assertEqual(
+                media_file.refs, posts.filter(image=media_file.name).count()
+            )
@@ -0,0 +1,172 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from posts import importer, search
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+
+DUMP = os.path.join(settings.BASE_DIR, 'dump.json')
+# Общий tempfile.gettempdir() тесты с картинками удаляют целиком
+# (Fixtures.tearDownClass), поэтому дампы и временные файлы импорта
+# лежат в своей папке, которую каждый класс создаёт заново.
+TEMP_DIR = tempfile.mkdtemp()
+
+
+class PrivateTempDir:
+    """TEMP_DIR на время класса тестов."""
+
+    @classmethod
+    def setUpClass(cls):
+        os.makedirs(TEMP_DIR, exist_ok=True)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_DIR, ignore_errors=True)
+
+
+def load_dump():
+    with open(DUMP, encoding='utf-8') as dump:
+        return json.load(dump)
+
+
+class ImporterTests(PrivateTempDir, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+
+    def run_command(self, *args):
+        stdout = io.StringIO()
+        call_command(
+            'import_data', *args, '--temp-dir', TEMP_DIR, stdout=stdout
+        )
+        return stdout.getvalue()
+
+    def test_streaming_parser_matches_json_load(self):
+        """Массив читается по объекту при любом размере куска"""
+        for chunk_size in (1, 7, 4096):
+            with self.subTest(chunk_size=chunk_size):
+                with open(DUMP, encoding='utf-8') as dump:
+                    records = list(importer.iter_json_array(dump, chunk_size))
+                self.assertEqual(records, load_dump())
+        for broken in ('{}', '[{"a": 1}', ''):
+            with self.subTest(broken=broken):
+                with self.assertRaises(ValueError):
+                    list(importer.iter_json_array(io.StringIO(broken), 4))
+
+    def test_dump_imported_with_new_ids(self):
+        """Дамп загружается поверх данных, ссылки переводятся на новые id"""
+        posts_before = Post.objects.count()
+        output = self.run_command(DUMP, '--batch-size', '10')
+        self.assertIn('posts.post: 37 строк', output)
+        self.assertIn('строк/с', output)
+        self.assertEqual(Post.objects.count(), posts_before + 37)
+        leo = User.objects.get(username='leo')
+        first = Post.objects.filter(author=leo).order_by('pub_date').first()
+        self.assertEqual(first.pub_date.year, 1854)
+        comment = Comment.objects.get(text='Мы - русские! Какой восторг!')
+        self.assertEqual(comment.author.username, 'admin1')
+        dumped = {
+            (record['model'], record['pk']): record['fields']
+            for record in load_dump()
+        }
+        self.assertEqual(comment.post.text, dumped['posts.post', 43]['text'])
+        self.assertTrue(Follow.objects.filter(
+            user__username='admin1', author=leo
+        ).exists())
+
+    def test_side_effects_reconciled(self):
+        """Счётчики, ленты и поиск сверены после загрузки"""
+        self.run_command(DUMP)
+        leo = User.objects.get(username='leo')
+        stats = UserStats.objects.get(user=leo)
+        self.assertEqual(stats.posts_count, leo.posts.count())
+        self.assertEqual(stats.followers_count, 1)
+        for group in Group.objects.all():
+            self.assertEqual(group.posts_count, group.posts.count())
+        admin = User.objects.get(username='admin1')
+        self.assertEqual(admin.timeline.count(), leo.posts.count())
+        if search.available():
+            page = search.search_page('дневника', author_id=leo.pk)
+            self.assertTrue(page.object_list)
+
+    def test_ndjson_gz_skips_orphans_and_merges_users(self):
+        """NDJSON.gz: сироты пропускаются, знакомые логины не дублируются"""
+        records = [
+            {'model': 'auth.user', 'pk': 7, 'fields': {
+                'username': 'auth', 'password': '!',
+            }},
+            {'model': 'posts.post', 'pk': 1, 'fields': {
+                'text': 'Свой', 'author': 7, 'group': 99,
+                'pub_date': '2020-01-01T00:00:00Z',
+            }},
+            {'model': 'posts.post', 'pk': 2, 'fields': {
+                'text': 'Сирота', 'author': 8,
+                'pub_date': '2020-01-01T00:00:00Z',
+            }},
+            {'model': 'sessions.session', 'pk': 'x', 'fields': {}},
+        ]
+        path = os.path.join(TEMP_DIR, 'dump.ndjson.gz')
+        with gzip.open(path, 'wt', encoding='utf-8') as dump:
+            for record in records:
+                dump.write(json.dumps(record) + '\n')
+        loader = importer.Importer(batch_size=2, tempdir=TEMP_DIR)
+        loader.run(importer.read_dump(path))
+        self.assertEqual(User.objects.filter(username='auth').count(), 1)
+        own = Post.objects.get(text='Свой')
+        self.assertEqual(own.author, self.user)
+        self.assertEqual(UserStats.objects.get(user=self.user).posts_count, 1)
+        self.assertIsNone(own.group)
+        self.assertFalse(Post.objects.filter(text='Сирота').exists())
+        self.assertEqual(loader.stats['posts.post'][:2], [1, 1])
+        self.assertEqual(loader.ignored, 1)
+
+    def test_broken_record_stops_after_reconcile(self):
+        """Битое поле — ошибка команды, вставленное до него сверено"""
+        records = [
+            {'model': 'auth.user', 'pk': 1, 'fields': {
+                'username': 'writer', 'password': '!',
+            }},
+            {'model': 'posts.post', 'pk': 1, 'fields': {
+                'text': 'Целый', 'author': 1,
+                'pub_date': '2020-01-01T00:00:00Z',
+            }},
+            {'model': 'posts.post', 'pk': 2, 'fields': {
+                'text': 'Битый', 'author': 1, 'pub_date': 'garbage',
+            }},
+        ]
+        path = os.path.join(TEMP_DIR, 'broken.ndjson')
+        with open(path, 'w', encoding='utf-8') as dump:
+            for record in records:
+                dump.write(json.dumps(record) + '\n')
+        with self.assertRaisesMessage(CommandError, 'Уже вставлено строк: 2'):
+            self.run_command(path, '--batch-size', '1')
+        writer = User.objects.get(username='writer')
+        self.assertEqual(list(writer.posts.values_list('text', flat=True)),
+                         ['Целый'])
+        self.assertEqual(UserStats.objects.get(user=writer).posts_count, 1)
+
+
+class DeferredIndexTests(PrivateTempDir, TransactionTestCase):
+
+    def test_indexes_restored_after_import(self):
+        """Вне транзакции индексы снимаются на время загрузки и строятся"""
+        loader = importer.Importer(batch_size=100, tempdir=TEMP_DIR)
+        loader.run(importer.read_dump(DUMP))
+        self.assertEqual(Post.objects.count(), 37)
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Post._meta.db_table
+            )
+        for index in Post._meta.indexes:
+            self.assertIn(index.name, constraints)
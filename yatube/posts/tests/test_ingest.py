@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from posts.imaging import ORIENTATION
+from posts.ingest import ingest
+
+
+def jpeg(size, orientation=None, noise=False):
+    if noise:
+        image = Image.effect_noise(
+            (size[0] // 2, size[1] // 2), 64
+        ).convert('RGB').resize(size)
+    else:
+        image = Image.new('RGB', size, 'white')
+    exif = Image.Exif()
+    if orientation:
+        exif[ORIENTATION] = orientation
+    output = BytesIO()
+    image.save(output, 'JPEG', quality=90, exif=exif)
+    return SimpleUploadedFile('big.jpg', output.getvalue(), 'image/jpeg')
+
+
+# Своя папка для временных файлов загрузок: общий tempfile.gettempdir()
+# удаляют целиком тесты с картинками (Fixtures.tearDownClass).
+UPLOAD_DIR = tempfile.mkdtemp()
+
+
+@override_settings(IMAGE_MAX_SIDE=2048, FILE_UPLOAD_TEMP_DIR=UPLOAD_DIR)
+class IngestTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(UPLOAD_DIR, ignore_errors=True)
+
+    def test_large_photo_downscaled_and_rotated(self):
+        """Большой снимок уменьшается, поворачивается и теряет EXIF"""
+        result = ingest(jpeg((6000, 4000), orientation=6))
+        with Image.open(result.temporary_file_path()) as image:
+            self.assertEqual(image.size, (1365, 2048))
+            self.assertEqual(image.format, 'JPEG')
+            self.assertFalse(image.getexif())
+
+    def test_small_image_kept_as_is(self):
+        """Небольшая картинка без EXIF не перекодируется"""
+        upload = jpeg((300, 200))
+        data = upload.read()
+        result = ingest(upload)
+        self.assertEqual(result.read(), data)
+
+    def test_decode_memory_bounded(self):
+        """Исходник не декодируется в полном размере"""
+        width, height = 6000, 4000
+        upload = jpeg((width, height), orientation=6, noise=True)
+        block_size = Image.core.get_block_size()
+        Image.core.set_block_size(2 ** 20)
+        try:
+            Image.core.clear_cache()
+            before = Image.core.get_stats()['allocated_blocks']
+            ingest(upload)
+            blocks = Image.core.get_stats()['allocated_blocks'] - before
+        finally:
+            Image.core.set_block_size(block_size)
+        self.assertLess(blocks * 2 ** 20, width * height * 4)
+
+    @override_settings(IMAGE_MAX_PIXELS=1000)
+    def test_too_many_pixels_rejected(self):
+        """Картинка с лишними пикселями отклоняется до декодирования"""
+        with self.assertRaises(ValidationError) as error:
+            ingest(jpeg((100, 100)))
+        self.assertEqual(error.exception.code, 'image_pixels')
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=100)
+    def test_too_large_file_rejected(self):
+        """Слишком тяжёлый файл отклоняется"""
+        with self.assertRaises(ValidationError) as error:
+            ingest(jpeg((100, 100)))
+        self.assertEqual(error.exception.code, 'image_size')
+
+    def test_not_an_image_rejected(self):
+        """Не картинка отклоняется"""
+        upload = SimpleUploadedFile('fake.jpg', b'not an image', 'image/jpeg')
+        with self.assertRaises(ValidationError) as error:
+            ingest(upload)
+        self.assertEqual(error.exception.code, 'invalid_image')
@@ -0,0 +1,190 @@
+import json
+import os
+import tempfile
+from io import BytesIO, StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import override_settings
+from PIL import Image
+
+from posts import media, thumbnails
+from posts.management.commands.migrate_media import url_to_name
+from posts.models import MediaFile, Post
+from posts.storage import SHARDED_NAME
+
+from .test_forms import Fixtures
+
+
+def gif(color):
+    output = BytesIO()
+    Image.new('RGB', (3, 3), color).save(output, 'GIF')
+    return output.getvalue()
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.gettempdir(), THUMBNAIL_WORKERS=0, MEDIA_MIN_AGE=0
+)
+class MediaStorageTests(Fixtures):
+
+    def create_post(self, content, name='pic.gif'):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(name, content, 'image/gif'),
+        )
+
+    def test_same_upload_shares_file(self):
+        """Одинаковые загрузки лежат в одном файле со счётчиком ссылок"""
+        name = self.post.image.name
+        self.assertRegex(name, SHARDED_NAME)
+        self.assertEqual(self.post2.image.name, name)
+        self.assertEqual(MediaFile.objects.get(name=name).refs, 2)
+
+    def test_file_removed_with_last_reference(self):
+        """Файл и варианты удаляются, только когда ссылок не осталось"""
+        first = self.create_post(gif('red'))
+        second = self.create_post(gif('red'), name='copy.gif')
+        thumbnails.enqueue(first)
+        name = first.image.name
+        variant = thumbnails.variant_name(first.image_hash[:16], 'jpeg', 400)
+        first.delete()
+        self.assertFalse(media.collect(name, first.image_hash))
+        self.assertTrue(media.storage.exists(name))
+        self.assertTrue(default_storage.exists(variant))
+        second.delete()
+        self.assertTrue(media.collect(name, second.image_hash))
+        self.assertFalse(media.storage.exists(name))
+        self.assertFalse(default_storage.exists(variant))
+
+    @override_settings(MEDIA_MIN_AGE=60)
+    def test_reused_file_not_dropped(self):
+        """Файл, который только что получила повторная загрузка, остаётся"""
+        post = self.create_post(gif('olive'))
+        name, image_hash = post.image.name, post.image_hash
+        post.delete()
+        os.utime(media.storage.path(name), (0, 0))
+        self.assertEqual(
+            media.storage.save('posts/again.gif', ContentFile(gif('olive'))),
+            name,
+        )
+        self.assertFalse(media.collect(name, image_hash))
+        self.assertTrue(media.storage.exists(name))
+        call_command('collect_media', '--min-age=60', stdout=StringIO())
+        self.assertTrue(media.storage.exists(name))
+
+    def test_edit_releases_old_image(self):
+        """Смена картинки снимает ссылку со старого файла"""
+        post = self.create_post(gif('blue'))
+        old_name, old_hash = post.image.name, post.image_hash
+        post.image = SimpleUploadedFile('new.gif', gif('green'), 'image/gif')
+        post.save()
+        self.assertEqual(MediaFile.objects.get(name=old_name).refs, 0)
+        self.assertEqual(MediaFile.objects.get(name=post.image.name).refs, 1)
+        self.assertTrue(media.collect(old_name, old_hash))
+        self.assertFalse(media.storage.exists(old_name))
+
+    def test_layout_sharded_by_hash(self):
+        """Оригиналы и варианты лежат в папках по двум парам хэша"""
+        thumbnails.enqueue(self.post)
+        post = Post.objects.get(pk=self.post.pk)
+        key = post.image_hash
+        self.assertEqual(
+            post.image.name, f'posts/{key[:2]}/{key[2:4]}/{key}.gif'
+        )
+        self.assertIn(
+            f'thumbs/{key[:2]}/{key[2:4]}/{key[:16]}_400.jpg', post.thumbnail
+        )
+
+    def test_benchmark_finds_sharded_files(self):
+        """Замер по умолчанию берёт оригиналы из подпапок posts/"""
+        out = StringIO()
+        call_command('benchmark_images', stdout=out)
+        self.assertNotIn('Картинок: 0', out.getvalue())
+        self.assertIn('До: ', out.getvalue())
+
+    def test_migrate_command(self):
+        """Команда переносит файлы в папки, старые удаляет с --cleanup"""
+        content = gif('yellow')
+        legacy = [
+            default_storage.save(f'posts/legacy{i}.gif', ContentFile(content))
+            for i in range(2)
+        ]
+        old_thumb = default_storage.save(
+            'thumbs/le/legacy_400.jpg', ContentFile(b'jpeg')
+        )
+        for name, post in zip(legacy, (self.post, self.post2)):
+            Post.objects.filter(pk=post.pk).update(
+                image=name,
+                thumbnail=default_storage.url(old_thumb),
+                image_variants=json.dumps([{
+                    'format': 'jpeg', 'width': 400,
+                    'url': default_storage.url(old_thumb),
+                }]),
+            )
+        out = StringIO()
+        call_command('migrate_media', stdout=out)
+        self.assertIn('Картинок перенесено: 2', out.getvalue())
+        names = set(Post.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertRegex(name, SHARDED_NAME)
+        self.assertEqual(MediaFile.objects.get(name=name).refs, 2)
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertRegex(post.thumbnail, SHARDED_NAME)
+        self.assertEqual(
+            json.loads(post.image_variants)[0]['url'], post.thumbnail
+        )
+        # Старые адреса работают до --cleanup.
+        for old in (*legacy, old_thumb):
+            self.assertTrue(default_storage.exists(old))
+        call_command('migrate_media', '--cleanup', stdout=StringIO())
+        for old in (*legacy, old_thumb):
+            self.assertFalse(default_storage.exists(old))
+        self.assertTrue(default_storage.exists(name))
+
+    def test_collect_command(self):
+        """Сборщик удаляет только файлы без ссылок"""
+        thumbnails.enqueue(self.post)
+        post = Post.objects.get(pk=self.post.pk)
+        orphans = [
+            media.storage.save('posts/orphan.gif', ContentFile(gif('navy'))),
+            default_storage.save(
+                thumbnails.variant_name('f' * 16, 'jpeg', 400),
+                ContentFile(b'jpeg'),
+            ),
+            default_storage.save('cache/ab/cd/old.jpg', ContentFile(b'jpeg')),
+        ]
+        live = [post.image.name, url_to_name(post.thumbnail)]
+        call_command('collect_media', '--min-age=60', stdout=StringIO())
+        call_command(
+            'collect_media', '--min-age=0', '--dry-run', stdout=StringIO()
+        )
+        for name in orphans + live:
+            self.assertTrue(default_storage.exists(name))
+        out = StringIO()
+        call_command('collect_media', '--min-age=0', stdout=out)
+        self.assertIn('Удалено мусора: 3', out.getvalue())
+        for name in orphans:
+            self.assertFalse(default_storage.exists(name))
+        for name in live:
+            self.assertTrue(default_storage.exists(name))
+
+    def test_collect_keeps_variants_of_unhashed_posts(self):
+        """Варианты постов без хэша находятся обходом таких постов"""
+        thumbnails.enqueue(self.post)
+        post = Post.objects.get(pk=self.post.pk)
+        variant = url_to_name(post.thumbnail)
+        Post.objects.filter(pk=self.post2.pk).update(
+            image_hash='', image_variants=post.image_variants
+        )
+        Post.objects.filter(pk=self.post.pk).update(
+            image_hash='', image_variants='[{"url": "/media/x/y_400.jpg"}]'
+        )
+        call_command(
+            'collect_media', '--min-age=0', '--batch-size=1',
+            stdout=StringIO(),
+        )
+        self.assertTrue(default_storage.exists(variant))
@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
+
+MEDIA_ROOT = tempfile.mkdtemp()
+CONTENT = bytes(range(256)) * 4
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, MEDIA_SENDFILE='')
+class MediaServingTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(MEDIA_ROOT, 'posts'), exist_ok=True)
+        with open(os.path.join(MEDIA_ROOT, 'posts', 'file.bin'), 'wb') as f:
+            f.write(CONTENT)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    url = '/media/posts/file.bin'
+
+    def test_full_file_with_validators(self):
+        """Файл отдаётся целиком с ETag и долгим кэшем, повтор — 304"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        again = self.client.get(
+            self.url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(again.status_code, 304)
+
+    def test_range_requests(self):
+        """Range отдаёт только нужный кусок"""
+        cases = (
+            ('bytes=2-5', CONTENT[2:6], f'bytes 2-5/{len(CONTENT)}'),
+            ('bytes=-3', CONTENT[-3:], f'bytes 1021-1023/{len(CONTENT)}'),
+            ('bytes=1000-', CONTENT[1000:], f'bytes 1000-1023/{len(CONTENT)}'),
+        )
+        for header, body, content_range in cases:
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(b''.join(response.streaming_content), body)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(int(response['Content-Length']), len(body))
+
+    def test_unsatisfiable_and_stale_ranges(self):
+        """Диапазон за концом файла — 416, устаревший If-Range — весь файл"""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        response = self.client.get(
+            self.url, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"old"'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(
+        MEDIA_SENDFILE='x-accel-redirect',
+        MEDIA_ACCEL_PREFIX='/protected-media/',
+    )
+    def test_sendfile_offload(self):
+        """С X-Accel-Redirect тело отдаёт фронтовый сервер"""
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/posts/file.bin'
+        )
+        self.assertEqual(response.content, b'')
+
+    def test_outside_media_root_not_found(self):
+        """Пути за пределами MEDIA_ROOT и папки не отдаются"""
+        for url in ('/media/../manage.py', '/media/posts/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
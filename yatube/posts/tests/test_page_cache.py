@@ -0,0 +1,42 @@
+from django.urls import reverse
+
+from posts import feed_cache
+from posts.models import Post
+
+from .test_forms import Fixtures
+
+
+class PageCacheTests(Fixtures):
+
+    def test_cached_page_has_personal_holes(self):
+        """Гость и автор получают одну страницу с разными дырами"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        guest = self.guest_client.get(url)
+        author = self.authorized_client.get(url)
+        self.assertEqual(feed_cache.stats()['hits'], 1)
+        self.assertNotContains(guest, 'Редактировать')
+        self.assertNotContains(guest, 'csrfmiddlewaretoken')
+        self.assertContains(guest, 'Войти')
+        self.assertContains(author, 'Редактировать')
+        self.assertContains(author, 'csrfmiddlewaretoken')
+        self.assertContains(author, 'Выйти')
+        self.assertNotContains(author, '<!--hole:')
+
+    def test_follow_button_and_counters(self):
+        """Кнопка подписки своя у каждого, счётчики сразу свежие"""
+        url = reverse('posts:profile', kwargs={'username': 'auth2'})
+        self.assertNotContains(self.guest_client.get(url), 'Подписаться')
+        self.assertContains(self.authorized_client.get(url), 'Подписаться')
+        self.authorized_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'auth2'})
+        )
+        response = self.authorized_client.get(url)
+        self.assertContains(response, 'Отписаться')
+        self.assertContains(response, 'Подписчиков: 1')
+
+    def test_deleted_post_not_served(self):
+        """Удалённый пост не отдаётся из кэша страниц"""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post2.pk})
+        self.guest_client.get(url)
+        Post.objects.get(pk=self.post2.pk).delete()
+        self.assertEqual(self.guest_client.get(url).status_code, 404)
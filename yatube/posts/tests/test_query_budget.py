@@ -0,0 +1,82 @@
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+
+from core.query_budget import QueryBudgetMixin
+from posts import views
+from posts.models import Comment, Follow, Post
+
+from .test_forms import Fixtures
+
+BUDGET_MIDDLEWARE = 'core.middleware.QueryBudgetMiddleware'
+
+
+class QueryBudgetTests(QueryBudgetMixin, Fixtures):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        Follow.objects.create(user=cls.user, author=cls.user2)
+        for i in range(15):
+            post = Post.objects.create(
+                author=cls.user2,
+                text=f'Пост {i}',
+                group=cls.group,
+                image=cls.image,
+            )
+            Comment.objects.create(post=post, author=cls.user, text='Ок')
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_read_views_within_budget(self):
+        """Ленты и страница поста укладываются в бюджет запросов"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:index') + '?cursor=',
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth2'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            reverse('posts:follow_index'),
+            reverse('posts:create_post'),
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.authorized_client.get(url)
+                # Меряется запрос мимо кэша страниц и фрагментов.
+                cache.clear()
+                self.assertWithinQueryBudget(self.authorized_client, url)
+
+    def test_write_views_within_budget(self):
+        """Изменяющие view укладываются в бюджет запросов"""
+        requests = (
+            (reverse('posts:create_post'),
+             {'text': 'Новый', 'group': self.group.pk}),
+            (reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+             {'text': 'Правка', 'group': self.group2.pk}),
+            (reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+             {'text': 'Комментарий'}),
+            (reverse('posts:profile_unfollow', kwargs={'username': 'auth2'}),
+             None),
+            (reverse('posts:profile_follow', kwargs={'username': 'auth2'}),
+             None),
+        )
+        for url, data in requests:
+            with self.subTest(url=url):
+                self.assertWithinQueryBudget(
+                    self.authorized_client, url, data, method='post'
+                )
+
+    @override_settings(MIDDLEWARE=[BUDGET_MIDDLEWARE, *(
+        name for name in settings.MIDDLEWARE if name != BUDGET_MIDDLEWARE
+    )])
+    def test_middleware_logs_budget_violations(self):
+        """Middleware пишет в лог превышение бюджета"""
+        with mock.patch.object(views.index, 'query_budget', 0):
+            with self.assertLogs('yatube.query_budget', 'WARNING') as logs:
+                self.guest_client.get(reverse('posts:index'))
+        self.assertIn('при бюджете 0', logs.output[0])
@@ -0,0 +1,90 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import skipUnlessDBFeature
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Post
+
+from .test_forms import Fixtures
+
+FULL_SCAN = re.compile(r'^SCAN (?P<table>\S+)$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+class PlanRecorder:
+    """Запоминает выполненные SELECT-запросы вместе с параметрами."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+def full_scans(plan):
+    tables = connection.introspection.table_names()
+    return [
+        step for step in plan
+        if FULL_SCAN.match(step)
+        and FULL_SCAN.match(step).group('table') in tables
+    ]
+
+
+def explain(sql, params):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+@skipUnlessDBFeature('supports_explaining_query_execution')
+class QueryPlanTests(Fixtures):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        Follow.objects.create(user=cls.user, author=cls.user2)
+        for i in range(15):
+            post = Post.objects.create(
+                author=cls.user2, text=f'Пост {i}', group=cls.group
+            )
+            Comment.objects.create(post=post, author=cls.user, text='Ок')
+
+    def test_view_query_plans(self):
+        """Запросы лент и поста идут по индексам без сортировки в памяти"""
+        index = reverse('posts:index')
+        group = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        profile = reverse('posts:profile', kwargs={'username': 'auth2'})
+        follow = reverse('posts:follow_index')
+        first_page = self.authorized_client.get(
+            index, {'cursor': ''}
+        ).context['page_obj']
+        next_cursor = first_page.next_cursor
+        previous_cursor = self.authorized_client.get(
+            index, {'cursor': next_cursor}
+        ).context['page_obj'].previous_cursor
+        urls = [
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        ]
+        for url in (index, group, profile, follow):
+            urls += [
+                url,
+                f'{url}?page=2',
+                f'{url}?cursor=',
+                f'{url}?cursor={next_cursor}',
+                f'{url}?cursor={previous_cursor}',
+            ]
+        for url in urls:
+            cache.clear()
+            recorder = PlanRecorder()
+            with connection.execute_wrapper(recorder):
+                self.authorized_client.get(url)
+            for sql, params in recorder.queries:
+                plan = explain(sql, params)
+                with self.subTest(url=url, sql=sql, plan=plan):
+                    self.assertFalse(full_scans(plan))
+                    self.assertFalse(
+                        [step for step in plan if TEMP_SORT in step]
+                    )
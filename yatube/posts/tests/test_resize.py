@@ -0,0 +1,147 @@
+import os
+import tempfile
+import threading
+import time
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import imaging, resize
+from posts.models import Post
+
+from .test_forms import Fixtures
+
+CACHE_DIR = os.path.join(tempfile.gettempdir(), 'resized')
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.gettempdir(),
+    RESIZE_CACHE_DIR=CACHE_DIR,
+    THUMBNAIL_WORKERS=0,
+)
+class ResizeTests(Fixtures):
+
+    def setUp(self):
+        super().setUp()
+        source = BytesIO()
+        Image.new('RGB', (800, 600), 'teal').save(source, 'PNG')
+        self.photo = Post.objects.create(
+            author=self.user,
+            text='Пост с большой картинкой',
+            image=SimpleUploadedFile(
+                'photo.png', source.getvalue(), 'image/png'
+            ),
+        )
+
+    def test_resized_image_served_with_cache_headers(self):
+        """Подписанный адрес отдаёт картинку нужного размера надолго"""
+        url = resize.url(self.photo.image.name, 200, 100)
+        response = self.guest_client.get(url, HTTP_ACCEPT='image/webp,*/*')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        self.assertIn('Accept', response['Vary'])
+        content = b''.join(response.streaming_content)
+        with Image.open(BytesIO(content)) as image:
+            self.assertEqual(image.size, (200, 100))
+
+    def test_proportional_side_not_upscaled(self):
+        """Сторона 0 считается по пропорции, увеличения нет"""
+        self.assertEqual(imaging.fit_size((800, 600), 400, 0), (400, 300))
+        self.assertEqual(imaging.fit_size((800, 600), 1600, 0), (800, 600))
+
+    def test_bad_signature_not_found(self):
+        """Чужая подпись или подменённый размер дают 404"""
+        name = self.photo.image.name
+        signed = resize.signature(name, 200, 100)
+        urls = (
+            reverse('posts:resized_image', kwargs={
+                'signature': '0' * 16, 'width': 200, 'height': 100,
+                'name': name,
+            }),
+            reverse('posts:resized_image', kwargs={
+                'signature': signed, 'width': 2000, 'height': 1000,
+                'name': name,
+            }),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 404)
+
+    def test_concurrent_requests_render_once(self):
+        """Одновременные запросы одной картинки ждут одну отрисовку"""
+        name = self.photo.image.name
+        source = Post._meta.get_field('image').storage.path(name)
+        target = resize.cache_path(name, 120, 90, 'jpeg')
+        original = imaging.resize
+
+        def slow(*args):
+            time.sleep(0.2)
+            return original(*args)
+
+        def request():
+            resize.resized(source, target, 120, 90, 'jpeg').close()
+
+        with mock.patch.object(imaging, 'resize', side_effect=slow) as calls:
+            threads = [threading.Thread(target=request) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(calls.call_count, 1)
+        self.assertTrue(os.path.exists(target))
+
+    def test_evicted_file_rendered_again(self):
+        """Файл, вытесненный до открытия, отрисовывается заново"""
+        name = self.photo.image.name
+        source = Post._meta.get_field('image').storage.path(name)
+        target = resize.cache_path(name, 130, 70, 'jpeg')
+        if os.path.exists(target):
+            os.remove(target)
+        original = resize._render
+
+        def evicted(*args):
+            rendered = original(*args)
+            if render.call_count == 1:
+                os.remove(target)
+            return rendered
+
+        with mock.patch.object(
+            resize, '_render', side_effect=evicted
+        ) as render:
+            with resize.resized(source, target, 130, 70, 'jpeg') as image:
+                self.assertTrue(image.read())
+        self.assertEqual(render.call_count, 2)
+        os.remove(target)
+        with resize.resized(source, target, 130, 70, 'jpeg') as image:
+            self.assertTrue(image.read())
+
+    def test_cache_evicts_least_recently_used(self):
+        """Переполненный кэш теряет давно не читанные файлы"""
+        paths = []
+        for i in range(3):
+            path = os.path.join(CACHE_DIR, 'lru', f'{i}.jpg')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as output:
+                output.write(b'x' * 100)
+            os.utime(path, (i, i))
+            paths.append(path)
+        with override_settings(RESIZE_CACHE_MAX_SIZE=250):
+            resize.evict()
+        self.assertFalse(os.path.exists(paths[0]))
+        self.assertTrue(os.path.exists(paths[2]))
+
+    def test_post_page_links_large_image(self):
+        """Страница поста ведёт на большую картинку по подписанному адресу"""
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.photo.pk})
+        )
+        self.assertContains(
+            response, resize.url(self.photo.image.name, 1600, 0)
+        )
@@ -0,0 +1,96 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.urls import reverse
+
+from posts import search
+from posts.models import Post
+
+from .test_forms import Fixtures
+
+
+class SearchTests(Fixtures):
+
+    def create_post(self, text, **fields):
+        return Post.objects.create(author=self.user, text=text, **fields)
+
+    def found(self, query, **params):
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response, [post.pk for post in response.context['page_obj']]
+
+    def test_best_match_first_with_highlight(self):
+        """Лучшие по BM25 посты первыми, совпадения подсвечены"""
+        once = self.create_post('Кошка <b>спит</b> на диване весь день')
+        twice = self.create_post('Кошка и ещё раз кошка')
+        response, found = self.found('КОШКА')
+        self.assertEqual(found, [twice.pk, once.pk])
+        self.assertContains(response, '<mark>Кошка</mark>')
+        self.assertContains(response, '&lt;b&gt;спит&lt;/b&gt;')
+
+    def test_index_follows_edits_and_deletes(self):
+        """Правка и удаление поста сразу видны в поиске"""
+        post = self.create_post('Старый текст про вулканы')
+        post.text = 'Новый текст про гейзеры'
+        post.save()
+        self.assertEqual(self.found('вулканы')[1], [])
+        self.assertEqual(self.found('гейзеры')[1], [post.pk])
+        post.delete()
+        self.assertEqual(self.found('гейзеры')[1], [])
+
+    def test_group_and_author_filters(self):
+        """Фильтры по группе и автору сужают выдачу"""
+        in_group = self.create_post('Пингвины в группе', group=self.group2)
+        other = Post.objects.create(author=self.user2, text='Пингвины')
+        self.assertEqual(
+            self.found('пингвины', group='group2-slug')[1], [in_group.pk]
+        )
+        self.assertEqual(
+            self.found('пингвины', author='auth2')[1], [other.pk]
+        )
+
+    def test_cursor_pagination(self):
+        """Курсор ведёт на следующую страницу без повторов"""
+        for i in range(13):
+            self.create_post(f'Заметка номер {i} про ежей')
+        response, first = self.found('ежей')
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(first), 10)
+        self.assertTrue(page_obj.has_next())
+        second = self.found('ежей', cursor=page_obj.next_cursor)[1]
+        self.assertEqual(len(second), 3)
+        self.assertFalse(set(first) & set(second))
+
+    def test_odd_queries_do_not_break(self):
+        """Кавычки и операторы FTS5 в запросе ищутся как слова"""
+        for query in ('"', 'NEAR(a b)', 'текст*', 'a OR', '-'):
+            with self.subTest(query=query):
+                self.found(query)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через полнотекстовый индекс"""
+        post = self.create_post('Редкое слово шиншилла')
+        admin = type(self.user).objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.authorized_client.force_login(admin)
+        response = self.authorized_client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'шиншилла'}
+        )
+        self.assertEqual(
+            [row.pk for row in response.context['cl'].result_list],
+            [post.pk],
+        )
+
+    def test_rebuild_command(self):
+        """Команда восстанавливает индекс по всем постам"""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {search.TABLE}')
+        self.assertEqual(self.found('Тестовый')[1], [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(
+            set(self.found('Тестовый')[1]), {self.post.pk, self.post2.pk}
+        )
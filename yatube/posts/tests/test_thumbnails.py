@@ -0,0 +1,117 @@
+import hashlib
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import imaging, thumbnails
+from posts.models import Post
+
+from .test_forms import Fixtures
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.gettempdir(), THUMBNAIL_WORKERS=0
+)
+class ThumbnailTests(Fixtures):
+
+    def test_variants_cover_widths_and_formats(self):
+        """Варианты есть во всех ширинах и форматах, JPEG всегда"""
+        source = BytesIO()
+        Image.new('RGB', (1200, 900)).save(source, 'PNG')
+        found = imaging.variants(source.getvalue())
+        formats = imaging.available_formats()
+        self.assertIn('jpeg', formats)
+        self.assertEqual(len(found), len(imaging.WIDTHS) * len(formats))
+        for image_format, width, data in found:
+            with Image.open(BytesIO(data)) as image:
+                self.assertEqual(image.size, (width, width))
+                self.assertEqual(image.format, image_format.upper())
+
+    def test_small_source_not_upscaled_beyond_size(self):
+        """Маленький исходник даёт только варианты не шире себя и SIZE"""
+        source = BytesIO()
+        Image.new('P', (300, 300)).save(source, 'GIF', transparency=0)
+        widths = {width for _, width, _ in imaging.variants(
+            source.getvalue(), formats=['jpeg']
+        )}
+        self.assertEqual(widths, {200, imaging.SIZE[0]})
+
+    def test_placeholder_until_thumbnail_ready(self):
+        """Пока миниатюры нет, в ленте заглушка, потом готовый URL"""
+        url = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        response = self.guest_client.get(url)
+        self.assertContains(response, 'thumbnail-placeholder.svg', count=2)
+        thumbnails.enqueue(self.post)
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertTrue(post.thumbnail.endswith('_400.jpg'))
+        response = self.guest_client.get(url)
+        self.assertContains(response, f'src="{post.thumbnail}"')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, 'width="400" height="400"')
+        self.assertContains(response, 'thumbnail-placeholder.svg', count=1)
+
+    def test_replaced_image_keeps_new_thumbnail(self):
+        """Миниатюра старой картинки не попадает к сменившему её посту"""
+        thumbnails.store(
+            self.post.pk, 'posts/old.gif', '', [('jpeg', 400, b'data')]
+        )
+        self.assertEqual(Post.objects.get(pk=self.post.pk).thumbnail, '')
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.gettempdir(), THUMBNAIL_WORKERS=0
+)
+class ImageMetadataTests(Fixtures):
+
+    def test_metadata_saved_with_post(self):
+        """Размеры, формат, вес и хэш картинки пишутся при сохранении"""
+        post = Post.objects.get(pk=self.post.pk)
+        self.image.seek(0)
+        content = self.image.read()
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertEqual(post.image_format, 'gif')
+        self.assertEqual(post.image_size, len(content))
+        self.assertEqual(post.image_hash, hashlib.sha256(content).hexdigest())
+
+    def test_backfill_command(self):
+        """Команда заполняет метаданные старых постов"""
+        Post.objects.update(image_hash='', image_width=None)
+        call_command('backfill_image_metadata', stdout=StringIO())
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.image_width, 2)
+        self.assertEqual(len(post.image_hash), 64)
+
+    def test_same_image_reuses_variants(self):
+        """Одинаковая картинка не пережимается второй раз"""
+        thumbnails.enqueue(self.post)
+        first = Post.objects.get(pk=self.post.pk)
+        with mock.patch.object(thumbnails, 'variants') as variants:
+            thumbnails.enqueue(Post.objects.get(pk=self.post2.pk))
+        variants.assert_not_called()
+        second = Post.objects.get(pk=self.post2.pk)
+        self.assertEqual(second.image_variants, first.image_variants)
+
+    def test_pages_render_without_media_access(self):
+        """Ленты и страница поста не открывают файлы картинок"""
+        thumbnails.enqueue(self.post)
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        forbidden = mock.Mock(side_effect=AssertionError('файл открыт'))
+        with mock.patch.object(FileSystemStorage, '_open', forbidden), \
+                mock.patch.object(FileSystemStorage, 'size', forbidden), \
+                mock.patch.object(FileSystemStorage, 'exists', forbidden), \
+                mock.patch.object(Image, 'open', forbidden):
+            for url in urls:
+                with self.subTest(url=url):
+                    response = self.authorized_client.get(url)
+                    self.assertEqual(response.status_code, 200)
@@ -0,0 +1,80 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Post, Timeline, User
+
+from .test_forms import Fixtures
+
+
+class TimelineTests(Fixtures):
+
+    def follow_feed(self):
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка заполняет ленту, отписка её очищает"""
+        self.authorized_client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'auth2'})
+        )
+        self.assertTrue(
+            Timeline.objects.filter(user=self.user, post=self.post2).exists()
+        )
+        self.assertEqual(self.follow_feed(), [self.post2])
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'auth2'})
+        )
+        self.assertFalse(Timeline.objects.filter(user=self.user).exists())
+        self.assertEqual(self.follow_feed(), [])
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост автора попадает в ленты подписчиков"""
+        Follow.objects.create(user=self.user, author=self.user2)
+        post = Post.objects.create(author=self.user2, text='Новый пост')
+        self.assertTrue(
+            Timeline.objects.filter(user=self.user, post=post).exists()
+        )
+        self.assertEqual(self.follow_feed(), [post, self.post2])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_celebrity_posts_merged_at_read(self):
+        """Посты популярных авторов подмешиваются при чтении ленты"""
+        Follow.objects.create(user=self.user, author=self.user2)
+        post = Post.objects.create(author=self.user2, text='Новый пост')
+        self.assertFalse(Timeline.objects.filter(user=self.user).exists())
+        self.assertEqual(self.follow_feed(), [post, self.post2])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_demoted_celebrity_posts_materialized(self):
+        """Автор опустился до порога — его посты раскладываются по лентам"""
+        fan = User.objects.create_user(username='fan')
+        Follow.objects.create(user=self.user, author=self.user2)
+        Follow.objects.create(user=fan, author=self.user2)
+        post = Post.objects.create(author=self.user2, text='Пост звезды')
+        self.assertFalse(
+            Timeline.objects.filter(user=self.user, post=post).exists()
+        )
+        Follow.objects.filter(user=fan).delete()
+        self.assertTrue(
+            Timeline.objects.filter(user=self.user, post=post).exists()
+        )
+        self.assertEqual(self.follow_feed(), [post, self.post2])
+
+    def test_rebuild_timelines_command(self):
+        """Команда rebuild_timelines восстанавливает ленты"""
+        Follow.objects.create(user=self.user, author=self.user2)
+        Timeline.objects.all().delete()
+        Timeline.objects.create(
+            user=self.user2,
+            post=self.post,
+            author=self.user,
+            pub_date=self.post.pub_date,
+        )
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            list(Timeline.objects.values_list('user', 'post')),
+            [(self.user.pk, self.post2.pk)],
+        )
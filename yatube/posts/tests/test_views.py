@@ -1,7 +1,9 @@
 import tempfile
+from io import StringIO
 
 from django import forms
 from django.core.cache import cache
+from django.core.management import call_command
 from django.test import Client, override_settings
 from django.urls import reverse
 
@@ -128,15 +130,13 @@ class PostsViewsTests(Fixtures):
     def test_index_cache_working(self):
         """Проверка, что посты на главной странице кэшируются"""
         response_1 = self.authorized_client.get(reverse('posts:index'))
-        context_1 = response_1.context['page_obj']
-        Post.objects.filter(pk=0).delete()
+        Post.objects.filter(pk=self.post.pk).update(text='Мимо сигналов')
         response_2 = self.authorized_client.get(reverse('posts:index'))
-        context_2 = response_2.context['page_obj']
-        self.assertEqual(list(context_1), list(context_2))
+        self.assertEqual(response_1.content, response_2.content)
         cache.clear()
         response_3 = self.authorized_client.get(reverse('posts:index'))
-        context_3 = response_3.context['page_obj']
-        self.assertNotEqual(context_1, context_3)
+        self.assertNotEqual(response_1.content, response_3.content)
+        self.assertContains(response_3, 'Мимо сигналов')
 
     def test_profile_follow_working(self):
         """Подписка возможна"""
@@ -223,6 +223,7 @@ class PaginatorViewsTest(Fixtures):
             for i in range(10)
         ]
         Post.objects.bulk_create(posts)
+        call_command('reconcile_counters', '--fix', stdout=StringIO())
 
     def test_paginator(self):
         """Проверка работы паджинатора"""
@@ -240,3 +241,31 @@ class PaginatorViewsTest(Fixtures):
             with self.subTest(reverse_name=reverse_name):
                 response = self.guest_client.get(reverse_name)
                 self.assertEqual(len(response.context['page_obj']), page_num)
+
+    def test_cursor_paginator(self):
+        """Курсорная пагинация обходит ленту без пропусков и повторов"""
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        url = reverse('posts:index')
+        response = self.guest_client.get(url, {'cursor': ''})
+        first_page = list(response.context['page_obj'])
+        self.assertEqual(len(first_page), PAGENUM)
+        Post.objects.create(author=self.user, text='Свежий пост')
+        next_cursor = response.context['page_obj'].next_cursor
+        response = self.guest_client.get(url, {'cursor': next_cursor})
+        page_obj = response.context['page_obj']
+        self.assertEqual(first_page + list(page_obj), expected)
+        self.assertFalse(page_obj.has_next())
+        self.assertContains(response, page_obj.previous_cursor)
+        response = self.guest_client.get(
+            url, {'cursor': page_obj.previous_cursor}
+        )
+        self.assertEqual(list(response.context['page_obj']), first_page)
+
+    def test_cursor_paginator_broken_token(self):
+        """Битый курсор открывает первую страницу ленты"""
+        response = self.guest_client.get(
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            {'cursor': 'не-курсор'}
+        )
+        self.assertEqual(len(response.context['page_obj']), PAGENUM)
+        self.assertFalse(response.context['page_obj'].has_previous())
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousOperation
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+
+from . import feed_cache
+from .imaging import EXTENSIONS, SIZE, WIDTHS, metadata, variants
+from .models import Post
+from .storage import shard
+
+logger = logging.getLogger('yatube.thumbnails')
+
+FOLDER = 'thumbs'
+
+_executor = None
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _executor
+
+
+def wait():
+    """Дожидается всех поставленных в очередь миниатюр."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def variant_name(key, image_format, width):
+    return shard(FOLDER, key, f'_{width}.{EXTENSIONS[image_format]}')
+
+
+def variant_names(key):
+    """Все возможные имена вариантов картинки, готовых или нет."""
+    return [
+        variant_name(key, image_format, width)
+        for image_format in EXTENSIONS for width in WIDTHS
+    ]
+
+
+def _file_key(image_name, image_hash):
+    """Имена вариантов по содержимому, а без хэша — по имени файла."""
+    if image_hash:
+        return image_hash[:16]
+    return hashlib.md5(image_name.encode()).hexdigest()[:16]
+
+
+def attach(post_id, image_name, thumbnail, image_variants):
+    """Отдаёт варианты посту, если у него всё ещё та же картинка."""
+    updated = Post.objects.filter(pk=post_id, image=image_name).update(
+        thumbnail=thumbnail,
+        image_variants=image_variants,
+        modified=timezone.now(),
+    )
+    if updated:
+        post = Post.objects.filter(pk=post_id).values(
+            'author_id', 'group_id'
+        ).get()
+        feed_cache.bump(*feed_cache.post_scopes(
+            post['author_id'], post['group_id']
+        ))
+    return updated
+
+
+def store(post_id, image_name, image_hash, files):
+    """Сохраняет варианты картинки и отдаёт их посту."""
+    key = _file_key(image_name, image_hash)
+    names = []
+    found = []
+    for image_format, width, data in files:
+        name = variant_name(key, image_format, width)
+        default_storage.delete(name)
+        name = default_storage.save(name, ContentFile(data))
+        names.append(name)
+        found.append({
+            'format': image_format,
+            'width': width,
+            'url': default_storage.url(name),
+        })
+    fallback = [
+        variant['url'] for variant in found
+        if variant['format'] == 'jpeg' and variant['width'] == SIZE[0]
+    ]
+    thumbnail = fallback[0] if fallback else ''
+    if attach(post_id, image_name, thumbnail, json.dumps(found)):
+        return
+    shared = image_hash and Post.objects.filter(
+        image_hash=image_hash
+    ).exclude(image_variants='').exists()
+    if not shared:
+        for name in names:
+            default_storage.delete(name)
+
+
+def _done(post_id, image_name, image_hash, future):
+    try:
+        store(post_id, image_name, image_hash, future.result())
+    except Exception:
+        logger.exception('Не удалось сделать миниатюру %s', image_name)
+    finally:
+        connections.close_all()
+
+
+def read_metadata(image):
+    """Колонки image_* для картинки; пустые, если её не прочитать."""
+    values = dict.fromkeys(
+        ('image_width', 'image_height', 'image_size'), None
+    )
+    values.update(image_format='', image_hash='')
+    try:
+        if image and not image._committed:
+            # Загрузка ещё не сохранена: читаем её, не закрывая.
+            values.update(metadata(image.file))
+            image.file.seek(0)
+        elif image:
+            with image.storage.open(image.name, 'rb') as source:
+                values.update(metadata(source))
+    except (OSError, SyntaxError, SuspiciousOperation):
+        logger.warning('Не удалось прочитать картинку %s', image)
+    return values
+
+
+def fill_metadata(post):
+    for field, value in read_metadata(post.image).items():
+        setattr(post, field, value)
+
+
+def reuse_twin(post):
+    """Берёт готовые варианты у поста с той же картинкой по хэшу."""
+    if not post.image_hash:
+        return False
+    twin = Post.objects.filter(image_hash=post.image_hash).exclude(
+        pk=post.pk
+    ).exclude(image_variants='').values('thumbnail', 'image_variants').first()
+    if twin is None:
+        return False
+    attach(
+        post.pk, post.image.name, twin['thumbnail'], twin['image_variants']
+    )
+    return True
+
+
+def enqueue(post):
+    """Ставит в очередь миниатюру картинки поста.
+
+    Если у другого поста уже есть варианты той же картинки (по хэшу),
+    они переиспользуются. При THUMBNAIL_WORKERS = 0 миниатюра делается
+    сразу.
+    """
+    if not post.image or reuse_twin(post):
+        return
+    name = post.image.name
+    try:
+        with post.image.storage.open(name) as source:
+            data = source.read()
+    except OSError:
+        logger.warning('Нет файла картинки %s', name)
+        return
+    if not settings.THUMBNAIL_WORKERS:
+        try:
+            store(post.pk, name, post.image_hash, variants(data))
+        except OSError:
+            logger.exception('Не удалось сделать миниатюру %s', name)
+        return
+    try:
+        future = executor().submit(variants, data)
+    except BrokenProcessPool:
+        logger.exception('Пул миниатюр сломан, пересоздаём')
+        wait()
+        future = executor().submit(variants, data)
+    future.add_done_callback(partial(_done, post.pk, name, post.image_hash))
+
+
+def schedule(post):
+    """Ставит миниатюру в очередь после фиксации транзакции."""
+    transaction.on_commit(partial(enqueue, post))
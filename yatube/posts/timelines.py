@@ -0,0 +1,135 @@
+from django.conf import settings
+from django.db.models import F, Q
+
+from .counters import insert_select, recount_user
+from .models import Follow, Post, Timeline, UserStats
+
+BATCH_SIZE = 500
+
+
+def is_celebrity(author_id):
+    """Автор, чьи посты подмешиваются при чтении, а не раскладываются."""
+    stats = UserStats.objects.filter(pk=author_id).values_list(
+        'followers_count', flat=True
+    )
+    followers = stats.first()
+    if followers is None:
+        recount_user(author_id)
+        followers = stats.first() or 0
+    return followers > settings.TIMELINE_FANOUT_LIMIT
+
+
+def celebrity_authors(user):
+    """Авторы из подписок пользователя, которых нет в его ленте."""
+    return Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values('author')
+
+
+def _insert(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= BATCH_SIZE:
+            Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(post):
+    """Кладёт новый пост в ленты всех подписчиков автора."""
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author=post.author_id
+    ).values_list('user_id', flat=True)
+    _insert(
+        Timeline(
+            user_id=user_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        )
+        for user_id in followers.iterator()
+    )
+
+
+def backfill(user, author):
+    """Добавляет в ленту пользователя посты нового автора из подписок."""
+    if is_celebrity(author.pk):
+        return
+    posts = Post.objects.filter(author=author).order_by().values_list(
+        'pk', 'pub_date'
+    )
+    _insert(
+        Timeline(
+            user_id=user.pk,
+            post_id=post_id,
+            author_id=author.pk,
+            pub_date=pub_date,
+        )
+        for post_id, pub_date in posts.iterator()
+    )
+
+
+def materialize(follows, **post_filters):
+    """Раскладывает посты авторов по лентам их подписчиков одним запросом.
+
+    INSERT ... SELECT по подпискам и постам (post_filters — условия на
+    посты): строки не проходят через Python. Посты звёзд, как и в
+    fan_out, не раскладываются, поэтому счётчики подписчиков должны быть
+    сверены. Уже лежащие в ленте записи пропускаются.
+    """
+    rows = follows.order_by().filter(
+        author__posts__isnull=False,
+        author__stats__followers_count__lte=settings.TIMELINE_FANOUT_LIMIT,
+        **{f'author__posts__{key}': value
+           for key, value in post_filters.items()},
+    ).values_list(
+        'user_id', 'author__posts__id', 'author_id', 'author__posts__pub_date'
+    )
+    return insert_select(
+        Timeline, ['user', 'post', 'author', 'pub_date'], rows
+    )
+
+
+def demote(author_id):
+    """Раскладывает посты автора, только что опустившегося до порога.
+
+    Пока он был звездой, его посты подмешивались при чтении и в ленты
+    не попадали; теперь без этого они пропали бы из лент подписчиков.
+    """
+    followers = UserStats.objects.filter(pk=author_id).values_list(
+        'followers_count', flat=True
+    ).first()
+    if followers == settings.TIMELINE_FANOUT_LIMIT:
+        materialize(Follow.objects.filter(author_id=author_id))
+
+
+def prune(user, author):
+    """Убирает из ленты пользователя посты автора после отписки."""
+    Timeline.objects.filter(user=user, author=author).delete()
+
+
+def rebuild(user):
+    """Собирает ленту пользователя заново по его текущим подпискам."""
+    Timeline.objects.filter(user=user).delete()
+    for follow in Follow.objects.filter(user=user).select_related('author'):
+        backfill(user, follow.author)
+
+
+def feed(user):
+    """Посты ленты подписок: материализованная лента плюс посты звёзд."""
+    posts = Post.objects.filter(timeline_entries__user=user).annotate(
+        feed_date=F('timeline_entries__pub_date'),
+        feed_post=F('timeline_entries__post'),
+    ).order_by('-feed_date', '-feed_post')
+    celebrities = celebrity_authors(user)
+    if celebrities.exists():
+        entries = Timeline.objects.filter(user=user).values('post')
+        posts = Post.objects.filter(
+            Q(pk__in=entries) | Q(author__in=celebrities)
+        ).order_by('-pub_date', '-pk')
+    return posts
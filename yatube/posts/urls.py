@@ -9,6 +9,8 @@ urlpatterns = [
     path('group/<slug:slug>/', views.group_list, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('search/', views.search_posts, name='search'),
+    path('autocomplete/', views.complete, name='autocomplete'),
     path('create/', views.create_post, name='create_post'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment', views.add_comment, name='add_comment'),
@@ -23,4 +25,14 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path(
+        'img/<str:signature>/<int:width>x<int:height>/<path:name>',
+        views.resized_image,
+        name='resized_image'
+    ),
+    path(
+        'feed-cache/stats/',
+        views.feed_cache_stats,
+        name='feed_cache_stats'
+    ),
 ]
@@ -1,35 +1,66 @@
+import os
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import SuspiciousOperation
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.http import FileResponse, Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from PIL import Image
+
+from core.query_budget import query_budget
 
+from . import (
+    autocomplete, feed_cache, imaging, media, resize, search, thumbnails,
+    timelines,
+)
+from .conditional import (
+    conditional_page, group_scopes, index_scopes, post_scopes, profile_scopes,
+)
+from .counters import stats_for
 from .forms import CommentForm, PostForm
 from .models import Follow, Group, Post, User
+from .page_cache import cached_page, depends_on
+from .pagination import cursor_page
 
 PAGENUM = 10
 
 
-def paginator(page_number, posts):
+def paginator(request, posts, count=None):
+    if 'cursor' in request.GET:
+        return cursor_page(posts, request.GET.get('cursor'), PAGENUM)
     paginator = Paginator(posts, PAGENUM)
-    return paginator.get_page(page_number)
+    if count is not None:
+        paginator.count = count
+    return paginator.get_page(request.GET.get('page'))
 
 
+@conditional_page(index_scopes)
+@cached_page
+@query_budget(4)
 def index(request):
     template = 'posts/index.html'
-    posts = Post.objects.all()
-    page_number = request.GET.get('page')
-    page_obj = paginator(page_number, posts)
+    depends_on(request, 'index')
+    posts = Post.objects.select_related('author', 'group')
+    page_obj = paginator(request, posts)
     context = {
         'page_obj': page_obj,
     }
     return render(request, template, context)
 
 
+@conditional_page(group_scopes)
+@cached_page
+@query_budget(5)
 def group_list(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    page_number = request.GET.get('page')
-    page_obj = paginator(page_number, posts)
+    depends_on(request, feed_cache.scope('group', group.pk))
+    posts = group.posts.select_related('author', 'group')
+    page_obj = paginator(request, posts, group.posts_count)
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -37,43 +68,76 @@ def group_list(request, slug):
     return render(request, template, context)
 
 
+@conditional_page(profile_scopes)
+@cached_page
+@query_budget(6)
 def profile(request, username):
     template = 'posts/profile.html'
-    client = get_object_or_404(User, username=username)
-    posts = client.posts.all()
-    page_number = request.GET.get('page')
-    page_obj = paginator(page_number, posts)
-    num = len(posts)
-    following = request.user.is_authenticated and Follow.objects.filter(
-        user=request.user,
-        author=client
-    ).exists()
+    client = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    depends_on(request, feed_cache.scope('profile', client.pk))
+    stats = stats_for(client)
+    num = stats.posts_count
+    posts = client.posts.select_related('author', 'group')
+    page_obj = paginator(request, posts, num)
     context = {
         'client': client,
+        'stats': stats,
         'num': num,
         'page_obj': page_obj,
-        'following': following,
     }
     return render(request, template, context)
 
 
+@conditional_page(post_scopes)
+@cached_page
+@query_budget(5)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
-    user = post.author
-    num = user.posts.count()
-    form = CommentForm(request.POST or None)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
+    depends_on(request, feed_cache.scope('profile', post.author_id))
+    num = stats_for(post.author).posts_count
+    comments = post.comments.select_related('author')
     context = {
         'post': post,
         'num': num,
-        'form': form,
         'comments': comments,
     }
     return render(request, template, context)
 
 
+@query_budget(4)
+def search_posts(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    group = author = page_obj = None
+    if request.GET.get('group'):
+        group = get_object_or_404(Group, slug=request.GET['group'])
+    if request.GET.get('author'):
+        author = get_object_or_404(User, username=request.GET['author'])
+    if query:
+        page_obj = search.search_page(
+            query,
+            request.GET.get('cursor'),
+            PAGENUM,
+            group_id=group and group.pk,
+            author_id=author and author.pk,
+        )
+    context = {
+        'query': query,
+        'group': group,
+        'author': author,
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
 @login_required
+@transaction.atomic
+@query_budget(10)
 def create_post(request):
     template = 'posts/create_post.html'
     user = request.user
@@ -86,11 +150,14 @@ def create_post(request):
             post = form.save(commit=False)
             post.author = user
             post.save()
+            thumbnails.schedule(post)
             return redirect('posts:profile', username=post.author.username)
     return render(request, template, context)
 
 
 @login_required
+@transaction.atomic
+@query_budget(10)
 def post_edit(request, post_id):
     template = 'posts/create_post.html'
     post = get_object_or_404(Post, pk=post_id)
@@ -103,15 +170,21 @@ def post_edit(request, post_id):
         'post': post,
     }
     if request.method == 'POST':
-        if user == post.author:
+        if post.author_id == user.pk:
             if form.is_valid():
-                form.save()
+                post = form.save(commit=False)
+                if 'image' in form.changed_data:
+                    post.thumbnail = ''
+                    thumbnails.schedule(post)
+                post.save()
                 return redirect('posts:post_detail', post_id)
         return redirect('posts:post_detail', post_id)
     return render(request, template, context)
 
 
 @login_required
+@transaction.atomic
+@query_budget(5)
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -124,14 +197,12 @@ def add_comment(request, post_id):
 
 
 @login_required
+@query_budget(5)
 def follow_index(request):
     template = 'posts/follow.html'
     user = request.user
-    follow_posts = Post.objects.filter(
-        author__following__user__id=request.user.id
-    )
-    page_number = request.GET.get('page')
-    page_obj = paginator(page_number, follow_posts)
+    follow_posts = timelines.feed(user).select_related('author', 'group')
+    page_obj = paginator(request, follow_posts)
     context = {
         'user': user,
         'page_obj': page_obj,
@@ -140,6 +211,8 @@ def follow_index(request):
 
 
 @login_required
+@transaction.atomic
+@query_budget(10)
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     follower = request.user
@@ -150,8 +223,66 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
+@query_budget(9)
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     unfollower = request.user
     Follow.objects.filter(user=unfollower, author=author).delete()
     return redirect('posts:profile', username=username)
+
+
+@query_budget(2)
+def complete(request):
+    """Подсказки авторов и групп по началу слова.
+
+    Отвечает из индекса в памяти; к базе идёт, только перечитывая его.
+    """
+    try:
+        limit = min(
+            int(request.GET.get('limit', settings.AUTOCOMPLETE_LIMIT)),
+            settings.AUTOCOMPLETE_MAX_LIMIT,
+        )
+    except ValueError:
+        limit = settings.AUTOCOMPLETE_LIMIT
+    results = autocomplete.lookup(request.GET.get('q', ''), max(limit, 1))
+    response = JsonResponse({'results': results})
+    patch_cache_control(response, max_age=settings.AUTOCOMPLETE_MAX_AGE)
+    return response
+
+
+@staff_member_required
+def feed_cache_stats(request):
+    return JsonResponse(feed_cache.stats())
+
+
+def resized_image(request, signature, width, height, name):
+    """Картинка поста нужного размера из дискового кэша.
+
+    Адрес подписан, так что размеры выбирают только шаблоны.
+    """
+    valid = resize.check(signature, name, width, height) and (
+        0 < max(width, height) <= settings.IMAGE_MAX_SIDE
+    )
+    if not valid:
+        raise Http404
+    try:
+        source = media.storage.path(name)
+    except SuspiciousOperation:
+        raise Http404
+    if not os.path.isfile(source):
+        raise Http404
+    image_format = resize.negotiate(request.META.get('HTTP_ACCEPT', ''))
+    target = resize.cache_path(name, width, height, image_format)
+    try:
+        image = resize.resized(source, target, width, height, image_format)
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise Http404
+    response = FileResponse(
+        image, content_type=imaging.MIME_TYPES[image_format]
+    )
+    patch_cache_control(
+        response, public=True, max_age=settings.RESIZE_MAX_AGE, immutable=True
+    )
+    patch_vary_headers(response, ['Accept'])
+    return response
@@ -18,6 +18,7 @@ INSTALLED_APPS = [
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -39,6 +40,12 @@ MIDDLEWARE = [
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# Превышения бюджета SQL-запросов пишутся в лог только в разработке:
+# счётчик оборачивает каждый запрос к базе.
+QUERY_BUDGET_LOG = DEBUG
+if QUERY_BUDGET_LOG:
+    MIDDLEWARE.insert(0, 'core.middleware.QueryBudgetMiddleware')
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
@@ -113,9 +120,81 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Имена картинок и вариантов зависят от содержимого, их можно кэшировать.
+MEDIA_MAX_AGE = 60 * 60 * 24 * 365
+# 'x-sendfile' (Apache, lighttpd) или 'x-accel-redirect' (nginx): файлы
+# отдаёт фронтовый сервер, Django только проверяет запрос.
+MEDIA_SENDFILE = os.getenv('MEDIA_SENDFILE', '')
+# internal-location nginx, смотрящий в MEDIA_ROOT.
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+# Файлы моложе этого не удаляются: их, может быть, только что получила
+# повторная загрузка, чей пост ещё не сохранён.
+MEDIA_MIN_AGE = 60 * 60
+
+# Общий для всех процессов Memcached (нужен python-memcached), например
+# MEMCACHED_LOCATION=127.0.0.1:11211. Без него у каждого процесса свой
+# LocMemCache, и смену поколения лент видит только процесс, который её
+# сделал.
+MEMCACHED_LOCATION = os.getenv('MEMCACHED_LOCATION', '')
+CACHE_SHARED = bool(MEMCACHED_LOCATION)
+if CACHE_SHARED:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': MEMCACHED_LOCATION.split(','),
+        }
     }
-}
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Фрагменты лент, карточки и страницы сбрасываются сменой поколения,
+# поэтому в общем кэше живут долго. В кэше процесса чужие сбросы не
+# видны, и срок остаётся прежним — 20 секунд.
+FEED_CACHE_TIMEOUT = 60 * 60 * 24 if CACHE_SHARED else 20
+
+# Процессы пула, делающего миниатюры картинок, по одному на ядро. При 0
+# миниатюра делается сразу после фиксации транзакции в самом запросе:
+# так в тестах файлы не появляются после ответа.
+THUMBNAIL_WORKERS = int(os.getenv('THUMBNAIL_WORKERS', os.cpu_count() or 1))
+
+# Загрузки пишутся во временный файл кусками, а не собираются в памяти.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+IMAGE_UPLOAD_MAX_SIZE = 20 * 2 ** 20
+# Защита от «бомб»: проверяется по заголовку до декодирования.
+IMAGE_MAX_PIXELS = 50_000_000
+# Оригиналы больше этой стороны уменьшаются при загрузке.
+IMAGE_MAX_SIDE = 2048
+
+# Кэш картинок /img/...: не в MEDIA_ROOT, чтобы не попадать в бэкапы.
+RESIZE_CACHE_DIR = os.path.join(BASE_DIR, 'resized')
+RESIZE_CACHE_MAX_SIZE = 512 * 2 ** 20
+RESIZE_MAX_AGE = 60 * 60 * 24 * 365
+
+# Подсказки /autocomplete/ отвечают из индекса в памяти процесса. Журнал
+# изменений в кэше проверяется не чаще раза в секунду, а раз в десять
+# минут индекс перечитывается из базы целиком. Журнал в кэше процесса
+# другим процессам не виден, поэтому без общего кэша индекс
+# перечитывается каждую минуту.
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 20
+AUTOCOMPLETE_SYNC_INTERVAL = 1
+AUTOCOMPLETE_REFRESH = 60 * 10 if CACHE_SHARED else 60
+AUTOCOMPLETE_MAX_AGE = 60
+
+# Размер страницы лент в /api/v1/ по умолчанию и наибольший по ?limit=.
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+# Пакет /api/v1/batch/: у каждой ленты свой запрос к базе, у остальных
+# подзапросов — общие, поэтому лент в пакете немного.
+API_BATCH_MAX_REQUESTS = 20
+API_BATCH_MAX_FEEDS = 3
+
+# Авторы, у которых подписчиков больше этого числа, не раскладывают новые
+# посты по лентам подписчиков: их посты подмешиваются при чтении ленты.
+TIMELINE_FANOUT_LIMIT = 10000